@@ -0,0 +1,292 @@
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import shutil
+from collections import OrderedDict
+
+# Where card image bytes are read from (see make_asset_backend)
+ASSET_BACKEND = os.getenv("ASSET_BACKEND", "local")  # local, pack or blob
+ASSET_PACK_PATH = os.getenv("ASSET_PACK_PATH", ".cache/assets/cards.pack")
+ASSET_BLOB_DIR = os.getenv("ASSET_BLOB_DIR", ".cache/assets/blobs")
+ASSET_CACHE_MAX_BYTES = int(os.getenv("ASSET_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+def asset_key(path):
+    """Assets are named by their path as written in cards.json and user_cards.image_path."""
+    return os.path.normpath(path)
+
+
+class AssetInfo:
+    __slots__ = ("key", "size", "mtime")
+
+    def __init__(self, key, size, mtime):
+        self.key = key
+        self.size = size
+        self.mtime = mtime
+
+
+class LocalAssetBackend:
+    """Files under the working directory, read in a thread so a slow disk doesn't block the gateway."""
+
+    name = "local"
+
+    def _stat(self, key):
+        try:
+            st = os.stat(key)
+        except OSError:
+            return None
+        return AssetInfo(key, st.st_size, st.st_mtime)
+
+    def _read(self, key):
+        with open(key, "rb") as f:
+            return f.read()
+
+    async def stat(self, key):
+        return await asyncio.to_thread(self._stat, key)
+
+    async def stat_many(self, keys):
+        return await asyncio.to_thread(lambda: {key: self._stat(key) for key in keys})
+
+    async def read(self, key):
+        return await asyncio.to_thread(self._read, key)
+
+    def close(self):
+        pass
+
+
+class IndexedAssetBackend:
+    """Shared part of the pack and blob backends: a prebuilt {key: entry} index, with local files
+    as the fallback for assets it doesn't hold (say, a card dropped from cards.json that people
+    still own)."""
+
+    def __init__(self, entries, fallback=None):
+        self.entries = entries
+        self.fallback = fallback or LocalAssetBackend()
+
+    async def stat(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return await self.fallback.stat(key)
+        return AssetInfo(key, entry["size"], entry["mtime"])
+
+    async def stat_many(self, keys):
+        infos = {key: AssetInfo(key, self.entries[key]["size"], self.entries[key]["mtime"]) for key in keys if key in self.entries}
+        infos.update(await self.fallback.stat_many([key for key in keys if key not in self.entries]))
+        return infos
+
+    async def read(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return await self.fallback.read(key)
+        return await self.read_entry(entry)
+
+
+class PackAssetBackend(IndexedAssetBackend):
+    """Every card image in one memory-mapped pack file, located through a JSON index next to it.
+    Reads slice the map without a syscall."""
+
+    name = "pack"
+
+    def __init__(self, pack_path=ASSET_PACK_PATH, fallback=None):
+        with open(f"{pack_path}.json", encoding="utf-8") as f:
+            super().__init__(json.load(f), fallback)
+        self._file = open(pack_path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.entries else None
+
+    async def read_entry(self, entry):
+        return self._map[entry["offset"]:entry["offset"] + entry["size"]]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class BlobAssetBackend(IndexedAssetBackend):
+    """Content-addressed store: each distinct image once, under its SHA-256, plus a manifest
+    mapping asset keys to digests."""
+
+    name = "blob"
+
+    def __init__(self, blob_dir=ASSET_BLOB_DIR, fallback=None):
+        self.blob_dir = blob_dir
+        with open(os.path.join(blob_dir, "manifest.json"), encoding="utf-8") as f:
+            super().__init__(json.load(f), fallback)
+
+    def _read(self, digest):
+        with open(blob_path(self.blob_dir, digest), "rb") as f:
+            return f.read()
+
+    async def read_entry(self, entry):
+        return await asyncio.to_thread(self._read, entry["digest"])
+
+    def close(self):
+        pass
+
+
+def blob_path(blob_dir, digest):
+    return os.path.join(blob_dir, digest[:2], digest)
+
+def _source_entries(paths):
+    """{asset key: os.stat_result} for the paths that exist, reporting the rest."""
+    entries = {}
+    for key in dict.fromkeys(asset_key(path) for path in paths):
+        try:
+            entries[key] = os.stat(key)
+        except OSError:
+            print(f"Skipping missing card image: {key}")
+    return entries
+
+def build_pack(paths, pack_path=ASSET_PACK_PATH):
+    """Write (or keep, when every source is unchanged) the pack for these images. Returns how many were packed."""
+    sources = _source_entries(paths)
+    index_path = f"{pack_path}.json"
+    if os.path.exists(pack_path) and os.path.exists(index_path):
+        with open(index_path, encoding="utf-8") as f:
+            current = json.load(f)
+        if current.keys() == sources.keys() and all(
+            current[key]["mtime"] == st.st_mtime and current[key]["size"] == st.st_size for key, st in sources.items()
+        ):
+            return 0
+
+    os.makedirs(os.path.dirname(pack_path) or ".", exist_ok=True)
+    entries = {}
+    with open(f"{pack_path}.tmp", "wb") as out:
+        for key, st in sources.items():
+            with open(key, "rb") as f:
+                data = f.read()
+            entries[key] = {"offset": out.tell(), "size": len(data), "mtime": st.st_mtime}
+            out.write(data)
+    os.replace(f"{pack_path}.tmp", pack_path)
+    with open(f"{index_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(entries, f)
+    os.replace(f"{index_path}.tmp", index_path)
+    return len(entries)
+
+def build_blob_store(paths, blob_dir=ASSET_BLOB_DIR):
+    """Copy new or changed images into the blob store and rewrite its manifest. Returns how many were copied."""
+    manifest_path = os.path.join(blob_dir, "manifest.json")
+    current = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            current = json.load(f)
+
+    entries = {}
+    copied = 0
+    for key, st in _source_entries(paths).items():
+        entry = current.get(key)
+        if entry is None or entry["mtime"] != st.st_mtime or entry["size"] != st.st_size:
+            with open(key, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            entry = {"digest": digest, "size": st.st_size, "mtime": st.st_mtime}
+        target = blob_path(blob_dir, entry["digest"])
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(key, f"{target}.tmp")
+            os.replace(f"{target}.tmp", target)
+            copied += 1
+        entries[key] = entry
+
+    os.makedirs(blob_dir, exist_ok=True)
+    with open(f"{manifest_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(entries, f)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    return copied
+
+def make_asset_backend(paths, name=ASSET_BACKEND):
+    """Backend for these card images, building the pack or blob store first if it is out of date."""
+    if name == "pack":
+        build_pack(paths)
+        return PackAssetBackend()
+    if name == "blob":
+        build_blob_store(paths)
+        return BlobAssetBackend()
+    return LocalAssetBackend()
+
+
+class AssetStore:
+    """Card image bytes by path, for the render functions in image_helpers.
+
+    build_index() records size and mtime for every image in cards.json at startup, so existence
+    checks for catalog cards don't touch the disk. Reads go through an LRU of raw bytes bounded
+    by max_bytes.
+    """
+
+    def __init__(self, backend=None, max_bytes=ASSET_CACHE_MAX_BYTES):
+        self.backend = backend or LocalAssetBackend()
+        self.max_bytes = max_bytes
+        self.index = {}
+        self.cache = OrderedDict()
+        self.cache_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def attach(self, backend, paths):
+        """Switch backends and index these paths. Returns the ones that don't exist."""
+        previous = self.backend
+        self.backend = backend
+        self.cache.clear()
+        self.cache_bytes = 0
+        if previous is not backend:
+            previous.close()
+        return await self.build_index(paths)
+
+    async def build_index(self, paths):
+        keys = list(dict.fromkeys(asset_key(path) for path in paths))
+        infos = await self.backend.stat_many(keys)
+        self.index = {key: info for key, info in infos.items() if info is not None}
+        return [key for key in keys if infos.get(key) is None]
+
+    async def info(self, path):
+        """AssetInfo for this image, or None when it doesn't exist."""
+        key = asset_key(path)
+        info = self.index.get(key)
+        if info is None:
+            info = await self.backend.stat(key)
+            if info is not None:
+                self.index[key] = info
+        return info
+
+    async def exists(self, path):
+        return await self.info(path) is not None
+
+    async def read(self, path):
+        """The image's encoded bytes, or None when it doesn't exist."""
+        key = asset_key(path)
+        data = self.cache.get(key)
+        if data is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return data
+
+        self.misses += 1
+        if await self.info(key) is None:
+            return None
+        try:
+            data = await self.backend.read(key)
+        except OSError:
+            self.index.pop(key, None)
+            return None
+        self._put(key, data)
+        return data
+
+    def _put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        self.cache[key] = data
+        self.cache_bytes += len(data)
+        while self.cache_bytes > self.max_bytes:
+            _, evicted = self.cache.popitem(last=False)
+            self.cache_bytes -= len(evicted)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "indexed": len(self.index),
+            "cached": len(self.cache),
+            "cached_bytes": self.cache_bytes,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
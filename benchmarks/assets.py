@@ -0,0 +1,78 @@
+"""Card image read latency for each asset store backend in assets.py.
+
+Builds a pack and a blob store for the images in cards.json under a temporary directory, then
+reads random cards through each backend, with and without the AssetStore byte cache.
+
+Run from the repository root:
+    python -m benchmarks.assets [--reads 2000] [--json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from assets import (AssetStore, BlobAssetBackend, LocalAssetBackend, PackAssetBackend, build_blob_store,
+                    build_pack)
+
+
+def card_paths():
+    with open("cards.json", encoding="utf-8") as f:
+        return [card["image"] for card in json.load(f) if card.get("image")]
+
+async def bench(store, paths, reads, seed=0):
+    rng = random.Random(seed)
+    await store.build_index(paths)
+    timings = []
+    for _ in range(reads):
+        path = rng.choice(paths)
+        started = time.perf_counter()
+        data = await store.read(path)
+        timings.append(time.perf_counter() - started)
+        assert data is not None, path
+    timings.sort()
+    return {
+        "median_us": statistics.median(timings) * 1e6,
+        "p95_us": timings[int(len(timings) * 0.95)] * 1e6,
+        "hit_rate": store.stats()["hit_rate"],
+    }
+
+async def run(reads):
+    paths = card_paths()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        pack_path = os.path.join(tmp, "cards.pack")
+        blob_dir = os.path.join(tmp, "blobs")
+        build_pack(paths, pack_path)
+        build_blob_store(paths, blob_dir)
+        backends = {
+            "local": lambda: LocalAssetBackend(),
+            "pack": lambda: PackAssetBackend(pack_path),
+            "blob": lambda: BlobAssetBackend(blob_dir),
+        }
+        for name, make in backends.items():
+            for cached in (False, True):
+                backend = make()
+                store = AssetStore(backend, max_bytes=256 * 1024 * 1024 if cached else 0)
+                result = await bench(store, paths, reads)
+                backend.close()
+                results.append({"backend": name, "cache": cached, **result})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.reads))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'backend':<8} {'cache':<6} {'median us':>10} {'p95 us':>8} {'hit rate':>9}")
+        for row in results:
+            print(f"{row['backend']:<8} {str(row['cache']):<6} {row['median_us']:>10.1f} {row['p95_us']:>8.1f} {row['hit_rate']:>9.1%}")
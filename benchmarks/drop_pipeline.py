@@ -0,0 +1,322 @@
+"""Headless latency benchmark for !drop, claims, !view, !collection and !recycle.
+
+Runs the real command functions from bot.py against fake Discord objects (benchmarks/fakes.py)
+and either an in-memory asyncpg-style pool or, with --postgres, the database named by the DB_*
+variables. Use a scratch database for that: the benchmark claims and recycles cards for
+synthetic user ids.
+
+One session is a drop claimed by the dropper and two other users, then !view of the dropper's
+card, !collection and !recycle of that card. Each --concurrency level runs that many sessions at
+once, --rounds times. Claim latency includes the CLAIM_BATCH_WINDOW the bot waits for rivals.
+
+Reported per level: p50/p95/p99 per command, database round trips and event loop time blocked
+per command, time the event loop was blocked overall, and the process's peak RSS so far.
+
+Blocked time is charged to a command two ways. A loop callback running past LOOP_BLOCK_THRESHOLD
+counts for the command of the task it belongs to. Lag the probe sees outside any callback is the
+loop waiting for the GIL while render threads run. That lag is split between the commands with a
+render in flight at the time. Anything left over (bot background tasks) is reported as "other".
+
+Run from the repository root:
+    python -m benchmarks.drop_pipeline [--concurrency 1,10,100] [--rounds 3] [--json]
+"""
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import json
+import resource
+import sys
+import time
+from collections import Counter, defaultdict
+
+from benchmarks.fakes import FakeChannel, FakeContext, FakePool, FakeReaction, FakeUser
+from card_atlas import ATLAS_DIR, attach_atlases, build_atlases
+from database import create_pool
+from image_helpers import use_atlases
+from migrate import db_config, pending_migrations
+
+COMMANDS = ["drop", "claim", "view", "collection", "recycle"]
+LOOP_PROBE_INTERVAL = 0.005
+LOOP_BLOCK_THRESHOLD = 0.001  # callbacks (and probe lag) shorter than this don't count as blocking
+FIRST_USER_ID = 900_000_000_000_000_000  # far above real Discord ids
+
+# Mutable holder shared with every task a session starts, so round trips made inside the drop
+# task count as "drop" until the reactions go in and as "claim" after
+current_command = contextvars.ContextVar("current_command")
+
+# Render jobs in the executor right now, by the command that queued them
+offloaded = Counter()
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+def peak_rss_mib():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def count_round_trips(db, counts):
+    """Attribute every statement Database runs to the command in current_command."""
+    run = db._run
+
+    async def counted(name, method, args, conn=None):
+        if conn is not None:
+            holder = current_command.get(None)
+            if holder:
+                counts[holder[0]] += 1
+        return await run(name, method, args, conn)
+
+    db._run = counted
+
+def count_offloaded(render_service):
+    """Keep `offloaded` up to date with the render jobs each command has in the executor."""
+    render = render_service.render
+
+    async def tracked(kind, func, *args):
+        holder = current_command.get(None)
+        command = holder[0] if holder else None
+        offloaded[command] += 1
+        try:
+            return await render(kind, func, *args)
+        finally:
+            offloaded[command] -= 1
+
+    render_service.render = tracked
+
+
+class LoopMonitor:
+    """Samples how late a short sleep wakes up; anything past the interval is time the loop was blocked.
+
+    While active it also times every loop callback, to charge the blocked time to commands
+    (see the module docstring). by_command is keyed by command, None for "other".
+    """
+
+    def __init__(self, interval=LOOP_PROBE_INTERVAL):
+        self.interval = interval
+        self.blocked = 0.0
+        self.max_lag = 0.0
+        self.by_command = defaultdict(float)
+        self.in_callbacks = 0.0  # callback time since the probe last woke up
+        self.task = None
+        self.run = None
+
+    def _timed_run(self, handle):
+        started = time.perf_counter()
+        try:
+            self.run(handle)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.in_callbacks += elapsed
+            if elapsed > LOOP_BLOCK_THRESHOLD:
+                # asyncio runs each task step in its task's context
+                holder = handle._context.get(current_command, None)
+                self.by_command[holder[0] if holder else None] += elapsed
+
+    async def _probe(self):
+        while True:
+            started = time.perf_counter()
+            self.in_callbacks = 0.0
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - started - self.interval
+            if lag > LOOP_BLOCK_THRESHOLD:
+                self.blocked += lag
+                self.max_lag = max(self.max_lag, lag)
+                self._charge_waiting(lag - self.in_callbacks)
+
+    def _charge_waiting(self, waiting):
+        if waiting <= LOOP_BLOCK_THRESHOLD:
+            return
+        renders = {command: count for command, count in offloaded.items() if count > 0}
+        if not renders:
+            self.by_command[None] += waiting
+            return
+        total = sum(renders.values())
+        for command, count in renders.items():
+            self.by_command[command] += waiting * count / total
+
+    def __enter__(self):
+        monitor = self
+        self.run = asyncio.events.Handle._run
+        asyncio.events.Handle._run = lambda handle: monitor._timed_run(handle)
+        self.task = asyncio.create_task(self._probe())
+        return self
+
+    def __exit__(self, *exc):
+        self.task.cancel()
+        asyncio.events.Handle._run = self.run
+
+
+def is_drop_message(message):
+    return message.embed is not None and message.embed.title == "✨ Card Drop! ✨"
+
+async def timed(timings, command, coro):
+    started = time.perf_counter()
+    await coro
+    timings[command].append(time.perf_counter() - started)
+
+async def session(user_id, timings, outcomes):
+    holder = ["drop"]
+    current_command.set(holder)
+    dropper, rivals = FakeUser(user_id), [user_id + 1, user_id + 2]
+    ctx = FakeContext(dropper, FakeChannel(bot.CHANNEL_ID))
+
+    started = time.perf_counter()
+    drop_task = asyncio.create_task(bot.drop.callback(ctx))
+    shown = asyncio.create_task(ctx.channel.wait_for_message(is_drop_message))
+    await asyncio.wait({drop_task, shown}, return_when=asyncio.FIRST_COMPLETED)
+    if not shown.done():
+        # Turned away before rendering (render queue full)
+        shown.cancel()
+        outcomes["rejected"] += 1
+        return
+    message = shown.result()
+    timings["drop"].append(time.perf_counter() - started)
+
+    holder[0] = "claim"
+    started = time.perf_counter()
+    for user, emoji in zip([user_id, *rivals], ["🫰", "🫶", "🥰"]):
+        await bot.reaction_router.dispatch(FakeReaction(message, user, emoji))
+    await drop_task
+    timings["claim"].append(time.perf_counter() - started)
+
+    page = await bot.db.collection_page(user_id, limit=1)
+    if not page:
+        outcomes["unclaimed"] += 1
+        return
+    card_uid = page[0]["card_uid"]
+
+    holder[0] = "view"
+    await timed(timings, "view", bot.view.callback(ctx, card_uid))
+    holder[0] = "collection"
+    await timed(timings, "collection", bot.collection.callback(ctx))
+    holder[0] = "recycle"
+    await timed(timings, "recycle", bot.recycle.callback(ctx, card_uid))
+    outcomes["completed"] += 1
+
+async def run_level(concurrency, rounds, next_user_id, round_trips):
+    timings = defaultdict(list)
+    outcomes = defaultdict(int)
+    round_trips.clear()
+
+    started = time.perf_counter()
+    with LoopMonitor() as monitor:
+        for _ in range(rounds):
+            user_ids = [next_user_id() for _ in range(concurrency)]
+            await asyncio.gather(*(session(user_id, timings, outcomes) for user_id in user_ids))
+    wall = time.perf_counter() - started
+
+    commands = {}
+    for command in COMMANDS:
+        samples = timings[command]
+        commands[command] = {
+            "count": len(samples),
+            "p50_ms": percentile(samples, 0.50) * 1000,
+            "p95_ms": percentile(samples, 0.95) * 1000,
+            "p99_ms": percentile(samples, 0.99) * 1000,
+            "round_trips": round_trips[command] / len(samples) if samples else 0.0,
+            "loop_blocked_ms": monitor.by_command[command] * 1000 / len(samples) if samples else 0.0,
+        }
+    return {
+        "concurrency": concurrency,
+        "sessions": concurrency * rounds,
+        "outcomes": dict(outcomes),
+        "wall_s": wall,
+        "loop_blocked_ms": monitor.blocked * 1000,
+        "loop_max_lag_ms": monitor.max_lag * 1000,
+        "loop_blocked_other_ms": monitor.by_command[None] * 1000,
+        "peak_rss_mib": peak_rss_mib(),
+        "commands": commands,
+    }
+
+async def prepare(args):
+    """Point the bot's globals at the chosen database and card image caches."""
+    if args.postgres:
+        pool = await create_pool(**db_config())
+        async with pool.acquire() as conn:
+            pending = await pending_migrations(conn)
+            if pending:
+                raise SystemExit(f"Apply pending migrations first: {', '.join(m.name for m in pending)}")
+            await bot.mythic_registry.load(conn)
+            await bot.score_index.load(conn)
+            await bot.wishlist_index.load(conn)
+    else:
+        pool = FakePool(latency=args.db_latency_ms / 1000)
+        # Nothing minted or wished for yet, as if loaded from an empty database
+        bot.mythic_registry.loaded = True
+        bot.score_index.loaded = True
+        bot.wishlist_index.loaded = True
+    bot.db.pool = pool
+
+    announcements = FakeChannel(bot.CHANNEL_ID)
+    bot.bot.get_channel = lambda channel_id: announcements
+    bot.PRIORITY_WINDOW = 0  # rivals claim straight away instead of waiting out the dropper's 10 s
+    bot.DROP_IDLE_WINDOW = 5
+    if args.render_queue:
+        bot.render_service.max_pending = args.render_queue
+
+    card_paths = [card.image for card in bot.catalog]
+    if args.images == "warm":
+        await bot.warm_card_images()
+    elif args.images == "atlas":
+        atlases = await asyncio.to_thread(build_atlases, card_paths, [bot.FRAME_PATH, bot.MYTHIC_FRAME_PATH])
+        use_atlases(atlases)
+        bot.render_service.init_workers(attach_atlases, ATLAS_DIR, [atlas.name for atlas in atlases])
+    return pool
+
+async def main(args):
+    pool = await prepare(args)
+    round_trips = defaultdict(int)
+    count_round_trips(bot.db, round_trips)
+    count_offloaded(bot.render_service)
+    user_ids = iter(range(FIRST_USER_ID, FIRST_USER_ID + 10**9, 3))
+
+    results = {
+        "database": "postgres" if args.postgres else f"fake ({args.db_latency_ms} ms round trip)",
+        "images": args.images,
+        "render_queue": bot.render_service.max_pending,
+        "levels": [],
+    }
+    try:
+        for concurrency in args.concurrency:
+            level = await run_level(concurrency, args.rounds, lambda: next(user_ids), round_trips)
+            results["levels"].append(level)
+            if not args.json:
+                print_level(level)
+    finally:
+        await pool.close()
+        bot.render_service.shutdown()
+    return results
+
+def print_level(level):
+    outcomes = ", ".join(f"{count} {name}" for name, count in sorted(level["outcomes"].items()))
+    print(f"\nconcurrency {level['concurrency']}: {level['sessions']} sessions ({outcomes}) in {level['wall_s']:.1f}s, "
+          f"loop blocked {level['loop_blocked_ms']:.0f} ms (max {level['loop_max_lag_ms']:.0f} ms, "
+          f"{level['loop_blocked_other_ms']:.0f} ms outside the commands), "
+          f"peak RSS {level['peak_rss_mib']:.0f} MiB")
+    print(f"{'command':<11} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'round trips':>12} {'blocked ms':>11}")
+    for command, row in level["commands"].items():
+        print(f"{command:<11} {row['count']:>6} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} "
+              f"{row['round_trips']:>12.1f} {row['loop_blocked_ms']:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="1,10,100", help="comma separated simultaneous sessions per level")
+    parser.add_argument("--rounds", type=int, default=3, help="times each level is repeated")
+    parser.add_argument("--postgres", action="store_true", help="use the DB_* database instead of the in-memory pool")
+    parser.add_argument("--db-latency-ms", type=float, default=0.5, help="simulated round trip of the in-memory pool")
+    parser.add_argument("--images", choices=["cold", "atlas", "warm"], default="atlas",
+                        help="cold: no caches; atlas: drop atlases only; warm: everything the bot warms on startup")
+    parser.add_argument("--render-queue", type=int, default=0, help="override RENDER_MAX_PENDING")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+    args.concurrency = [int(level) for level in args.concurrency.split(",")]
+
+    # The bot logs to stdout from import on; send that to stderr so --json output stays parseable
+    with contextlib.redirect_stdout(sys.stderr if args.json else sys.stdout):
+        import bot
+        results = asyncio.run(main(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
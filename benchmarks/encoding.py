@@ -0,0 +1,57 @@
+"""Size/latency benchmark for the upload encoding profiles in image_helpers.IMAGE_PROFILES.
+
+Run from the repository root:
+    python -m benchmarks.encoding [--runs 5] [--json]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from image_helpers import IMAGE_PROFILES, apply_frame, drop_card_size, encode_image, merge_cards_horizontally
+
+FRAME_PATH = "./images/frame.png"
+
+
+def sample_images(seed=0):
+    with open("cards.json", encoding="utf-8") as f:
+        cards = json.load(f)
+    picked = random.Random(seed).sample(cards, 3)
+    size, spacing = drop_card_size(3)
+    drop = merge_cards_horizontally([apply_frame(card["image"], FRAME_PATH, size) for card in picked], spacing=spacing, max_width=800)
+    view = apply_frame(picked[0]["image"], FRAME_PATH)
+    return {"drop": drop, "view": view}
+
+def run(runs):
+    results = []
+    for image_name, image in sample_images().items():
+        for profile in IMAGE_PROFILES:
+            timings = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                data = encode_image(image, profile)
+                timings.append(time.perf_counter() - started)
+            results.append({
+                "image": image_name,
+                "profile": profile,
+                "bytes": len(data),
+                "median_ms": statistics.median(timings) * 1000,
+                "min_ms": min(timings) * 1000,
+            })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = run(args.runs)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'image':<6} {'profile':<14} {'KiB':>8} {'median ms':>10} {'min ms':>8}")
+        for row in results:
+            print(f"{row['image']:<6} {row['profile']:<14} {row['bytes'] / 1024:>8.1f} {row['median_ms']:>10.1f} {row['min_ms']:>8.1f}")
@@ -0,0 +1,310 @@
+"""Stand-ins for Discord and Postgres so the bot's commands can run headless (see drop_pipeline.py).
+
+FakePool speaks the subset of the asyncpg pool/connection API that database.Database uses and
+answers each statement in database.QUERIES from in-memory tables, with a configurable round-trip
+delay. Statements it doesn't know raise NotImplementedError rather than guessing.
+"""
+import asyncio
+import itertools
+from datetime import datetime, timezone
+
+from card_uids import encode_uid
+from database import COLLECTION_SORTS, QUERIES
+
+RARITY_RANKS = {"Common": 1, "Rare": 2, "Epic": 3, "Legendary": 4, "Mythic": 5}  # rarity_rank(), unknown last
+RECYCLE_VALUES = {"Common": 5, "Rare": 10, "Epic": 20, "Legendary": 50, "Mythic": 150}  # recycle_value()
+
+_message_ids = itertools.count(10_000_000)
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+        self.name = self.display_name = f"user{user_id}"
+        self.bot = False
+
+
+class FakeMessage:
+    def __init__(self, channel, content=None, embed=None, file=None, view=None):
+        self.id = next(_message_ids)
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+        self.file = file
+        self.view = view
+        self.reactions = []
+
+    async def add_reaction(self, emoji):
+        self.reactions.append(emoji)
+
+    async def edit(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    async def delete(self):
+        pass
+
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.messages = []
+        self.waiters = []
+
+    async def send(self, content=None, *, embed=None, file=None, view=None, **_):
+        message = FakeMessage(self, content, embed, file, view)
+        self.messages.append(message)
+        for waiter in list(self.waiters):
+            predicate, future = waiter
+            if not future.done() and predicate(message):
+                future.set_result(message)
+                self.waiters.remove(waiter)
+        return message
+
+    async def wait_for_message(self, predicate, timeout=None):
+        """The first message (already sent or still to come) matching predicate."""
+        for message in self.messages:
+            if predicate(message):
+                return message
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append((predicate, future))
+        return await asyncio.wait_for(future, timeout)
+
+
+class FakeContext:
+    """What the commands use of commands.Context."""
+
+    def __init__(self, author, channel):
+        self.author = author
+        self.channel = channel
+        self.guild = None
+
+    async def send(self, content=None, **fields):
+        return await self.channel.send(content, **fields)
+
+
+class FakeReaction:
+    """A RawReactionActionEvent as the reaction router sees it."""
+
+    def __init__(self, message, user_id, emoji):
+        self.message_id = message.id
+        self.channel_id = message.channel.id
+        self.user_id = user_id
+        self.emoji = emoji
+
+
+class FakeTables:
+    """In-memory users, user_items and user_cards with one handler per QUERIES name."""
+
+    def __init__(self):
+        self.users = {}
+        self.items = {}
+        self.cards = {}
+        self.card_ids = itertools.count(1)
+        self.uid_values = itertools.count(1)
+        self.short_ids = {}
+        self.editions = {}
+
+    def handle(self, name, args):
+        kind = name.split(":")[0]
+        handler = getattr(self, f"q_{kind}", None)
+        if handler is None:
+            raise NotImplementedError(f"FakePool has no handler for query {name!r}")
+        return handler(name, *args)
+
+    def _user_cards(self, user_id):
+        return [card for card in self.cards.values() if card["user_id"] == user_id]
+
+    def _uid_matches(self, card, card_uids):
+        return card["card_uid_norm"] in card_uids or card["legacy_uid"] in card_uids
+
+    # users and items
+
+    def q_profiles(self, name, user_ids):
+        rows = []
+        for user_id in user_ids:
+            user = self.users.get(user_id)
+            rows.append({
+                "user_id": user_id,
+                "has_account": user is not None,
+                "coins": user["coins"] if user else None,
+                "emoji": user["emoji"] if user else None,
+                "last_daily": user["last_daily"] if user else None,
+                "items": dict(self.items.get(user_id, {})),
+            })
+        return rows
+
+    def q_lock_item(self, name, user_id, item):
+        return self.items.get(user_id, {}).get(item)
+
+    def q_use_item(self, name, user_id, item):
+        self.items[user_id][item] -= 1
+
+    # cards
+
+    def q_claim_cards(self, name, user_ids, name_codes, member_names, group_names, concepts, rarities, image_paths, use_items):
+        rows = []
+        now = datetime.now(timezone.utc)
+        for i, user_id in enumerate(user_ids):
+            if use_items[i]:
+                if self.items.get(user_id, {}).get("extra_claim", 0) <= 0:
+                    continue
+                self.items[user_id]["extra_claim"] -= 1
+            short_id = self.short_ids[user_id] = self.short_ids.get(user_id, 0) + 1
+            edition_key = (user_id, member_names[i], rarities[i], concepts[i])
+            edition = self.editions[edition_key] = self.editions.get(edition_key, 0) + 1
+            card_uid = encode_uid(next(self.uid_values))
+            card_id = next(self.card_ids)
+            self.cards[card_id] = {
+                "id": card_id, "user_id": user_id, "card_uid": card_uid, "card_uid_norm": card_uid,
+                "legacy_uid": None, "short_id": short_id, "edition": edition, "member_name": member_names[i],
+                "group_name": group_names[i], "concept": concepts[i], "rarity": rarities[i],
+                "image_path": image_paths[i], "date_obtained": now, "custom_tag": None,
+                "member_key": member_names[i].lower(), "group_key": group_names[i].lower(),
+            }
+            rows.append({"claimed_user_id": user_id, "claimed_uid": card_uid,
+                         "claimed_short_id": short_id, "claimed_edition": edition})
+        return rows
+
+    def q_card(self, name, user_id, card_uid):
+        for card in self._user_cards(user_id):
+            if self._uid_matches(card, (card_uid,)):
+                return dict(card)
+        return None
+
+    def q_card_by_id(self, name, card_id, user_id, card_uid):
+        card = self.cards.get(card_id)
+        if card and card["user_id"] == user_id and card["card_uid_norm"] == card_uid:
+            return dict(card)
+        return None
+
+    def q_cards(self, name, user_id, card_uids):
+        return [dict(card) for card in sorted(self._user_cards(user_id), key=lambda card: card["id"]) if self._uid_matches(card, card_uids)]
+
+    def q_recycle_candidates(self, name, user_id, rarities, tags, card_uids):
+        return [
+            dict(card) for card in sorted(self._user_cards(user_id), key=lambda card: card["id"])
+            if card["rarity"] in rarities or card["custom_tag"] in tags or self._uid_matches(card, card_uids)
+        ]
+
+    def q_recycle_cards(self, name, user_id, card_ids):
+        rows = []
+        for card_id in sorted(card_ids):
+            card = self.cards.get(card_id)
+            if card is None or card["user_id"] != user_id:
+                continue
+            del self.cards[card_id]
+            rows.append({**card, "aura": RECYCLE_VALUES.get(card["rarity"], 1)})
+        if rows:
+            user = self.users.setdefault(user_id, {"coins": 0, "emoji": None, "last_daily": None})
+            user["coins"] = (user["coins"] or 0) + sum(row["aura"] for row in rows)
+        return rows
+
+    def q_member_wishes(self, name, names):
+        return []
+
+    # !collection
+
+    def _filtered(self, filter_kind, user_id, value):
+        cards = self._user_cards(user_id)
+        if filter_kind == "rarity":
+            return [card for card in cards if card["rarity"] == value]
+        if filter_kind == "name":
+            return [card for card in cards if value in (card["group_key"], card["member_key"])]
+        return cards
+
+    def q_collection_count(self, name, user_id, *args):
+        return len(self._filtered(name.split(":")[1], user_id, args[0] if args else None))
+
+    def q_collection(self, name, user_id, *args):
+        parts = name.split(":")
+        sort_key, filter_kind, after = parts[1], parts[2], len(parts) == 4
+        columns, direction, fields = COLLECTION_SORTS[sort_key]
+        args = list(args)
+        value = args.pop(0) if filter_kind != "all" else None
+        cursor = args[:len(fields)] if after else None
+        limit = args[-1]
+
+        def key(card):
+            return tuple(RARITY_RANKS.get(card[field], 99) if field == "rarity" else card[field] for field in fields)
+
+        rows = sorted(self._filtered(filter_kind, user_id, value), key=key, reverse=direction == "DESC")
+        if cursor is not None:
+            mark = key(dict(zip(fields, cursor)))
+            rows = [card for card in rows if (key(card) < mark if direction == "DESC" else key(card) > mark)]
+        return [dict(card) for card in rows[:limit]]
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def _query(self, sql, args):
+        name = self.pool.names.get(sql)
+        if name is None:
+            raise NotImplementedError(f"FakePool only answers database.QUERIES, got: {sql.strip()[:60]}")
+        self.pool.round_trips += 1
+        if self.pool.latency:
+            await asyncio.sleep(self.pool.latency)
+        return self.pool.tables.handle(name, args)
+
+    async def fetch(self, sql, *args):
+        return await self._query(sql, args) or []
+
+    async def fetchrow(self, sql, *args):
+        return await self._query(sql, args)
+
+    async def fetchval(self, sql, *args):
+        result = await self._query(sql, args)
+        if isinstance(result, list):
+            result = result[0] if result else None
+        if isinstance(result, dict):
+            return next(iter(result.values()))
+        return result
+
+    async def execute(self, sql, *args):
+        await self._query(sql, args)
+        return "OK"
+
+    def transaction(self):
+        return _NoTransaction()
+
+
+class _NoTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _Acquire:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def __aenter__(self):
+        await self.pool.slots.acquire()
+        return FakeConnection(self.pool)
+
+    async def __aexit__(self, *exc):
+        self.pool.slots.release()
+        return False
+
+
+class FakePool:
+    """asyncpg-style pool over FakeTables. `latency` is the simulated round trip in seconds and
+    max_size caps concurrent connections like asyncpg's pool (default 10)."""
+
+    def __init__(self, latency=0.0005, max_size=10):
+        self.tables = FakeTables()
+        self.names = {sql: name for name, sql in QUERIES.items()}
+        self.latency = latency
+        self.slots = asyncio.Semaphore(max_size)
+        self.round_trips = 0
+
+    def acquire(self):
+        return _Acquire(self)
+
+    async def close(self):
+        pass
@@ -0,0 +1,93 @@
+"""Reaction dispatch cost with many drops open at once.
+
+Compares the reaction router (dict lookup by message_id) with the old approach where every
+pending bot.wait_for check closure ran against every reaction event.
+
+Run from the repository root:
+    python -m benchmarks.reaction_router [--events 20000] [--json]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from types import SimpleNamespace
+
+from reaction_router import ReactionRouter
+
+REACTIONS = ["🫰", "🫶", "🥰"]
+OPEN_DROPS = [1, 10, 100, 500, 1000]
+
+
+def make_events(message_ids, count, seed=0):
+    rng = random.Random(seed)
+    return [
+        SimpleNamespace(message_id=rng.choice(message_ids), user_id=rng.randrange(10_000), emoji=rng.choice(REACTIONS))
+        for _ in range(count)
+    ]
+
+async def bench_router(drops, events):
+    router = ReactionRouter()
+    queues = {}
+    for message_id in range(drops):
+        queue = asyncio.Queue()
+        queues[message_id] = queue
+
+        async def queue_claim(payload, queue=queue):
+            if str(payload.emoji) in REACTIONS:
+                queue.put_nowait(payload)
+
+        router.register(message_id, queue_claim)
+
+    started = time.perf_counter()
+    for payload in events:
+        await router.dispatch(payload)
+    elapsed = time.perf_counter() - started
+    delivered = sum(queue.qsize() for queue in queues.values())
+    return elapsed, delivered
+
+def bench_wait_for(drops, events):
+    # discord.py keeps a list of (future, check) per event name and runs every check
+    listeners = []
+    for message_id in range(drops):
+        def check(payload, message_id=message_id):
+            return payload.message_id == message_id and payload.user_id != -1 and str(payload.emoji) in REACTIONS
+        listeners.append(check)
+
+    delivered = 0
+    started = time.perf_counter()
+    for payload in events:
+        for check in listeners:
+            if check(payload):
+                delivered += 1
+    return time.perf_counter() - started, delivered
+
+async def run(event_count):
+    results = []
+    for drops in OPEN_DROPS:
+        events = make_events(list(range(drops)), event_count)
+        router_elapsed, router_delivered = await bench_router(drops, events)
+        wait_for_elapsed, wait_for_delivered = bench_wait_for(drops, events)
+        assert router_delivered == wait_for_delivered
+        results.append({
+            "open_drops": drops,
+            "events": event_count,
+            "router_us_per_event": router_elapsed / event_count * 1e6,
+            "wait_for_us_per_event": wait_for_elapsed / event_count * 1e6,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.events))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'open drops':>10} {'router us/event':>16} {'wait_for us/event':>18}")
+        for row in results:
+            print(f"{row['open_drops']:>10} {row['router_us_per_event']:>16.2f} {row['wait_for_us_per_event']:>18.2f}")
@@ -3,15 +3,31 @@ import discord
 import os
 import io
 from dotenv import load_dotenv
-from json_data_helpers import card_collection, load_collections, ensure_card_ids
+from json_data_helpers import load_collections, ensure_card_ids
 import random
-from image_helpers import apply_frame, merge_cards_horizontally, resize_image
+from image_helpers import framed_card_bytes, image_filename, warm_frame_cache, render_drop, drop_card_size, use_atlases
+from card_atlas import ATLAS_DIR, attach_atlases, build_atlases
+from card_catalog import load_catalog
+from mythic_registry import LimitedMythicRegistry
+from leaderboard import ScoreIndex
+from wishlist_index import WishlistIndex
+from reaction_router import ReactionRouter
+from claim_arbiter import ClaimAttempt, arbitrate
+from trades import TradeEngine
+from assets import AssetStore, make_asset_backend
+from scheduler import scheduler
+from cooldowns import CooldownStore, make_cooldown_backend
+from profile_cache import ProfileCache
+from database import Database, create_pool
+from card_uids import is_reserved_uid, typo_hint
+from migrate import apply_migrations, pending_migrations, connect as connect_db, db_config
+from render_service import RenderService, RenderBusy
 import asyncio
+import functools
 import time
 from collections import defaultdict
 from utils.paginator import CollectionView
 from utils.shop import ShopView
-import asyncpg
 from datetime import datetime, timezone, timedelta
 from utils.pagination import HelpPaginator
 from utils.recycle import ConfirmRecycleView
@@ -29,11 +45,15 @@ bot = commands.Bot(command_prefix="!", intents=discord.Intents.all(), case_insen
 bot.remove_command('help')
 
 # Load cards database at startup
-cards = card_collection()
+catalog = load_catalog()
+mythic_registry = LimitedMythicRegistry(catalog)
 
 user_collections = defaultdict(list, ensure_card_ids(load_collections()))
 
 PRIORITY_WINDOW = 10  # Seconds only the dropper can claim
+DROP_IDLE_WINDOW = 120  # Seconds a drop stays open after the last claim
+CLAIM_BATCH_WINDOW = float(os.getenv("CLAIM_BATCH_WINDOW", 0.3))  # Seconds of reactions settled together
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "0") == "1"  # Apply pending migrations/ on startup; off by default, deploys run `python migrate.py`
 
 
 # RARITY TIER AND POINTS
@@ -53,15 +73,20 @@ RARITY_POINTS = {
     "Mythic": 150
 }
 
-# leaderboard
-leaderboard_cache = {}
-last_cache_update = 0
-CACHE_DURATION = 300  # 5 minutes
+# leaderboard (mirror of user_scores, see migrations/002_user_scores.sql)
+score_index = ScoreIndex()
 
-# INITIALIZE COOLDOWNS
-user_cooldowns = {}
-drop_cooldowns = {}
-claim_cooldowns = {}
+# wishlists (mirror of the wishlists table, kept in sync by !wishlist)
+wishlist_index = WishlistIndex()
+
+# INITIALIZE COOLDOWNS ("drop" and "claim", backend picked by COOLDOWN_BACKEND)
+cooldowns = CooldownStore()
+
+# every SQL statement the commands run, prepared per connection (see database.py)
+db = Database()
+
+# coins, tag emoji, last daily and items per user (see profile_cache.py)
+profiles = ProfileCache(db)
 
 # COOLDOWN TIMERS
 DROP_COOLDOWN_DURATION = 1800 # 30 MINS
@@ -69,17 +94,30 @@ COOLDOWN_DURATION = 900 # 15 MINS
 
 
 db_pool = None
+render_service = RenderService()
+# card image bytes for !view and !trade (backend picked by ASSET_BACKEND)
+assets = AssetStore()
+reaction_router = ReactionRouter()
+
+# open trade offers, logged in the trades table and expired by one shared task (see trades.py)
+trades = TradeEngine(db, reaction_router)
 
 # bot connect
 async def get_db_pool():
-    return await asyncpg.create_pool(
-        host=os.getenv("DB_HOST"),
-        port=int(os.getenv("DB_PORT")),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        database=os.getenv("DB_NAME"),
-        ssl="require"
-    )
+    return await create_pool(**db_config())
+
+# Migrations can rewrite user data (010 re-issues card UIDs), so by default they are only reported here
+async def migrate_schema():
+    conn = await connect_db()
+    try:
+        if AUTO_MIGRATE:
+            await apply_migrations(conn)
+        else:
+            pending = await pending_migrations(conn)
+            if pending:
+                print(f"⚠️ Not applying pending migrations: {', '.join(m.name for m in pending)} (run `python migrate.py`, or set AUTO_MIGRATE=1)")
+    finally:
+        await conn.close()
 
 def assign_rarity():
     roll = random.randint(1, 100)
@@ -90,298 +128,305 @@ def assign_rarity():
             return rarity
     return "Common"  # Fallback
 
-# choose rarity
-async def choose_rarity_for_card(card, conn):
+# choose rarity (conn is only needed while the limited mythic registry is still loading)
+async def choose_rarity_for_card(card, conn=None):
     rarity = assign_rarity()
 
-    # Unified name (JSON + database both use is_limited_mythic)
-    is_limited = card.get("is_limited_mythic") in (1, True, "1")
-
-    if rarity == "Mythic" and is_limited:
-        existing = await conn.fetchval("""
-            SELECT COUNT(*)
-            FROM user_cards
-            WHERE member_name = $1
-              AND concept = $2
-              AND rarity = 'Mythic'
-        """, card['name'], card.get("concept", "Base"))
-
-        if existing >= 1:
+    if rarity == "Mythic" and card.is_limited_mythic:
+        if await mythic_registry.is_minted(card.name, card.concept, conn):
             # reroll until rarity is NOT mythic
             while rarity == "Mythic":
                 rarity = assign_rarity()
 
     return rarity
 
-def get_card_by_emoji(emoji, dropped_cards):
-    for card in dropped_cards:
-        if card['reaction'] == emoji:
-            return card
-    return None
-
-def generate_card_uid(name, short_id, edition):
-    name_code = ''.join(filter(str.isalpha, name.upper()))[:4]
-    return f"{name_code}{short_id:02}{edition:02}"
+def card_name_code(name):
+    return ''.join(filter(str.isalpha, name.upper()))[:4]
 
 @bot.event
 async def on_ready():
     global db_pool
     if db_pool is None:
-        db_pool = await asyncpg.create_pool(
-            host=os.getenv("DB_HOST"),
-            port = int(os.getenv("DB_PORT", 5432)),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME"),
-            ssl="require"
-        )
+        await migrate_schema()
+        db_pool = await get_db_pool()
+        async with db_pool.acquire() as conn:
+            await mythic_registry.load(conn)
+            await score_index.load(conn)
+            await wishlist_index.load(conn)
+        await cooldowns.attach(make_cooldown_backend(pool=db_pool))
+        db.pool = db_pool
+        await trades.start(handle_trade_reaction, trade_expired)
+        print(f"Wishlist index loaded: {wishlist_index.stats()}")
         await bot.change_presence(activity=discord.Game(name="!drop to play"))
+        asyncio.create_task(warm_card_images())
     print(f"Mingyu Bot ready and connected to DB!")
 
+# Index the card images, build the drop-size card atlases and pre-render full size framed cards for !view and !trade
+async def warm_card_images():
+    card_paths = [card.image for card in catalog]
+    started = time.perf_counter()
+    missing = await assets.attach(await asyncio.to_thread(make_asset_backend, card_paths), card_paths)
+    print(f"Card images indexed from the {assets.backend.name} store ({len(missing)} missing)")
+    atlases = await asyncio.to_thread(build_atlases, card_paths, [FRAME_PATH, MYTHIC_FRAME_PATH])
+    use_atlases(atlases)
+    render_service.init_workers(attach_atlases, ATLAS_DIR, [atlas.name for atlas in atlases])
+    rendered = await asyncio.to_thread(warm_frame_cache, card_paths, [FRAME_PATH, MYTHIC_FRAME_PATH])
+    print(f"Framed card cache warm: {rendered} rendered in {time.perf_counter() - started:.1f}s")
+
 # drop command !drop
 @bot.command()
 @commands.cooldown(1, 5, commands.BucketType.user)  # 1 use per 5 seconds per user
 async def drop(ctx):
     user_id = ctx.author.id
     channel = bot.get_channel(CHANNEL_ID)
-    now = time.time()
     used_extra_drop = False
-    used_extra_claim = False
 
     # Send a message if !drop is used in the wrong channel
     if ctx.channel.id != CHANNEL_ID:
         await ctx.send(f"Hey! The photocards are not in this area.")
         return
+
+    if render_service.saturated:
+        await ctx.send("🖼️ Too many drops are being printed right now, please try again in a moment!")
+        return
     
     # Check dropper cooldown
-    if user_id in drop_cooldowns:
-        elapsed = now - drop_cooldowns[user_id]
-        if elapsed < DROP_COOLDOWN_DURATION:
-            async with db_pool.acquire() as conn:
-                item = await conn.fetchrow("""
-                    SELECT quantity FROM user_items
-                    WHERE user_id = $1 AND item = 'extra_drop'
-                """, user_id)
-
-            async with db_pool.acquire() as conn:
-                async with conn.transaction():
-                    item = await conn.fetchrow("""
-                        SELECT quantity FROM user_items
-                        WHERE user_id = $1 AND item = 'extra_drop' FOR UPDATE
-                    """, user_id)
-
-                    if item and item["quantity"] > 0:
-                        await conn.execute("""
-                            UPDATE user_items
-                            SET quantity = quantity - 1
-                            WHERE user_id = $1 AND item = 'extra_drop'
-                        """, user_id)
-                        used_extra_drop = True
-                        await ctx.send(f"🎴 {ctx.author.mention}, you used an **Extra Drop**! No cooldown applied.")
-                    
-                    else:
-                        remaining = int(DROP_COOLDOWN_DURATION - elapsed)
-                        hours, remainder = divmod(remaining, 3600)
-                        minutes, seconds = divmod(remainder, 60)
-                        await ctx.send(f"⏳ {ctx.author.mention} you can drop again in **{hours}h {minutes}m {seconds}s** ⏳")
-                        return
+    drop_remaining = await cooldowns.check("drop", user_id)
+    if drop_remaining > 0:
+        profile = await profiles.get(user_id)
+
+        async with db.acquire() as conn:
+            async with conn.transaction():
+                quantity = 0
+                if profile.item("extra_drop") > 0:
+                    quantity = await db.lock_item(user_id, "extra_drop", conn)
+
+                if quantity > 0:
+                    await db.use_item(user_id, "extra_drop", conn)
+                    used_extra_drop = True
+                    profiles.invalidate(user_id)
+                    await ctx.send(f"🎴 {ctx.author.mention}, you used an **Extra Drop**! No cooldown applied.")
+                
+                else:
+                    remaining = int(drop_remaining)
+                    hours, remainder = divmod(remaining, 3600)
+                    minutes, seconds = divmod(remainder, 60)
+                    await ctx.send(f"⏳ {ctx.author.mention} you can drop again in **{hours}h {minutes}m {seconds}s** ⏳")
+                    return
     
     # Announce user is dropping cards
     drop_message = await channel.send(f"🚨 {ctx.author.mention} came to drop some photocards! 🚨")
-    print("Cards available for dropping: ", cards)
 
     dropper_id = ctx.author.id
     drop_time = time.time()
 
     dropped_cards = []
+    claimed = {}
     reactions = ["🫰", "🫶", "🥰"]
-    # Randomly select 3 cards from database
-    selected_cards = random.sample(cards, 3)
+    # Randomly select 3 cards from the catalog
+    selected_cards = catalog.sample(3)
 
-    async with db_pool.acquire() as conn:
+    # Every card reserved below is released in the finally unless someone claimed it, so a
+    # limited mythic can drop again whatever ends the drop
+    try:
         for i, card in enumerate(selected_cards):
-            rarity = await choose_rarity_for_card(card, conn)
-            card_copy = card.copy()
+            if card.is_limited_mythic and not mythic_registry.loaded:
+                async with db.acquire() as conn:
+                    rarity = await choose_rarity_for_card(card, conn)
+            else:
+                rarity = await choose_rarity_for_card(card)
+            card_copy = card.to_dict()
             card_copy['rarity'] = rarity
             card_copy['reaction'] = reactions[i]
+            mythic_registry.reserve(card.name, card.concept, rarity)
             dropped_cards.append(card_copy)
-    
-    # await notify_wishlist_users(ctx, dropped_cards, db_pool)
+        cards_by_emoji = {card['reaction']: card for card in dropped_cards}
 
-    framed_cards = []
-    for card in dropped_cards:
-        card_path = card['image']
-        framed = apply_frame(card_path, FRAME_PATH)
-        framed_cards.append(framed)
-    print(f"Number of framed cards: {len(framed_cards)}")
-    final_image = merge_cards_horizontally(framed_cards)
-    resized_image = resize_image(final_image, max_width=800)
+        # await notify_wishlist_users(ctx, dropped_cards, db_pool)
 
-    buffer = io.BytesIO()
-    resized_image.save(buffer, format="PNG")
-    buffer.seek(0)
+        try:
+            image_bytes = await render_service.render("drop", render_drop, [card['image'] for card in dropped_cards], FRAME_PATH)
+        except RenderBusy:
+            await ctx.send("🖼️ Too many drops are being printed right now, please try again in a moment!")
+            return
 
-    file = discord.File(fp=buffer, filename="drop.png")
+        buffer = io.BytesIO(image_bytes)
 
-    # Embed when user drops cards
-    embed = discord.Embed(
-        title="✨ Card Drop! ✨",
-        description=f"{ctx.author.mention} just dropped some cards!",
-        color=discord.Color.blue()
-    )
+        filename = image_filename("drop")
+        file = discord.File(fp=buffer, filename=filename)
 
-    embed.set_image(url="attachment://drop.png")
-    message = await ctx.send(file=file, embed=embed)
+        # Embed when user drops cards
+        embed = discord.Embed(
+            title="✨ Card Drop! ✨",
+            description=f"{ctx.author.mention} just dropped some cards!",
+            color=discord.Color.blue()
+        )
 
-    # Add reactions to drop message
-    for card in dropped_cards:
-        await message.add_reaction(card['reaction'])
+        embed.set_image(url=f"attachment://{filename}")
+        message = await ctx.send(file=file, embed=embed)
 
-    dropped_idols = {card["name"].title() for card in dropped_cards}
+        # Claims arrive through the reaction router as soon as the drop is visible
+        claim_queue = asyncio.Queue()
 
-    # remove if this doesn't work
-    if not used_extra_drop:
-        drop_cooldowns[user_id] = now
-    async with db_pool.acquire() as conn:
-        rows = await conn.fetch("""
-            SELECT user_id, card_name
-            FROM wishlists
-            WHERE LOWER(card_name) = ANY($1::text[])
-        """, [idol.lower() for idol in dropped_idols])
+        async def queue_claim(payload):
+            if str(payload.emoji) in reactions:
+                claim_queue.put_nowait((time.time(), payload))
 
-    if rows:
-        user_alerts = {}
-        for row in rows:
-            uid = row["user_id"]
-            idol = row["card_name"].title()  # ✅ FIXED this line
-            user_alerts.setdefault(uid, []).append(idol)
+        reaction_router.register(message.id, queue_claim)
 
-        alert_lines = []
-        for uid, idols in user_alerts.items():
-            mention = f"<@{uid}>"
-            idol_list = ", ".join(idols)
-            alert_lines.append(f"{mention} wished for: {idol_list}!")
+        # Add reactions to drop message
+        for card in dropped_cards:
+            await message.add_reaction(card['reaction'])
 
-        await ctx.send("🌟 **Wishlist Alert!**\n" + "\n".join(alert_lines))
+        # remove if this doesn't work
+        if not used_extra_drop:
+            await cooldowns.start("drop", user_id, DROP_COOLDOWN_DURATION)
 
-    claimed = {}
-    already_claimed_users = set()
-    claim_challengers = {emoji: [] for emoji in reactions}
-
-    def check(reaction, user):
-        return (
-            reaction.message.id == message.id and
-            user != bot.user and
-            str(reaction.emoji) in reactions
-        )
-    
-    while len(claimed) < 3:
+        if wishlist_index.loaded:
+            user_alerts = wishlist_index.alerts(dropped_cards)
+        else:
+            dropped_idols = {card["name"].title() for card in dropped_cards}
+            rows = await db.member_wishes([idol.lower() for idol in dropped_idols])
+            user_alerts = {}
+            for row in rows:
+                user_alerts.setdefault(row["user_id"], []).append(row["card_name"].title())
+
+        if user_alerts:
+            alert_lines = []
+            for uid, idols in user_alerts.items():
+                mention = f"<@{uid}>"
+                idol_list = ", ".join(idols)
+                alert_lines.append(f"{mention} wished for: {idol_list}!")
+
+            await ctx.send("🌟 **Wishlist Alert!**\n" + "\n".join(alert_lines))
+
+        already_claimed_users = set()
+        claim_challengers = {emoji: [] for emoji in reactions}
+        seq = 0
+
+        # The drop closes once DROP_IDLE_WINDOW passes without a claim: the scheduler queues a None
+        closer = None
         try:
-            reaction, user = await bot.wait_for("reaction_add", timeout=120.0, check=check)
-            now = time.time()
-            emoji = str(reaction.emoji)
-
-            # log challengers
-            if user.id not in claim_challengers[emoji]:
-                claim_challengers[emoji].append(user.id)
-
-            # priority window without message
-            if user.id != dropper_id and (now - drop_time) < PRIORITY_WINDOW:
-                continue
-
-            # cooldown check
-            if user.id in user_cooldowns:
-                elapsed = now - user_cooldowns[user.id]
-                if elapsed < COOLDOWN_DURATION:
-                    # Check if user has Extra Claim item
-                    # async with db_pool.acquire() as conn:
-                    #     item = await conn.fetchrow("""
-                    #         SELECT quantity FROM user_items
-                    #         WHERE user_id = $1 AND item = 'extra_claim'
-                    #     """, user.id)
-                    
-                    async with db_pool.acquire() as conn:
-                        async with conn.transaction():
-                            item = await conn.fetchrow("""
-                                SELECT quantity FROM user_items
-                                WHERE user_id = $1 AND item = 'extra_claim' FOR UPDATE
-                            """, user.id)
-
-                            if item and item["quantity"] > 0:
-                                await conn.execute("""
-                                    UPDATE user_items
-                                    SET quantity = quantity - 1
-                                    WHERE user_id = $1 AND item = 'extra_claim'
-                                """, user.id)
-
-                                used_extra_claim = True
-                                await ctx.send(f"📥 {user.mention}, you used an **Extra Claim**! No cooldown applied.")
-                            else:
-                                remaining = int(COOLDOWN_DURATION - elapsed)
-                                hours, remainder = divmod(remaining, 3600)
-                                minutes, seconds = divmod(remainder, 60)
-                                await ctx.send(f"⏳ {user.mention} you're still on cooldown!! Remaining: **{hours}h {minutes}m {seconds}s ⏳**")
-                                continue
-
-            # # already claimed
-            if user.id in already_claimed_users:
-                await ctx.send(f"{user.mention}, you've already claimed a card!")
-                continue
-
-            if emoji in claimed:
-                await ctx.send(f"⚠️ Sorry {user.mention} that card is out of stock.")
-                continue
-
-            og_card = get_card_by_emoji(emoji, dropped_cards)
-            card = og_card.copy()
-            card.pop("reaction", None)
-
-            async with db_pool.acquire() as conn:
-                row = await conn.fetchrow("""
-                    SELECT MAX(short_id::int) AS max_short_id
-                    FROM user_cards
-                    WHERE user_id = $1
-                """, user.id)
-                short_id = (row['max_short_id'] or 0) + 1
-
-                edition_row = await conn.fetchrow("""
-                    SELECT COUNT(*) AS count
-                    FROM user_cards
-                    WHERE user_id = $1 AND member_name = $2 AND rarity = $3 AND concept = $4
-                """, user.id, card['name'], card['rarity'], card.get('concept', 'Base'))
-                edition = edition_row['count'] + 1
-
-                card["short_id"] = short_id
-                card["edition"] = edition
-                card["card_uid"] = generate_card_uid(card["name"], short_id, edition)
-
-            # Claimed card into user_cards table
-                await conn.execute("""
-                    INSERT INTO user_cards(user_id, card_uid, short_id, date_obtained, rarity, edition, member_name, group_name, concept, image_path)
-                    VALUES($1, $2, $3, CURRENT_TIMESTAMP, $4, $5, $6, $7, $8, $9)
-                """, int(user.id), card['card_uid'], card['short_id'],
-                    card['rarity'], edition, card['name'], card['group'], card.get('concept', 'Base'), card['image'])
-                
-                points = RARITY_POINTS.get(card['rarity'], 0)
-                leaderboard_cache[user.id] = leaderboard_cache.get(user.id, 0) + points
-
+            while len(claimed) < 3:
+                closer = scheduler.call_later(DROP_IDLE_WINDOW, "drops", functools.partial(claim_queue.put_nowait, None))
+                entry = await claim_queue.get()
+                closer.cancel()
+                if entry is None:
+                    break
+                batch = [entry]
+
+                # Collect everything that arrives within the batch window and settle it together
+                await asyncio.sleep(CLAIM_BATCH_WINDOW)
+                while not claim_queue.empty():
+                    entry = claim_queue.get_nowait()
+                    if entry is not None:
+                        batch.append(entry)
+
+                attempts = []
+                for reacted_at, payload in batch:
+                    emoji = str(payload.emoji)
+                    attempts.append(ClaimAttempt(payload.user_id, emoji, reacted_at, seq))
+                    seq += 1
+
+                    # log challengers
+                    if payload.user_id not in claim_challengers[emoji]:
+                        claim_challengers[emoji].append(payload.user_id)
+
+                # cooldown check; users still on cooldown need an Extra Claim
+                claim_remaining = await cooldowns.check_many("claim", [attempt.user_id for attempt in attempts])
+                cooldown_remaining = {uid: int(remaining) for uid, remaining in claim_remaining.items() if remaining > 0}
+
+                extra_claims = {}
+                if cooldown_remaining:
+                    found = await profiles.get_many(list(cooldown_remaining))
+                    extra_claims = {uid: profile.item("extra_claim") for uid, profile in found.items()}
+
+                outcomes = arbitrate(
+                    attempts, claimed, dropper_id, drop_time, PRIORITY_WINDOW,
+                    on_cooldown=set(cooldown_remaining), extra_claims=extra_claims,
+                    claimed_users=already_claimed_users,
+                )
 
-            challengers = [cid for cid in claim_challengers[emoji] if cid != user.id]
-            if challengers:
-                fought_off_mentions = ", ".join(f"<@{cid}>" for cid in challengers)
-                await ctx.send(f"{user.mention} fought off {fought_off_mentions} and gained a {card['rarity']}-Tier **{card['name']}** photocard! 🤩")
-            else:
-                await ctx.send(f"{user.mention} gained a {card['rarity']}-Tier **{card['name']}** `{card['card_uid']}` photocard! 🤩")
+                winners = []
+                for outcome in outcomes:
+                    mention = f"<@{outcome.attempt.user_id}>"
+                    if outcome.kind == "won":
+                        card = cards_by_emoji[outcome.attempt.emoji].copy()
+                        card.pop("reaction", None)
+                        winners.append((outcome, card))
+                    elif outcome.kind == "cooldown":
+                        remaining = cooldown_remaining[outcome.attempt.user_id]
+                        hours, remainder = divmod(remaining, 3600)
+                        minutes, seconds = divmod(remainder, 60)
+                        await ctx.send(f"⏳ {mention} you're still on cooldown!! Remaining: **{hours}h {minutes}m {seconds}s ⏳**")
+                    elif outcome.kind == "already_claimed":
+                        await ctx.send(f"{mention}, you've already claimed a card!")
+                    elif outcome.kind == "out_of_stock":
+                        await ctx.send(f"⚠️ Sorry {mention} that card is out of stock.")
 
-            claimed[emoji] = user.id
-            already_claimed_users.add(user.id)
+                if not winners:
+                    continue
 
-            # remove if this doesn't work
-            if not used_extra_claim:
-                user_cooldowns[user.id] = now
+                # Commit every winner and their Extra Claims in one round-trip (migrations/004_claim_cards.sql)
+                try:
+                    rows = await db.claim_cards(
+                        [outcome.attempt.user_id for outcome, _ in winners],
+                        [card_name_code(card['name']) for _, card in winners],
+                        [card['name'] for _, card in winners],
+                        [card['group'] for _, card in winners],
+                        [card.get('concept', 'Base') for _, card in winners],
+                        [card['rarity'] for _, card in winners],
+                        [card['image'] for _, card in winners],
+                        [outcome.uses_item for outcome, _ in winners],
+                    )
+                except Exception as e:
+                    # Nothing was committed, so the cards stay up and nobody spent an Extra Claim
+                    print(f"Claim commit failed: {e}")
+                    mentions = ", ".join(f"<@{outcome.attempt.user_id}>" for outcome, _ in winners)
+                    await ctx.send(f"⚠️ {mentions} your claim couldn't be saved, please react again!")
+                    continue
+                committed = {row['claimed_user_id']: row for row in rows}
+
+                for outcome, card in winners:
+                    user_id_won = outcome.attempt.user_id
+                    emoji = outcome.attempt.emoji
+                    mention = f"<@{user_id_won}>"
+                    row = committed.get(user_id_won)
+                    if row is None:
+                        profiles.invalidate(user_id_won)
+                        # Their last Extra Claim was spent elsewhere before this batch committed
+                        await ctx.send(f"⏳ {mention} you're still on cooldown!! You're out of **Extra Claims**.")
+                        continue
+
+                    card["short_id"] = row['claimed_short_id']
+                    card["edition"] = row['claimed_edition']
+                    card["card_uid"] = row['claimed_uid']
+
+                    mythic_registry.claimed(card['name'], card.get('concept', 'Base'), card['rarity'])
+                    claimed[emoji] = user_id_won
+                    already_claimed_users.add(user_id_won)
+                    score_index.add(user_id_won, RARITY_POINTS.get(card['rarity'], 0))
+
+                    if outcome.uses_item:
+                        profiles.invalidate(user_id_won)
+                        await ctx.send(f"📥 {mention}, you used an **Extra Claim**! No cooldown applied.")
+                    else:
+                        await cooldowns.start("claim", user_id_won, COOLDOWN_DURATION)
 
-        except asyncio.TimeoutError:
-            break
+                    challengers = [cid for cid in claim_challengers[emoji] if cid != user_id_won]
+                    if challengers:
+                        fought_off_mentions = ", ".join(f"<@{cid}>" for cid in challengers)
+                        await ctx.send(f"{mention} fought off {fought_off_mentions} and gained a {card['rarity']}-Tier **{card['name']}** photocard! 🤩")
+                    else:
+                        await ctx.send(f"{mention} gained a {card['rarity']}-Tier **{card['name']}** `{card['card_uid']}` photocard! 🤩")
+        finally:
+            if closer:
+                closer.cancel()
+            reaction_router.unregister(message.id)
+    finally:
+        for card in dropped_cards:
+            if card['reaction'] not in claimed:
+                mythic_registry.release(card['name'], card['concept'], card['rarity'])
 
 # !collection command
 @bot.command(name="collection", aliases=["pc"])
@@ -412,178 +457,160 @@ async def collection(ctx, *args):
     sort_key = sort_aliases.get(sort_key, sort_key)
 
     # Get user's tag emoji
-    async with db_pool.acquire() as conn:
-        row = await conn.fetchrow("SELECT emoji FROM users WHERE user_id = $1", user_id)
-        emoji = row["emoji"] if row and row["emoji"] else "📸"
-
-    # Validate sort key
-    valid_sorts = {
-        "date_obtained": "date_obtained DESC",
-        "rarity": """
-            CASE rarity
-                WHEN 'Common' THEN 1
-                WHEN 'Rare' THEN 2
-                WHEN 'Epic' THEN 3
-                WHEN 'Legendary' THEN 4
-                WHEN 'Mythic' THEN 5
-                ELSE 6
-            END
-        """,
-        "member_name": "member_name ASC",
-        "group_name": "group_name ASC"
-    }
-    order_by = valid_sorts.get(sort_key, "date_obtained DESC")
+    profile = await profiles.get(user_id)
+    emoji = profile.emoji or "📸"
 
-    # Build filtering condition
-    filter_clause = ""
-    params = [user_id]
+    # Filter by rarity, or by group/member name
+    filter_kind = "all"
     if filter_value:
         if filter_value in ["common", "rare", "epic", "legendary", "mythic"]:
-            filter_clause = "AND LOWER(rarity) = $2"
+            filter_kind = "rarity"
         else:
-            filter_clause = "AND (LOWER(group_name) = $2 OR LOWER(member_name) = $2)"
-        params.append(filter_value)
-
-    # Get cards
-    async with db_pool.acquire() as conn:
-        rows = await conn.fetch(f"""
-            SELECT * FROM user_cards
-            WHERE user_id = $1
-            {filter_clause}
-            ORDER BY {order_by};
-        """, *params)
+            filter_kind = "name"
 
-    if not rows:
+    # PAGINATION (pages are fetched as they're shown)
+    view = CollectionView(ctx, db, target, emoji, sort_key, filter_kind, filter_value)
+    if not await view.start():
         await ctx.send(f"{target.display_name} doesn't have any matching photocards. 😢")
         return
 
-    # PAGINATION
-    page_size = 10
-    pages = [rows[i:i + page_size] for i in range(0, len(rows), page_size)]
-    view = CollectionView(ctx, pages, emoji, target, sort_key)
     embed = view.generate_embed()
     view.message = await ctx.send(embed=embed, view=view)
 
 
-pending_trades = {}
-
 # COMMAND TRADE !trade
 @bot.command()
-async def trade(ctx, partner: discord.Member, card_uid: str):
+async def trade(ctx, partner: discord.Member, *args):
+    """Offer cards, optionally for some of theirs: !trade @user UID [UID ...] [for UID [UID ...]]"""
     sender_id = ctx.author.id
     recipient_id = partner.id
 
-    async with db_pool.acquire() as conn:
-        card = await conn.fetchrow("""
-            SELECT * FROM user_cards
-            WHERE user_id = $1 AND LOWER(card_uid) = LOWER($2)
-        """, sender_id, card_uid)
+    if recipient_id == sender_id:
+        await ctx.send("❌ You can't trade with yourself.")
+        return
 
-        if not card:
-            await ctx.send("❌ You don't own a card with that UID.")
-            return
+    words = [arg.lower() for arg in args]
+    split = words.index("for") if "for" in words else len(args)
+    give_uids, want_uids = args[:split], args[split + 1:]
+    if not give_uids:
+        await ctx.send("❌ Usage: `!trade @user <card_uid> [more uids] [for <their card_uid> ...]`")
+        return
 
-        # Save pending trade
-        pending_trades[sender_id] = {
-            "recipient_id": recipient_id,
-            "card_uid": card_uid,
-            "member_name": card['member_name'],
-            "rarity": card['rarity'],
-            "message_id": None
-        }
-
-        # ✅ Create framed card preview
-        image_path = card["image_path"]
-        if image_path and os.path.exists(image_path):
-            framed = apply_frame(image_path, FRAME_PATH)
-            buffer = io.BytesIO()
-            framed.save(buffer, format="PNG")
-            buffer.seek(0)
-            file = discord.File(buffer, filename="trade_card.png")
-            image_url = "attachment://trade_card.png"
-        else:
-            file = None
-            image_url = None
+    give, missing = await db.find_cards(sender_id, give_uids)
+    if missing:
+        await ctx.send(f"❌ You don't own these cards: {', '.join(missing)}{typo_hint(missing)}")
+        return
+    want, missing = await db.find_cards(recipient_id, want_uids) if want_uids else ([], [])
+    if missing:
+        await ctx.send(f"❌ {partner.display_name} doesn't own these cards: {', '.join(missing)}{typo_hint(missing)}")
+        return
 
-        # Create embed (no mention here)
-        embed = discord.Embed(
-            title="📸 Photocard Offer",
-            color=discord.Color.gold()
-        )
-        embed.add_field(name="Card", value=f"[{card['rarity']}] **{card['member_name']}**", inline=False)
-        embed.add_field(name="UID", value=f"`{card_uid}`", inline=False)
-        embed.set_footer(text="React with 🤝 to accept or ❌ to decline.")
+    # ✅ Create framed card preview of the first card offered
+    card = give[0]
+    card_data = await assets.read(card["image_path"]) if card["image_path"] else None
+    if card_data is not None:
+        filename = image_filename("trade_card")
+        try:
+            image_bytes = await render_service.render("trade", framed_card_bytes, card_data, FRAME_PATH)
+        except RenderBusy:
+            await ctx.send("🖼️ The card printer is busy, please try again in a moment!")
+            return
+        buffer = io.BytesIO(image_bytes)
+        file = discord.File(buffer, filename=filename)
+        image_url = f"attachment://{filename}"
+    else:
+        file = None
+        image_url = None
 
-        if image_url:
-            embed.set_image(url=image_url)
-        else:
-            embed.add_field(name="⚠️ Note", value="Image preview not available.", inline=False)
+    # Create embed (no mention here)
+    embed = discord.Embed(
+        title="📸 Photocard Offer",
+        color=discord.Color.gold()
+    )
+    embed.add_field(name="Offered", value=trade_card_lines(give), inline=False)
+    if want:
+        embed.add_field(name="In exchange for", value=trade_card_lines(want), inline=False)
+    embed.set_footer(text="React with 🤝 to accept or ❌ to decline.")
 
-        # ✅ Send the text message separately
-        message = await ctx.send(
-            f"{partner.mention}, **{ctx.author.display_name}** wants to trade you this photocard!", 
-            embed=embed, 
-            file=file if file else None
-        )
+    if image_url:
+        embed.set_image(url=image_url)
+    else:
+        embed.add_field(name="⚠️ Note", value="Image preview not available.", inline=False)
 
-        await message.add_reaction("🤝")
-        await message.add_reaction("❌")
+    # ✅ Send the text message separately
+    message = await ctx.send(
+        f"{partner.mention}, **{ctx.author.display_name}** wants to trade you {'these photocards' if len(give) > 1 else 'this photocard'}!",
+        embed=embed, 
+        file=file if file else None
+    )
 
-        pending_trades[sender_id]["message_id"] = message.id
+    # Reactions that land before the offer is logged are held and replayed once it is
+    trades.hold(message.id)
+    try:
+        await trades.open(message.id, message.channel.id, sender_id, recipient_id,
+                          [card['id'] for card in give], [card['id'] for card in want])
+    except Exception as e:
+        print(f"Couldn't open trade offer: {e}")
+        try:
+            await message.delete()
+        except discord.HTTPException:
+            pass
+        await ctx.send("❌ Something went wrong opening the trade, please try again.")
+        return
 
-        # Timeout auto-cancel (5 min)
-        async def auto_cancel():
-            await asyncio.sleep(300)
-            if sender_id in pending_trades and pending_trades[sender_id]["message_id"] == message.id:
-                del pending_trades[sender_id]
-                try:
-                    await message.channel.send("⌛ Trade request timed out.")
-                except discord.HTTPException:
-                    pass
+    await message.add_reaction("🤝")
+    await message.add_reaction("❌")
 
-        asyncio.create_task(auto_cancel())
+def trade_card_lines(rows):
+    return "\n".join(f"[{row['rarity']}] **{row['member_name']}** `{row['card_uid']}`" for row in rows)
 
 @bot.event
 async def on_raw_reaction_add(payload):
     if payload.user_id == bot.user.id:
         return
-    
-    sender_id = next(
-        (sid for sid, t in pending_trades.items() if t["message_id"] == payload.message_id),
-        None
-    )
 
-    if sender_id is None:
-        return
-    
-    trade = pending_trades[sender_id]
-    if payload.user_id != trade["recipient_id"]:
+    await reaction_router.dispatch(payload)
+
+async def handle_trade_reaction(payload):
+    offer = trades.get(payload.message_id)
+    if offer is None or payload.user_id != offer.recipient_id:
         return
-    
-    channel = bot.get_channel(payload.channel_id)
-    message = await channel.fetch_message(payload.message_id)
-    user = bot.get_user(payload.user_id)
 
+    channel = bot.get_channel(payload.channel_id)
     emoji = str(payload.emoji)
 
     if emoji == "🤝":
-        async with db_pool.acquire() as conn:
-            await conn.execute(
-                """
-                UPDATE user_cards
-                SET user_id = $1,
-                    date_obtained = $2,
-                    custom_tag = NULL
-                WHERE LOWER(card_uid) = LOWER($3) AND user_id = $4
-                """,
-                user.id, datetime.now(timezone.utc),
-                trade["card_uid"], sender_id
-            )
-        await channel.send(f"✅ Trade successful! [**{trade['rarity']}**] **{trade['member_name']}** photocard is now added to your collection!")
-        del pending_trades[sender_id]
+        # Moves every card in the offer or none of them (migrations/011_trades.sql)
+        moved = await trades.accept(offer)
+        if moved is None:
+            await channel.send(f"⚠️ This trade was already {offer.settling}.")
+            return
+        if not moved:
+            await channel.send("❌ This trade can no longer be completed. One of the cards has changed hands.")
+            return
+        for row in moved:
+            points = RARITY_POINTS.get(row['traded_rarity'], 0)
+            score_index.add(row['traded_from'], -points)
+            score_index.add(row['traded_to'], points)
+        if len(moved) == 1:
+            row = moved[0]
+            await channel.send(f"✅ Trade successful! [**{row['traded_rarity']}**] **{row['traded_member']}** photocard is now added to your collection!")
+        else:
+            await channel.send(f"✅ Trade successful! {len(moved)} photocards changed hands.")
     elif emoji == "❌":
+        if await trades.decline(offer) is None:
+            await channel.send(f"⚠️ This trade was already {offer.settling}.")
+            return
         await channel.send("❌ Trade was declined.")
-        del pending_trades[sender_id]
+
+async def trade_expired(channel_id):
+    channel = bot.get_channel(channel_id)
+    if channel is None:
+        return
+    try:
+        await channel.send("⌛ Trade request timed out.")
+    except discord.HTTPException:
+        pass
 
 # TAG COMMAND !tag                
 @bot.command()
@@ -593,42 +620,25 @@ async def tag(ctx, *args):
     if len(args) == 1:
         # ✅ Global tag for entire collection
         emoji = args[0]
-        async with db_pool.acquire() as conn:
-            await conn.execute("""
-                INSERT INTO users (user_id, emoji)
-                VALUES ($1, $2)
-                ON CONFLICT (user_id) DO UPDATE SET emoji = EXCLUDED.emoji
-            """, user_id, emoji)
+        await db.set_emoji(user_id, emoji)
+        profiles.invalidate(user_id)
         await ctx.send(f"✅ Your entire collection is now tagged with {emoji}!")
 
     elif len(args) >= 2:
         # ✅ Multi-card tagging
         *card_uids, emoji = args  # All args except the last one are UIDs
-        card_uids = [uid.upper().strip() for uid in card_uids]
-
-        async with db_pool.acquire() as conn:
-            # Check which cards user owns
-            owned_cards = await conn.fetch("""
-                SELECT card_uid FROM user_cards
-                WHERE user_id = $1 AND card_uid = ANY($2::text[])
-            """, user_id, card_uids)
-
-            owned_uids = [row["card_uid"] for row in owned_cards]
-            missing_uids = [uid for uid in card_uids if uid not in owned_uids]
+        # Check which cards user owns
+        cards, missing = await db.find_cards(user_id, card_uids)
 
-            if missing_uids:
-                await ctx.send(f"⚠️ You don't own these cards: {', '.join(missing_uids)}")
-                return
+        if missing:
+            await ctx.send(f"⚠️ You don't own these cards: {', '.join(missing)}{typo_hint(missing)}")
+            return
 
-            # Update all tagged cards
-            await conn.execute("""
-                UPDATE user_cards
-                SET custom_tag = $1
-                WHERE user_id = $2 AND card_uid = ANY($3::text[])
-            """, emoji, user_id, owned_uids)
+        # Update all tagged cards
+        await db.tag_cards(user_id, [card['card_uid_norm'] for card in cards], emoji)
 
-        if len(card_uids) == 1:
-            await ctx.send(f"✅ Tagged card `#{card_uids[0]}` with {emoji}!")
+        if len(cards) == 1:
+            await ctx.send(f"✅ Tagged card `#{cards[0]['card_uid']}` with {emoji}!")
         else:
             await ctx.send(f"✅ Tagged {len(card_uids)} cards with {emoji}!")
 
@@ -645,59 +655,46 @@ async def customize(ctx, old_uid: str, new_uid: str):
     cost = 500  # aura cost for customization
 
     # Enforce formatting (optional)
-    new_uid = new_uid.upper().strip()
+    new_uid = new_uid.strip().upper()
 
     if not new_uid.isalnum() or len(new_uid) > 10:
         await ctx.send("❌ UID must be alphanumeric and less than 10 characters.")
         return
 
-    async with db_pool.acquire() as conn:
+    if is_reserved_uid(new_uid):
+        await ctx.send("❌ That UID reads as an issued card code: 6 letters/digits whose last character is the check digit of the rest are reserved for new cards. Changing any character frees it up.")
+        return
+
+    async with db.acquire() as conn:
         # 1️⃣ Check if user owns the card
-        card = await conn.fetchrow("""
-            SELECT * FROM user_cards
-            WHERE user_id = $1 AND LOWER(card_uid) = LOWER($2)
-        """, user_id, old_uid)
+        card = await db.card(user_id, old_uid, conn)
 
         if not card:
-            await ctx.send("❌ You don't own a card with that UID.")
-            return
-
-        # 2️⃣ Check if new UID is already taken
-        exists = await conn.fetchval("""
-            SELECT 1 FROM user_cards WHERE LOWER(card_uid) = LOWER($1)
-        """, new_uid)
-
-        if exists:
-            await ctx.send("❌ That UID is already in use! Please choose a different one.")
+            await ctx.send(f"❌ You don't own a card with that UID.{typo_hint([old_uid])}")
             return
 
-        # 3️⃣ Check aura balance
-        balance = await conn.fetchval("""
-            SELECT COALESCE(coins, 0) FROM users WHERE user_id = $1
-        """, user_id)
+        # 2️⃣ Check aura balance
+        balance = await db.coins(user_id, conn) or 0
 
         if balance < cost:
             await ctx.send(f"❌ You need {cost} aura to customize a card UID. You currently have {balance}.")
             return
 
-        # 4️⃣ Deduct aura and update UID
+        # 3️⃣ Update UID (the unique index rejects taken UIDs) and deduct aura
         async with conn.transaction():
-            await conn.execute("""
-                UPDATE users
-                SET coins = coins - $1
-                WHERE user_id = $2
-            """, cost, user_id)
-
-            await conn.execute("""
-                UPDATE user_cards
-                SET card_uid = $1
-                WHERE user_id = $2 AND LOWER(card_uid) = LOWER($3)
-            """, new_uid, user_id, old_uid)
-
-        # 5️⃣ Confirm success
+            renamed = await db.rename_card(user_id, card['id'], new_uid, conn)
+            if renamed:
+                await db.spend_coins(user_id, cost, conn)
+
+        if not renamed:
+            await ctx.send("❌ That UID is already in use! Please choose a different one.")
+            return
+        profiles.invalidate(user_id)
+
+        # 4️⃣ Confirm success
         embed = discord.Embed(
             title="✨ UID Customized!",
-            description=f"Your card **{card['member_name']}** has been updated:\n`{old_uid}` → `{new_uid}`",
+            description=f"Your card **{card['member_name']}** has been updated:\n`{card['card_uid']}` → `{new_uid}`",
             color=discord.Color.gold()
         )
         embed.set_footer(text=f"-{cost} aura spent • Remaining: {balance - cost}")
@@ -710,29 +707,24 @@ async def cd(ctx):
     now = datetime.now(timezone.utc)
 
     # --- DROP & CLAIM COOLDOWNS ---
-    current_time = time.time()
-    last_drop = drop_cooldowns.get(user_id)
-    last_claim = user_cooldowns.get(user_id)
-
-    drop_remaining = max(0, int(DROP_COOLDOWN_DURATION - (current_time - last_drop))) if last_drop else 0
-    claim_remaining = max(0, int(COOLDOWN_DURATION - (current_time - last_claim))) if last_claim else 0
+    drop_remaining = int(cooldowns.remaining("drop", user_id))
+    claim_remaining = int(cooldowns.remaining("claim", user_id))
 
     # --- DAILY COOLDOWN (midnight reset) ---
-    async with db_pool.acquire() as conn:
-        row = await conn.fetchrow("SELECT last_daily FROM users WHERE user_id = $1", user_id)
-        if row and row["last_daily"]:
-            last_daily = row["last_daily"].replace(tzinfo=timezone.utc)
-            today_reset = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            tomorrow_reset = today_reset + timedelta(days=1)
-
-            if last_daily >= today_reset:
-                # User has already claimed today, show time until next midnight
-                remaining_daily = int((tomorrow_reset - now).total_seconds())
-            else:
-                # User has not claimed today
-                remaining_daily = 0
+    profile = await profiles.get(user_id)
+    if profile.last_daily:
+        last_daily = profile.last_daily.replace(tzinfo=timezone.utc)
+        today_reset = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        tomorrow_reset = today_reset + timedelta(days=1)
+
+        if last_daily >= today_reset:
+            # User has already claimed today, show time until next midnight
+            remaining_daily = int((tomorrow_reset - now).total_seconds())
         else:
+            # User has not claimed today
             remaining_daily = 0
+    else:
+        remaining_daily = 0
 
     def format_time(seconds, show_hours=False):
         seconds = max(0, seconds)
@@ -758,15 +750,10 @@ async def view(ctx, card_uid: str):
     """View a specific photocard by its unique card_uid."""
     user_id = ctx.author.id
 
-    async with db_pool.acquire() as conn:
-        card = await conn.fetchrow("""
-            SELECT *
-            FROM user_cards
-            WHERE user_id = $1 AND card_uid = $2
-        """, int(user_id), card_uid.upper())  # Force uppercase for consistency
+    card = await db.card(int(user_id), card_uid)
 
     if not card:
-        await ctx.send(f"⚠️ You don't own a card with UID `{card_uid}`.")
+        await ctx.send(f"⚠️ You don't own a card with UID `{card_uid}`.{typo_hint([card_uid])}")
         return
 
     # ✅ Pick correct frame based on rarity
@@ -776,17 +763,20 @@ async def view(ctx, card_uid: str):
     else:
         frame_path = FRAME_PATH
 
-    # Build framed image directly from the saved path
-    image_path = card["image_path"]
-    if not image_path or not os.path.exists(image_path):
+    # Build framed image from the card image's bytes (read off the event loop, see assets.py)
+    card_data = await assets.read(card["image_path"]) if card["image_path"] else None
+    if card_data is None:
         await ctx.send("⚠️ The image file for this card couldn't be found.")
         return
 
-    framed = apply_frame(image_path, frame_path)
-    buffer = io.BytesIO()
-    framed.save(buffer, format="PNG")
-    buffer.seek(0)
-    file = discord.File(fp=buffer, filename="card.png")
+    filename = image_filename("card")
+    try:
+        image_bytes = await render_service.render("view", framed_card_bytes, card_data, frame_path)
+    except RenderBusy:
+        await ctx.send("🖼️ The card printer is busy, please try again in a moment!")
+        return
+    buffer = io.BytesIO(image_bytes)
+    file = discord.File(fp=buffer, filename=filename)
 
     # Embed card details
     embed = discord.Embed(
@@ -800,7 +790,7 @@ async def view(ctx, card_uid: str):
         ),
         color=discord.Color.gold() if rarity.lower() == "mythic" else discord.Color.blue()
     )
-    embed.set_image(url="attachment://card.png")
+    embed.set_image(url=f"attachment://{filename}")
 
     await ctx.send(file=file, embed=embed)
 
@@ -814,15 +804,11 @@ async def daily(ctx):
     # Get today's reset time (midnight UTC)
     today_reset = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
 
-    async with db_pool.acquire() as conn:
+    async with db.acquire() as conn:
         # Ensure user row exists
-        await conn.execute("""
-            INSERT INTO users (user_id, coins, last_daily)
-            VALUES ($1, 0, NULL)
-            ON CONFLICT (user_id) DO NOTHING;
-        """, user_id)
+        await db.ensure_user(user_id, conn)
 
-        row = await conn.fetchrow("SELECT coins, last_daily FROM users WHERE user_id = $1", user_id)
+        row = await db.daily_state(user_id, conn)
         current_coins = row["coins"]
         last_daily = row["last_daily"]
 
@@ -845,10 +831,8 @@ async def daily(ctx):
 
         # ✅ Otherwise, award the daily reward
         new_total = current_coins + reward
-        await conn.execute(
-            "UPDATE users SET coins = $1, last_daily = $2 WHERE user_id = $3",
-            new_total, now, user_id
-        )
+        await db.set_daily(user_id, new_total, now, conn)
+        profiles.invalidate(user_id)
 
         await ctx.send(f"✅ You received {reward} aura points 🌟 for your daily check-in! You now have 🌟 {new_total} aura.")
 
@@ -862,87 +846,70 @@ async def recycle(ctx, *args):
         await ctx.send("❌ You must specify at least one `card_uid`, a rarity, or an emoji tag.")
         return
 
-    rarity_coin_values = {
-        'COMMON': 5,
-        'RARE': 10,
-        'EPIC': 20,
-        'LEGENDARY': 50,
-        'MYTHIC': 150
-    }
+    # Sort the arguments into rarities, emoji tags and card UIDs
+    rarities, tags, card_uids = [], [], []
+    for arg in args:
+        arg_clean = arg.strip().upper()
 
-    total_earned = 0
-    recycled_cards = []
+        if arg_clean.title() in RARITY_POINTS:
+            rarities.append(arg_clean)
+        elif len(arg) <= 4 and not arg_clean.isalnum():
+            tags.append(arg)
+        else:
+            card_uids.append(arg_clean)
+
+    # A typo could recycle the wrong card, so UIDs are resolved first and likely typos stop here
+    if card_uids:
+        cards, missing = await db.find_cards(user_id, card_uids)
+        hint = typo_hint(missing)
+        if hint:
+            await ctx.send(f"⚠️ You don't own these cards: {', '.join(missing)}{hint}")
+            return
+        card_uids = [card['card_uid_norm'] for card in cards]
 
-    async with db_pool.acquire() as conn:
-        async with conn.transaction():
-            matched_rows = []
-
-            # Collect matching cards first
-            for arg in args:
-                arg_clean = arg.strip().upper()
-
-                if arg_clean in rarity_coin_values:
-                    rows = await conn.fetch("""
-                        SELECT card_uid, member_name, rarity FROM user_cards
-                        WHERE user_id = $1 AND UPPER(rarity) = $2
-                    """, user_id, arg_clean)
-                elif len(arg) <= 4 and not arg_clean.isalnum():
-                    rows = await conn.fetch("""
-                        SELECT card_uid, member_name, rarity FROM user_cards
-                        WHERE user_id = $1 AND custom_tag = $2
-                    """, user_id, arg)
-                else:
-                    row = await conn.fetchrow("""
-                        SELECT card_uid, member_name, rarity FROM user_cards
-                        WHERE user_id = $1 AND UPPER(card_uid) = $2
-                    """, user_id, arg_clean)
-                    rows = [row] if row else []
+    # Resolve every matching card in one query; nothing is locked while the user decides
+    matched_rows = await db.recycle_candidates(user_id, rarities, tags, card_uids)
 
-                if rows:
-                    matched_rows.extend(rows)
+    if not matched_rows:
+        await ctx.send("⚠️ No matching cards found.")
+        return
 
-            if not matched_rows:
-                await ctx.send("⚠️ No matching cards found.")
-                return
+    # Ask for confirmation if 5 or more cards
+    if len(matched_rows) >= 5:
+        embed = discord.Embed(
+            title="♻️ Confirm Recycling",
+            description=f"You are about to recycle **{len(matched_rows)} cards**.\nDo you want to proceed?",
+            color=discord.Color.orange()
+        )
+        embed.set_footer(text="This will earn you aura based on rarity.")
+        view = ConfirmRecycleView(ctx)
+        msg = await ctx.send(embed=embed, view=view)
+        view.message = msg
+        await view.wait()
+
+        if view.value is None:
+            await msg.edit(content="⌛ Confirmation timed out.", embed=None, view=None)
+            return
+        elif view.value is False:
+            await msg.edit(content="❌ Recycling cancelled.", embed=None, view=None)
+            return
+        else:
+            await msg.edit(content="✅ Recycling Confirmed", embed=None, view=None)
 
-            # Ask for confirmation if 5 or more cards
-            if len(matched_rows) >= 5:
-                embed = discord.Embed(
-                    title="♻️ Confirm Recycling",
-                    description=f"You are about to recycle **{len(matched_rows)} cards**.\nDo you want to proceed?",
-                    color=discord.Color.orange()
-                )
-                embed.set_footer(text="This will earn you aura based on rarity.")
-                view = ConfirmRecycleView(ctx)
-                msg = await ctx.send(embed=embed, view=view)
-                view.message = msg
-                await view.wait()
-
-                if view.value is None:
-                    await msg.edit(content="⌛ Confirmation timed out.", embed=None, view=None)
-                    return
-                elif view.value is False:
-                    await msg.edit(content="❌ Recycling cancelled.", embed=None, view=None)
-                    return
-                else:
-                    await msg.edit(content="✅ Recycling Confirmed", embed=None, view=None)
-
-            # Delete cards and calculate coins
-            for row in matched_rows:
-                await conn.execute("""
-                    DELETE FROM user_cards
-                    WHERE user_id = $1 AND card_uid = $2
-                """, user_id, row['card_uid'])
-                total_earned += rarity_coin_values.get(row['rarity'].upper(), 1)
-                recycled_cards.append(f"[{row['rarity']}] **{row['member_name']}** (`{row['card_uid']}`)")
-
-            if total_earned > 0:
-                await conn.execute("""
-                    INSERT INTO users (user_id, coins)
-                    VALUES ($1, $2)
-                    ON CONFLICT (user_id)
-                    DO UPDATE SET coins = users.coins + $2
-                """, user_id, total_earned)
+    # Delete and credit in one statement; cards traded away in the meantime are skipped
+    recycled_rows = await db.recycle_cards(user_id, [row['id'] for row in matched_rows])
+    profiles.invalidate(user_id)
+
+    if not recycled_rows:
+        await ctx.send("⚠️ Those cards are no longer in your collection.")
+        return
+
+    total_earned = sum(row['aura'] for row in recycled_rows)
+    recycled_cards = [f"[{row['rarity']}] **{row['member_name']}** (`{row['card_uid']}`)" for row in recycled_rows]
+
+    for row in recycled_rows:
+        mythic_registry.removed(row['member_name'], row['concept'], row['rarity'])
+        score_index.add(user_id, -RARITY_POINTS.get(row['rarity'], 0))
 
     recycled_list = "\n".join(recycled_cards)
     embed = discord.Embed(
@@ -957,6 +924,10 @@ async def recycle(ctx, *args):
         inline=False
     )
 
+    skipped = len(matched_rows) - len(recycled_rows)
+    if skipped:
+        embed.set_footer(text=f"{skipped} card(s) left your collection before recycling and were skipped.")
+
     await ctx.send(embed=embed)
 
 # !aura
@@ -964,37 +935,9 @@ async def recycle(ctx, *args):
 async def aura(ctx):
     user_id = int(ctx.author.id)
 
-    async with db_pool.acquire() as conn:
-        coins = await conn.fetchval("""
-            SELECT coins FROM users WHERE user_id = $1
-        """, user_id)
-
-    await ctx.send(f"🌟 You have **{coins or 0} aura**.")
-
-async def update_leaderboard_cache(force=False):
-    global leaderboard_cache, last_cache_update
-    now = time.time()
-
-    # Only reload DB if forced or cache is empty
-    if not force and leaderboard_cache:
-        return leaderboard_cache
-
-    async with db_pool.acquire() as conn:
-        rows = await conn.fetch("""
-            SELECT user_id, rarity
-            FROM user_cards
-        """)
-
-    scores = {}
-    for row in rows:
-        uid = row["user_id"]
-        rarity = row["rarity"]
-        points = RARITY_POINTS.get(rarity, 0)
-        scores[uid] = scores.get(uid, 0) + points
+    profile = await profiles.get(user_id)
 
-    leaderboard_cache = dict(sorted(scores.items(), key=lambda x: x[1], reverse=True))
-    last_cache_update = now
-    return leaderboard_cache
+    await ctx.send(f"🌟 You have **{profile.coins} aura**.")
 
 # give aura command !give
 @bot.command()
@@ -1006,13 +949,10 @@ async def give(ctx, member: discord.Member, amount: int):
         await ctx.send("❌ Please enter a valid amount of aura to give.")
         return
     
-    async with db_pool.acquire() as conn:
+    async with db.acquire() as conn:
         async with conn.transaction():
             # check sender balance
-            sender_balance = await conn.fetchval(
-                "SELECT coins FROM users WHERE user_id = $1",
-                sender_id
-            ) or 0
+            sender_balance = await db.coins(sender_id, conn) or 0
 
             if sender_balance < amount:
                 await ctx.send("❌ You don't have enough aura.")
@@ -1023,18 +963,11 @@ async def give(ctx, member: discord.Member, amount: int):
                 return
             
             # minus from sender
-            await conn.execute(
-                "UPDATE users SET coins = coins - $1 WHERE user_id = $2",
-                amount, sender_id
-            )
+            await db.spend_coins(sender_id, amount, conn)
 
             # add to recipient
-            await conn.execute("""
-                INSERT into users (user_id, coins)
-                VALUES ($1, $2)
-                ON CONFLICT (user_id)
-                DO UPDATE SET coins = users.coins + EXCLUDED.coins
-            """, recipient_id, amount)
+            await db.add_coins(recipient_id, amount, conn)
+    profiles.invalidate(sender_id, recipient_id)
 
     await ctx.send(
         f"🤑 {ctx.author.display_name} gave {amount} aura 🌟 to {member.display_name}!"
@@ -1045,58 +978,14 @@ async def give(ctx, member: discord.Member, amount: int):
 async def rank(ctx):
     user = ctx.author
     user_id = ctx.author.id
-    async with db_pool.acquire() as conn:
-        # Get total points for this user but only Legendary and Mythic cards
-        user_row = await conn.fetchrow("""
-            SELECT SUM(
-                       CASE rarity
-                           WHEN 'Common' THEN 1
-                           WHEN 'Rare' THEN 5
-                           WHEN 'Epic' THEN 20
-                           WHEN 'Legendary' THEN 100
-                           WHEN 'Mythic' THEN 150
-                           ELSE 0
-                       END
-                   ) AS total_points
-            FROM user_cards
-            WHERE user_id = $1 AND rarity IN ('Common', 'Rare', 'Epic', 'Legendary', 'Mythic')
-        """, user_id)
-        user_points = user_row['total_points'] or 0
-
-        # Get rank based on Legendary and Mythic only
-        rank_row = await conn.fetchrow("""
-            SELECT COUNT(*) + 1 AS rank
-            FROM (
-                SELECT user_id, SUM(
-                    CASE rarity
-                        WHEN 'Common' THEN 1
-                        WHEN 'Rare' THEN 5
-                        WHEN 'Epic' THEN 20
-                        WHEN 'Legendary' THEN 100
-                        WHEN 'Mythic' THEN 150
-                        ELSE 0
-                    END
-                ) AS total_points
-                FROM user_cards
-                WHERE rarity IN ('Common', 'Rare', 'Epic', 'Legendary', 'Mythic')
-                GROUP BY user_id
-            ) AS leaderboard
-            WHERE total_points > (
-                SELECT SUM(
-                    CASE rarity
-                        WHEN 'Common' THEN 1
-                        WHEN 'Rare' THEN 5
-                        WHEN 'Epic' THEN 20
-                        WHEN 'Legendary' THEN 100
-                        WHEN 'Mythic' THEN 150
-                        ELSE 0
-                    END
-                )
-                FROM user_cards
-                WHERE user_id = $1 AND rarity IN ('Common', 'Rare', 'Epic', 'Legendary', 'Mythic')
-            )
-        """, user_id)
-        rank_position = rank_row['rank'] if rank_row else 1
+
+    if score_index.loaded:
+        user_points = score_index.score(user_id)
+        rank_position = score_index.rank(user_id)
+    else:
+        async with db.acquire() as conn:
+            user_points = await db.score(user_id, conn)
+            rank_position = await db.rank_for_score(user_points, conn)
 
     embed = discord.Embed(title=f"📊 {ctx.author.display_name}'s Rank", color=discord.Color.blue())
     embed.add_field(name="Total Points", value=f"**{user_points}**", inline=False)
@@ -1111,25 +1000,10 @@ async def rank(ctx):
 # !leaderboard command
 @bot.command()
 async def leaderboard(ctx):
-    async with db_pool.acquire() as conn:
-        rows = await conn.fetch("""
-            SELECT user_id,
-                   SUM(
-                       CASE rarity
-                           WHEN 'Common' THEN 1
-                           WHEN 'Rare' THEN 5
-                           WHEN 'Epic' THEN 20
-                           WHEN 'Legendary' THEN 100
-                           WHEN 'Mythic' THEN 150
-                           ELSE 0
-                       END
-                   ) AS total_points
-            FROM user_cards
-            WHERE rarity IN ('Common', 'Rare', 'Epic', 'Legendary', 'Mythic')
-            GROUP BY user_id
-            ORDER BY total_points DESC
-            LIMIT 15;
-        """)
+    if score_index.loaded:
+        rows = [{"user_id": uid, "total_points": points} for uid, points in score_index.top(15)]
+    else:
+        rows = await db.top_scores(15)
 
     if not rows:
         await ctx.send("📊 No leaderboard data yet.")
@@ -1157,7 +1031,7 @@ async def leaderboard(ctx):
 # !shop
 @bot.command()
 async def shop(ctx):
-    view = ShopView(ctx.author.id, db_pool)  # ✅ Pass db_pool to handle purchases
+    view = ShopView(ctx.author.id, db, profiles)  # ✅ Pass db to handle purchases
 
     embed = discord.Embed(
         title="💎🌟 Mingyu's LOVE.MONEY.FAME Shop",
@@ -1194,20 +1068,14 @@ async def shop(ctx):
 async def items(ctx):
     user_id = ctx.author.id
 
-    async with db_pool.acquire() as conn:
-        rows = await conn.fetch("""
-            SELECT item, quantity FROM user_items
-            WHERE user_id = $1
-        """, user_id)
+    profile = await profiles.get(user_id)
 
     embed = discord.Embed(title="💼 Your Items", color=discord.Color.green())
 
-    if not rows:
+    if not profile.items:
         embed.description = "📦 You don't have any items."
     else:
-        for row in rows:
-            item = row["item"]
-            quantity = row["quantity"]
+        for item, quantity in profile.items.items():
 
             if item == "extra_drop":
                 name = "🎴 Extra Drops"
@@ -1226,26 +1094,24 @@ async def reroll(ctx):
     user_id = ctx.author.id
     reroll_cost = 50  # cost of reroll in coins
 
-    async with db_pool.acquire() as conn:
+    async with db.acquire() as conn:
         # Check if user exists
-        user = await conn.fetchrow("SELECT coins FROM users WHERE user_id = $1", user_id)
-        if not user:
+        coins = await db.coins(user_id, conn)
+        if coins is None:
             await ctx.send("❌ You don't have an account yet. Use `!drop` first to start collecting!")
             return
 
-        coins = user["coins"]
-
         # Check if user has enough coins
         if coins < reroll_cost:
             await ctx.send(f"❌ You need **{reroll_cost} 🌟 aura points** to buy a reroll pack. You only have {coins}.")
             return
 
         # Deduct coins
-        await conn.execute("UPDATE users SET coins = coins - $1 WHERE user_id = $2", reroll_cost, user_id)
+        await db.spend_coins(user_id, reroll_cost, conn)
+    profiles.invalidate(user_id)
 
     # ✅ Remove cooldown for this reroll
-    if user_id in drop_cooldowns:
-        del drop_cooldowns[user_id]
+    await cooldowns.clear("drop", user_id)
 
     # ✅ Confirm purchase
     embed = discord.Embed(
@@ -1263,19 +1129,37 @@ async def reroll(ctx):
 async def wishlist(ctx, action=None, *, card_name=None):
     user_id = ctx.author.id
 
-    async with db_pool.acquire() as conn:
+    async with db.acquire() as conn:
         # ✅ View Wishlist
         if action is None:
-            rows = await conn.fetch("SELECT card_name FROM wishlists WHERE user_id = $1", user_id)
+            rows = await db.wishes(user_id, conn)
             if not rows:
                 await ctx.send(f"📜 {ctx.author.mention}, your wishlist is empty!")
                 return
 
-            wishlist = "\n".join([f"• {row['card_name']}" for row in rows])
+            wishlist = "\n".join([
+                f"• {row['card_name']}" if row['kind'] == "member" else f"• {row['card_name']} ({row['kind']})"
+                for row in rows
+            ])
             embed = discord.Embed(title=f"💖 {ctx.author.display_name}'s Wishlist", description=wishlist, color=discord.Color.pink())
             await ctx.send(embed=embed)
             return
 
+        if action.lower() == "stats":
+            stats = wishlist_index.stats()
+            await ctx.send(
+                f"📊 {stats['entries']} wishes from {stats['users']} collectors on {stats['names']} names "
+                f"(~{stats['memory_bytes'] / 1024:.1f} KiB in memory)"
+            )
+            return
+
+        # `group <name>` and `concept <name>` wish for every matching card
+        kind = "member"
+        if card_name:
+            first, _, rest = card_name.strip().partition(" ")
+            if first.lower() in ("group", "concept") and rest.strip():
+                kind, card_name = first.lower(), rest
+
         # Normalize card name regardless of case
         if card_name:
             titleized_name = card_name.strip().title()
@@ -1288,11 +1172,22 @@ async def wishlist(ctx, action=None, *, card_name=None):
                 await ctx.send("⚠️ Please specify the card name to add!")
                 return
 
+            if kind == "group":
+                matches = catalog.group(titleized_name)
+                titleized_name = matches[0].group if matches else titleized_name
+            elif kind == "concept":
+                matches = catalog.concept(titleized_name)
+                titleized_name = matches[0].concept if matches else titleized_name
+            else:
+                matches = catalog.find(titleized_name)
+
+            if not matches:
+                await ctx.send(f"⚠️ There's no photocard of **{titleized_name}** yet!")
+                return
+
             try:
-                await conn.execute(
-                    "INSERT INTO wishlists (user_id, card_name) VALUES ($1, $2) ON CONFLICT DO NOTHING",
-                    user_id, titleized_name
-                )
+                await db.add_wish(user_id, kind, titleized_name, conn)
+                wishlist_index.add(user_id, kind, titleized_name)
                 await ctx.send(f"⭐ Added **{titleized_name}** to your wishlist!")
             except Exception as e:
                 await ctx.send("❌ Error adding to wishlist.")
@@ -1303,14 +1198,50 @@ async def wishlist(ctx, action=None, *, card_name=None):
                 await ctx.send("⚠️ Please specify the card name to remove!")
                 return
 
-            deleted = await conn.execute("DELETE FROM wishlists WHERE user_id = $1 AND card_name = $2", user_id, titleized_name)
-            if deleted.endswith("0"):
+            removed = await db.remove_wish(user_id, kind, titleized_name, conn)
+            if not removed:
                 await ctx.send(f"⚠️ **{titleized_name}** wasn't on your wishlist.")
             else:
+                wishlist_index.remove(user_id, kind, titleized_name)
                 await ctx.send(f"🗑️ Removed **{titleized_name}** from your wishlist!")
 
         else:
-            await ctx.send("⚠️ Invalid option! Use `!wl`, `!wl add <card>`, or `!wl remove <card>`.")
+            await ctx.send("⚠️ Invalid option! Use `!wl`, `!wl add <card>`, `!wl add group <group>`, `!wl add concept <concept>`, `!wl remove <card>` or `!wl stats`.")
+
+# !stats (owner only) - cache and render health
+@bot.command(name="stats", hidden=True)
+@commands.is_owner()
+async def stats(ctx):
+    render = render_service.stats()
+    cache = profiles.stats()
+    wishes = wishlist_index.stats()
+    images = assets.stats()
+
+    lines = [
+        f"**Profiles:** {cache['size']} cached, hit rate {cache['hit_rate']:.1%} ({cache['hits']} hits / {cache['misses']} misses)",
+        f"**Wishlists:** {wishes['entries']} entries for {wishes['users']} users (~{wishes['memory_bytes'] // 1024} KiB)",
+        f"**Cooldowns:** {len(cooldowns)} running",
+        f"**Trades:** {len(trades)} open",
+        f"**Renders:** {render['pending']} pending, {render['rejected']} rejected",
+        f"**Card images:** {images['backend']} store, {images['indexed']} indexed, {images['cached']} cached "
+        f"({images['cached_bytes'] // 1024} KiB), hit rate {images['hit_rate']:.1%}",
+    ]
+    for kind, summary in render["renders"].items():
+        lines.append(f"- {kind}: p50 {summary['p50'] * 1000:.0f} ms, p95 {summary['p95'] * 1000:.0f} ms ({summary['count']} renders)")
+
+    # Deadlines waiting in the shared scheduler, per subsystem
+    lines.append(f"**Timers:** {len(scheduler)} pending")
+    for subsystem, counts in scheduler.stats().items():
+        lines.append(f"- {subsystem}: {counts['pending']} pending, {counts['fired']} fired")
+
+    # Queries that spent the most total time in Postgres
+    queries = list(db.stats().items())[:5]
+    if queries:
+        lines.append("**Queries:**")
+    for name, summary in queries:
+        lines.append(f"- {name}: p50 ≤{summary['p50'] * 1000:.0f} ms, p95 ≤{summary['p95'] * 1000:.0f} ms ({summary['count']} calls)")
+
+    await ctx.send("\n".join(lines))
 
 # !help    
 @bot.command()
@@ -1324,7 +1255,7 @@ async def help(ctx):
                            color=discord.Color.blue())
     embed1.add_field(name="🃏 Drop Cards", value="`!drop` — Drop a set of cards that anyone can claim.", inline=False)
     embed1.add_field(name="📁 View Collection", value="`!collection` or `!pc` — View your card collection. Can sort by group, member, or rarity.", inline=False)
-    embed1.add_field(name="🔁 Trade Cards", value="`!trade @user <card_uid>` — Propose a trade.", inline=False)
+    embed1.add_field(name="🔁 Trade Cards", value="`!trade @user <card_uid> [for <their card_uid>]` — Propose a trade. Can offer several cards.", inline=False)
     embed1.add_field(name="♻️ Recycle", value="`!r <card_uid>` — Discard a card for coins. Can multi-recycle. Can also recycle by a tag.", inline=False)
     embed1.add_field(name="📷 Tag", value="`!tag <emoji>` or `!tag <card_uid> emoji`  — Customize your collection tag. Can add different tags for cards.", inline=False)
     embed1.add_field(name="✅ Daily", value="`!daily` — Random daily check-in!", inline=False)
@@ -1351,4 +1282,6 @@ async def help(ctx):
     view = HelpPaginator(pages, ctx)
     view.message = await ctx.send(embed=pages[0], view=view)
 
-bot.run(TOKEN)
\ No newline at end of file
+# Importable without connecting, e.g. by benchmarks/drop_pipeline.py
+if __name__ == "__main__":
+    bot.run(TOKEN)
@@ -0,0 +1,151 @@
+import json
+import mmap
+import os
+import sys
+from PIL import Image
+
+from image_helpers import _render_frame, drop_card_size, use_atlases
+
+# Card atlas
+# Every card of a tier (one frame at one size) is stored as a raw RGBA block in a single file,
+# so rendering slices a memory-mapped view instead of decoding the JPEG again.
+ATLAS_DIR = os.getenv("ATLAS_DIR", ".cache/atlas")
+
+
+def tier_name(frame_name, size):
+    return f"{frame_name}_{size[0]}x{size[1]}"
+
+def default_tiers(frame_paths):
+    """One drop-size tier per frame (the bot passes FRAME_PATH and MYTHIC_FRAME_PATH), named after the frame file."""
+    drop_size, _ = drop_card_size(3)
+    return [(os.path.splitext(os.path.basename(frame_path))[0], frame_path, drop_size) for frame_path in frame_paths]
+
+
+class CardAtlas:
+    def __init__(self, data_path, index):
+        self.data_path = data_path
+        self.name = os.path.splitext(os.path.basename(data_path))[0]
+        self.frame_path = os.path.abspath(index["frame"])
+        self.frame_mtime = index["frame_mtime"]
+        self.size = tuple(index["size"])
+        self.block_size = self.size[0] * self.size[1] * 4
+        self.cards = index["cards"]
+        self._file = open(data_path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.cards else None
+
+    @classmethod
+    def load(cls, atlas_dir, name):
+        index_path = os.path.join(atlas_dir, f"{name}.json")
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        return cls(os.path.join(atlas_dir, f"{name}.rgba"), index)
+
+    def matches(self, frame_path, size):
+        return (
+            self.size == tuple(size)
+            and self.frame_path == os.path.abspath(frame_path)
+            and self.frame_mtime == os.path.getmtime(frame_path)
+        )
+
+    def block(self, card_path):
+        """Zero-copy view of a card's pixels, or None when the card is missing or stale."""
+        entry = self.cards.get(os.path.abspath(card_path))
+        if entry is None or entry["mtime"] != os.path.getmtime(card_path):
+            return None
+        offset = entry["offset"]
+        try:
+            return memoryview(self._map)[offset:offset + self.block_size]
+        except ValueError:
+            # Closed by use_atlases() while a render thread was still looking at it
+            return None
+
+    def get(self, card_path):
+        """Framed card as a read-only image backed by the atlas, or None."""
+        pixels = self.block(card_path)
+        if pixels is None:
+            return None
+        return Image.frombuffer("RGBA", self.size, pixels, "raw", "RGBA", 0, 1)
+
+    def close(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Images sliced from this atlas are still alive, the map goes away with them
+                pass
+        self._file.close()
+
+
+def build_atlas(card_paths, frame_name, frame_path, size, atlas_dir=ATLAS_DIR):
+    """Build or incrementally update one atlas tier. Returns (rendered, reused)."""
+    os.makedirs(atlas_dir, exist_ok=True)
+    name = tier_name(frame_name, size)
+    data_path = os.path.join(atlas_dir, f"{name}.rgba")
+    index_path = os.path.join(atlas_dir, f"{name}.json")
+
+    previous = None
+    if os.path.exists(index_path) and os.path.exists(data_path):
+        previous = CardAtlas.load(atlas_dir, name)
+        if not previous.matches(frame_path, size):
+            previous.close()
+            previous = None
+
+    block_size = size[0] * size[1] * 4
+    cards = {}
+    rendered = reused = 0
+    tmp_path = f"{data_path}.tmp"
+
+    with open(tmp_path, "wb") as out:
+        for card_path in dict.fromkeys(card_paths):
+            if not os.path.exists(card_path):
+                print(f"Skipping missing card image: {card_path}")
+                continue
+
+            pixels = previous.block(card_path) if previous else None
+            if pixels is not None:
+                out.write(pixels)
+                pixels.release()
+                reused += 1
+            else:
+                out.write(_render_frame(card_path, frame_path, size).tobytes())
+                rendered += 1
+
+            cards[os.path.abspath(card_path)] = {
+                "offset": len(cards) * block_size,
+                "mtime": os.path.getmtime(card_path),
+            }
+
+    if previous:
+        previous.close()
+
+    index = {
+        "frame": frame_path,
+        "frame_mtime": os.path.getmtime(frame_path),
+        "size": list(size),
+        "cards": cards,
+    }
+    os.replace(tmp_path, data_path)
+    with open(f"{index_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(f"{index_path}.tmp", index_path)
+    return rendered, reused
+
+def build_atlases(card_paths, frame_paths, atlas_dir=ATLAS_DIR, tiers=None):
+    """Build every tier for the card images from cards.json and return the loaded atlases."""
+    atlases = []
+    for frame_name, frame_path, size in tiers or default_tiers(frame_paths):
+        rendered, reused = build_atlas(card_paths, frame_name, frame_path, size, atlas_dir)
+        print(f"Atlas {tier_name(frame_name, size)}: {rendered} rendered, {reused} reused")
+        atlases.append(CardAtlas.load(atlas_dir, tier_name(frame_name, size)))
+    return atlases
+
+def attach_atlases(atlas_dir, names):
+    """Load these tiers and serve renders from them. Also the initializer for render worker
+    processes, which don't share the bot process's atlases (see RenderService.init_workers)."""
+    use_atlases([CardAtlas.load(atlas_dir, name) for name in names])
+
+
+if __name__ == "__main__":
+    # python card_atlas.py cards.json images/frame.png images/scuff_frame.png
+    with open(sys.argv[1] if len(sys.argv) > 1 else "cards.json", encoding="utf-8") as f:
+        build_atlases([card["image"] for card in json.load(f)], sys.argv[2:] or ["./images/frame.png", "./images/scuff_frame.png"])
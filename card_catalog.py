@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import pickle
+import random
+import time
+from collections import defaultdict
+
+CATALOG_CACHE_DIR = os.getenv("CATALOG_CACHE_DIR", ".cache")
+# Bump when Card/CardCatalog change shape so old pickles are ignored
+CATALOG_CACHE_VERSION = 2
+
+
+class CatalogError(ValueError):
+    """cards.json failed validation."""
+
+
+class Card:
+    """One entry of cards.json."""
+    __slots__ = ("name", "group", "concept", "image", "is_limited_mythic", "weight")
+
+    def __init__(self, name, group, concept="Base", image=None, is_limited_mythic=False, weight=1.0):
+        self.name = name
+        self.group = group
+        self.concept = concept
+        self.image = image
+        self.is_limited_mythic = is_limited_mythic in (1, True, "1")
+        self.weight = float(weight)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["name"],
+            data["group"],
+            data.get("concept", "Base"),
+            data.get("image"),
+            data.get("is_limited_mythic", False),
+            data.get("weight", 1.0),
+        )
+
+    def to_dict(self):
+        data = {"name": self.name, "group": self.group, "concept": self.concept, "image": self.image}
+        if self.is_limited_mythic:
+            data["is_limited_mythic"] = 1
+        return data
+
+    def __repr__(self):
+        return f"Card({self.name!r}, {self.group!r}, {self.concept!r})"
+
+
+class CardCatalog:
+    """All droppable cards with lookup indexes and O(1) weighted sampling (alias method)."""
+
+    def __init__(self, cards):
+        self.cards = [card if isinstance(card, Card) else Card.from_dict(card) for card in cards]
+        self.by_name = defaultdict(list)
+        self.by_group = defaultdict(list)
+        self.by_concept = defaultdict(list)
+        self.by_name_concept = defaultdict(list)
+        self.by_image = {}
+        self.limited_mythics = set()
+
+        for card in self.cards:
+            self.by_name[card.name.lower()].append(card)
+            self.by_group[card.group.lower()].append(card)
+            self.by_concept[card.concept.lower()].append(card)
+            self.by_name_concept[(card.name.lower(), card.concept.lower())].append(card)
+            if card.image:
+                self.by_image[card.image] = card
+            if card.is_limited_mythic:
+                self.limited_mythics.add((card.name, card.concept))
+
+        self.by_name = dict(self.by_name)
+        self.by_group = dict(self.by_group)
+        self.by_concept = dict(self.by_concept)
+        self.by_name_concept = dict(self.by_name_concept)
+        self._build_alias_table()
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __iter__(self):
+        return iter(self.cards)
+
+    def find(self, name, concept=None):
+        """Cards with this name (any case), optionally narrowed to one concept."""
+        if concept is not None:
+            return self.by_name_concept.get((name.lower(), concept.lower()), [])
+        return self.by_name.get(name.lower(), [])
+
+    def group(self, group_name):
+        return self.by_group.get(group_name.lower(), [])
+
+    def concept(self, concept_name):
+        return self.by_concept.get(concept_name.lower(), [])
+
+    def is_limited_mythic(self, name, concept="Base"):
+        return (name, concept) in self.limited_mythics
+
+    def _build_alias_table(self):
+        # Vose's alias method: one uniform index plus one coin flip per draw
+        n = len(self.cards)
+        total = sum(card.weight for card in self.cards)
+        self._prob = [0.0] * n
+        self._alias = [0] * n
+        if not n or total <= 0:
+            return
+
+        scaled = [card.weight * n / total for card in self.cards]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self._prob[s] = scaled[s]
+            self._alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+        for i in small + large:
+            self._prob[i] = 1.0
+
+    def choice(self, rng=random):
+        i = rng.randrange(len(self.cards))
+        return self.cards[i] if rng.random() < self._prob[i] else self.cards[self._alias[i]]
+
+    def sample(self, k, rng=random):
+        """k distinct cards drawn by weight (each draw is O(1), duplicates are redrawn)."""
+        if k > len(self.cards):
+            raise ValueError("Sample larger than catalog")
+        picked = {}
+        while len(picked) < k:
+            card = self.choice(rng)
+            picked.setdefault(id(card), card)
+        return list(picked.values())
+
+
+def validate_cards(entries):
+    """Check cards.json entries against the card schema. Returns a list of problems."""
+    problems = []
+    if not isinstance(entries, list):
+        return ["top level must be a list of cards"]
+
+    seen = set()
+    for i, entry in enumerate(entries):
+        where = f"card #{i}"
+        if not isinstance(entry, dict):
+            problems.append(f"{where}: must be an object")
+            continue
+        where = f"card #{i} ({entry.get('name', '?')})"
+
+        for field in ("name", "group", "image"):
+            if not isinstance(entry.get(field), str) or not entry[field].strip():
+                problems.append(f"{where}: '{field}' must be a non-empty string")
+        if not isinstance(entry.get("concept", "Base"), str):
+            problems.append(f"{where}: 'concept' must be a string")
+        if entry.get("is_limited_mythic", 0) not in (0, 1, True, False, "0", "1"):
+            problems.append(f"{where}: 'is_limited_mythic' must be 0 or 1")
+        weight = entry.get("weight", 1)
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight <= 0:
+            problems.append(f"{where}: 'weight' must be a positive number")
+        unknown = set(entry) - {"name", "group", "concept", "image", "is_limited_mythic", "weight"}
+        if unknown:
+            problems.append(f"{where}: unknown fields {sorted(unknown)}")
+
+        image = entry.get("image")
+        if isinstance(image, str) and image and not os.path.isfile(image):
+            problems.append(f"{where}: image not found: {image}")
+
+        if image in seen:
+            problems.append(f"{where}: image already used by another card: {image}")
+        seen.add(image)
+
+    return problems
+
+def load_catalog(path="cards.json", cache_dir=CATALOG_CACHE_DIR):
+    """Validate and index cards.json, reusing the compiled catalog cached for this exact file."""
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    digest = hashlib.sha256(raw).hexdigest()[:16]
+    cache_file = os.path.join(cache_dir, f"catalog-v{CATALOG_CACHE_VERSION}-{digest}.pickle")
+    source = "cache"
+
+    catalog = None
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                catalog = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            catalog = None
+        # The digest only covers cards.json, so images deleted or renamed since are caught here:
+        # the cache is dropped and the full validation below reports them
+        if catalog is not None and not all(os.path.isfile(card.image) for card in catalog):
+            catalog = None
+            os.remove(cache_file)
+
+    if catalog is None:
+        source = path
+        entries = json.loads(raw)
+        problems = validate_cards(entries)
+        if problems:
+            raise CatalogError(f"{path} has {len(problems)} problem(s):\n" + "\n".join(problems))
+
+        catalog = CardCatalog(entries)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_file}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(catalog, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_file)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"Cards loaded: {len(catalog)} cards, {len(catalog.by_group)} groups, "
+          f"{len(catalog.limited_mythics)} limited mythics from {source} in {elapsed_ms:.1f} ms")
+    return catalog
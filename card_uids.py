@@ -0,0 +1,133 @@
+import os
+from collections import OrderedDict
+
+UID_CACHE_SIZE = int(os.getenv("UID_CACHE_SIZE", 10000))
+
+# Issued UIDs are 5 Crockford base32 digits of a Postgres sequence value plus a Luhn mod 32
+# check digit (migrations/010_compact_uids.sql does the same in SQL). 32^5 is ~33.5M cards.
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+COMPACT_UID_PAYLOAD = 5
+COMPACT_UID_LENGTH = COMPACT_UID_PAYLOAD + 1
+
+# Letters people type for digits that aren't in the alphabet
+CROCKFORD_ALIASES = str.maketrans({"I": "1", "L": "1", "O": "0"})
+
+# Custom UIDs are letters and digits, at most 10 (see !customize). Pre-010 UIDs are up to 4 letters
+# of the member name plus short_id and edition, 2+ digits each; 16 leaves room for 6-digit counters.
+# Issued UIDs are 6 characters. Input longer than this, or with anything else in it, is no UID.
+UID_MAX_LENGTH = 16
+
+
+def normalize_uid(card_uid):
+    """Canonical form of a card UID as stored in user_cards.card_uid_norm."""
+    return card_uid.strip().upper()
+
+
+def check_digit(payload):
+    """Luhn mod 32 check digit: catches any single wrong digit and almost all swapped neighbours."""
+    total = 0
+    factor = 2
+    for char in reversed(payload):
+        addend = factor * CROCKFORD.index(char)
+        total += addend // 32 + addend % 32
+        factor = 3 - factor
+    return CROCKFORD[-total % 32]
+
+
+def encode_uid(value):
+    """Issued UID for a card_uid_seq value."""
+    digits = ""
+    while True:
+        value, digit = divmod(value, 32)
+        digits = CROCKFORD[digit] + digits
+        if value == 0:
+            break
+    payload = digits.rjust(COMPACT_UID_PAYLOAD, "0")
+    return payload + check_digit(payload)
+
+
+def is_possible_uid(text):
+    """Whether this input could be an issued, custom or pre-010 UID at all."""
+    card_uid = normalize_uid(text)
+    return card_uid.isalnum() and len(card_uid) <= UID_MAX_LENGTH
+
+
+def is_compact_shape(card_uid):
+    """Whether this looks like an issued UID, check digit aside."""
+    card_uid = normalize_uid(card_uid).translate(CROCKFORD_ALIASES)
+    return len(card_uid) == COMPACT_UID_LENGTH and all(char in CROCKFORD for char in card_uid)
+
+
+def uid_forms(text):
+    """Stored UIDs this input could mean, most likely first.
+
+    That is the input as typed (normalized), then for issued-UID-shaped input the same with
+    I/L/O read as 1/1/0. Custom and pre-010 UIDs have the same shape (JENNIE, RM0101, HOLLOW),
+    so both are looked up and the form as typed wins. Input that can't be a UID gives none, so it
+    is turned away without a lookup.
+    """
+    if not is_possible_uid(text):
+        return []
+    card_uid = normalize_uid(text)
+    aliased = card_uid.translate(CROCKFORD_ALIASES)
+    if aliased != card_uid and is_compact_shape(aliased):
+        return [card_uid, aliased]
+    return [card_uid]
+
+
+def is_reserved_uid(text):
+    """Whether a custom UID could be mistaken for an issued one: 6 Crockford characters (reading
+    I/L/O as 1/1/0) whose last is the check digit of the other five. Every such payload is within
+    card_uid_seq's range, so these are kept for issued UIDs; other 6-character names are free."""
+    card_uid = normalize_uid(text).translate(CROCKFORD_ALIASES)
+    return is_compact_shape(card_uid) and check_digit(card_uid[:-1]) == card_uid[-1]
+
+
+def is_uid_typo(text):
+    """Whether input that matched no card looks like an issued UID with a wrong check digit."""
+    card_uid = normalize_uid(text).translate(CROCKFORD_ALIASES)
+    return is_compact_shape(card_uid) and check_digit(card_uid[:-1]) != card_uid[-1]
+
+
+def typo_hint(card_uids):
+    """Message suffix pointing at the UIDs (that matched nothing) likely to be typos, or ""."""
+    invalid = [card_uid for card_uid in card_uids if not is_possible_uid(card_uid)]
+    typos = [card_uid for card_uid in card_uids if is_possible_uid(card_uid) and is_uid_typo(card_uid)]
+    hint = ""
+    if invalid:
+        hint += (f"\n🔎 {', '.join(f'`{card_uid}`' for card_uid in invalid)} can't be a card UID, "
+                 f"those are letters and digits only (at most {UID_MAX_LENGTH}).")
+    if typos:
+        hint += f"\n🔎 Check {', '.join(f'`{card_uid}`' for card_uid in typos)} for a typo, the last character doesn't match."
+    return hint
+
+
+class UidCache:
+    """LRU of canonical card UID -> (owner user_id, user_cards.id).
+
+    Entries are hints: Database.card() re-checks owner and UID in the same primary key probe
+    that reads the row, so a stale entry only costs a fallback lookup by UID.
+    """
+
+    def __init__(self, max_size=UID_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def get(self, card_uid):
+        entry = self.entries.get(card_uid)
+        if entry is not None:
+            self.entries.move_to_end(card_uid)
+        return entry
+
+    def put(self, card_uid, user_id, card_id):
+        self.entries[card_uid] = (user_id, card_id)
+        self.entries.move_to_end(card_uid)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def forget(self, *card_uids):
+        for card_uid in card_uids:
+            self.entries.pop(card_uid, None)
+
+    def __len__(self):
+        return len(self.entries)
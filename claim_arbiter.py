@@ -0,0 +1,49 @@
+from collections import namedtuple
+
+# One reaction on a drop: who, which card, when it arrived and its arrival order (tie-breaker)
+ClaimAttempt = namedtuple("ClaimAttempt", ["user_id", "emoji", "at", "seq"])
+
+# kind is "won", "priority", "cooldown", "already_claimed" or "out_of_stock"
+ClaimOutcome = namedtuple("ClaimOutcome", ["kind", "attempt", "uses_item"])
+
+
+def arbitrate(attempts, claimed, dropper_id, drop_time, priority_window,
+              on_cooldown=frozenset(), extra_claims=None, claimed_users=frozenset()):
+    """Resolve a batch of reactions against the open card slots.
+
+    Attempts are settled strictly in (arrival time, arrival order), so the outcome only depends
+    on the batch contents and never on DB latency. `claimed` maps emoji -> user_id for slots that
+    are already gone, `on_cooldown` holds users who need an Extra Claim (their counts are in
+    `extra_claims`), and `claimed_users` are users who already took a card from this drop.
+    Returns the outcome of every attempt in the order they were settled.
+    """
+    extra_claims = dict(extra_claims or {})
+    taken = dict(claimed)
+    winners = set(claimed_users)
+    outcomes = []
+
+    for attempt in sorted(attempts, key=lambda a: (a.at, a.seq)):
+        if attempt.user_id != dropper_id and attempt.at - drop_time < priority_window:
+            outcomes.append(ClaimOutcome("priority", attempt, False))
+            continue
+
+        if attempt.user_id in winners:
+            outcomes.append(ClaimOutcome("already_claimed", attempt, False))
+            continue
+
+        if attempt.emoji in taken:
+            outcomes.append(ClaimOutcome("out_of_stock", attempt, False))
+            continue
+
+        uses_item = attempt.user_id in on_cooldown
+        if uses_item:
+            if extra_claims.get(attempt.user_id, 0) <= 0:
+                outcomes.append(ClaimOutcome("cooldown", attempt, False))
+                continue
+            extra_claims[attempt.user_id] -= 1
+
+        taken[attempt.emoji] = attempt.user_id
+        winners.add(attempt.user_id)
+        outcomes.append(ClaimOutcome("won", attempt, uses_item))
+
+    return outcomes
@@ -0,0 +1,201 @@
+import asyncio
+import heapq
+import os
+import sqlite3
+import threading
+import time
+
+COOLDOWN_BACKEND = os.getenv("COOLDOWN_BACKEND", "postgres")  # memory, sqlite or postgres
+COOLDOWN_SQLITE_PATH = os.getenv("COOLDOWN_SQLITE_PATH", ".cache/cooldowns.sqlite3")
+
+
+class MemoryCooldownBackend:
+    """Nothing survives a restart or is seen by other processes."""
+
+    shared = False
+
+    async def load(self, now):
+        return []
+
+    async def running(self, kind, user_ids, now):
+        return {}
+
+    async def set(self, kind, user_id, expires_at):
+        pass
+
+    async def clear(self, kind, user_id):
+        pass
+
+    async def purge(self, now):
+        pass
+
+
+class SQLiteCooldownBackend:
+    """One file, shared by every bot process on the same host."""
+
+    shared = True
+
+    def __init__(self, path=COOLDOWN_SQLITE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Statements run in to_thread workers; the lock keeps them (and their commits) one at a time
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS cooldowns (
+                kind TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (kind, user_id)
+            )
+        """)
+        self.conn.commit()
+
+    def _run(self, sql, *args):
+        with self.lock:
+            rows = self.conn.execute(sql, args).fetchall()
+            self.conn.commit()
+            return rows
+
+    async def load(self, now):
+        return await asyncio.to_thread(self._run, "SELECT kind, user_id, expires_at FROM cooldowns WHERE expires_at > ?", now)
+
+    async def running(self, kind, user_ids, now):
+        placeholders = ", ".join("?" * len(user_ids))
+        rows = await asyncio.to_thread(
+            self._run,
+            f"SELECT user_id, expires_at FROM cooldowns WHERE kind = ? AND expires_at > ? AND user_id IN ({placeholders})",
+            kind, now, *user_ids,
+        )
+        return dict(rows)
+
+    async def set(self, kind, user_id, expires_at):
+        await asyncio.to_thread(self._run, """
+            INSERT INTO cooldowns (kind, user_id, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (kind, user_id) DO UPDATE SET expires_at = excluded.expires_at
+        """, kind, user_id, expires_at)
+
+    async def clear(self, kind, user_id):
+        await asyncio.to_thread(self._run, "DELETE FROM cooldowns WHERE kind = ? AND user_id = ?", kind, user_id)
+
+    async def purge(self, now):
+        await asyncio.to_thread(self._run, "DELETE FROM cooldowns WHERE expires_at <= ?", now)
+
+
+class PostgresCooldownBackend:
+    """Uses the cooldowns table from migrations/005_cooldowns.sql."""
+
+    shared = True
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def load(self, now):
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT kind, user_id, EXTRACT(EPOCH FROM expires_at)::float8 AS expires_at
+                FROM cooldowns
+                WHERE expires_at > to_timestamp($1)
+            """, now)
+        return [(row["kind"], row["user_id"], row["expires_at"]) for row in rows]
+
+    async def running(self, kind, user_ids, now):
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT user_id, EXTRACT(EPOCH FROM expires_at)::float8 AS expires_at
+                FROM cooldowns
+                WHERE kind = $1 AND user_id = ANY($2::bigint[]) AND expires_at > to_timestamp($3)
+            """, kind, user_ids, now)
+        return {row["user_id"]: row["expires_at"] for row in rows}
+
+    async def set(self, kind, user_id, expires_at):
+        async with self.pool.acquire() as conn:
+            await conn.execute("""
+                INSERT INTO cooldowns (kind, user_id, expires_at) VALUES ($1, $2, to_timestamp($3))
+                ON CONFLICT (kind, user_id) DO UPDATE SET expires_at = EXCLUDED.expires_at
+            """, kind, user_id, expires_at)
+
+    async def clear(self, kind, user_id):
+        async with self.pool.acquire() as conn:
+            await conn.execute("DELETE FROM cooldowns WHERE kind = $1 AND user_id = $2", kind, user_id)
+
+    async def purge(self, now):
+        async with self.pool.acquire() as conn:
+            await conn.execute("DELETE FROM cooldowns WHERE expires_at <= to_timestamp($1)", now)
+
+
+def make_cooldown_backend(name=COOLDOWN_BACKEND, pool=None):
+    if name == "sqlite":
+        return SQLiteCooldownBackend()
+    if name == "postgres":
+        return PostgresCooldownBackend(pool)
+    return MemoryCooldownBackend()
+
+
+class CooldownStore:
+    """Drop/claim cooldowns with TTL expiry.
+
+    remaining() answers from memory (that is all !cd uses). Writes go through to the backend so
+    cooldowns survive restarts, and check()/check_many(), which enforce drops and claims, ask a
+    shared backend about users with nothing running in memory, so a cooldown started by another
+    bot process counts too. A clear() in another process is only seen here once the local entry
+    expires. Expired entries are evicted from a min-heap of deadlines, so memory only holds
+    cooldowns that are still running.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryCooldownBackend()
+        self.expires = {}
+        self.deadlines = []
+
+    async def attach(self, backend):
+        """Switch to a persistent backend and load the cooldowns that are still running."""
+        self.backend = backend
+        now = time.time()
+        await backend.purge(now)
+        for kind, user_id, expires_at in await backend.load(now):
+            self._put(kind, user_id, expires_at)
+
+    def _put(self, kind, user_id, expires_at):
+        self.expires[(kind, user_id)] = expires_at
+        heapq.heappush(self.deadlines, (expires_at, kind, user_id))
+
+    def _evict(self, now):
+        while self.deadlines and self.deadlines[0][0] <= now:
+            expires_at, kind, user_id = heapq.heappop(self.deadlines)
+            # Skip heap entries superseded by a later start() or clear()
+            if self.expires.get((kind, user_id)) == expires_at:
+                del self.expires[(kind, user_id)]
+
+    def remaining(self, kind, user_id):
+        """Seconds left on this cooldown as this process knows it, 0 when it isn't running."""
+        now = time.time()
+        self._evict(now)
+        expires_at = self.expires.get((kind, user_id))
+        return max(0.0, expires_at - now) if expires_at else 0.0
+
+    async def check_many(self, kind, user_ids):
+        """{user_id: seconds left} for these users, including cooldowns other processes started."""
+        now = time.time()
+        self._evict(now)
+        unknown = [user_id for user_id in dict.fromkeys(user_ids) if (kind, user_id) not in self.expires]
+        if unknown and self.backend.shared:
+            for user_id, expires_at in (await self.backend.running(kind, unknown, now)).items():
+                self._put(kind, user_id, expires_at)
+        return {user_id: self.remaining(kind, user_id) for user_id in user_ids}
+
+    async def check(self, kind, user_id):
+        return (await self.check_many(kind, [user_id]))[user_id]
+
+    async def start(self, kind, user_id, duration):
+        expires_at = time.time() + duration
+        self._put(kind, user_id, expires_at)
+        await self.backend.set(kind, user_id, expires_at)
+
+    async def clear(self, kind, user_id):
+        self.expires.pop((kind, user_id), None)
+        await self.backend.clear(kind, user_id)
+
+    def __len__(self):
+        self._evict(time.time())
+        return len(self.expires)
@@ -0,0 +1,544 @@
+import asyncpg
+import bisect
+import os
+import time
+from collections import defaultdict
+
+from card_uids import UidCache, normalize_uid, uid_forms
+
+STATEMENT_CACHE_SIZE = int(os.getenv("STATEMENT_CACHE_SIZE", 200))
+
+# Upper bounds of the latency histogram buckets in milliseconds (the last bucket is open ended)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# !collection sort orders: (ORDER BY expressions, direction, row fields of the keyset cursor).
+# id breaks ties so every cursor points at exactly one row; rarity_rank() (migrations/012)
+# ranks rarities Common -> Mythic, with unknown rarities last.
+COLLECTION_SORTS = {
+    "date_obtained": (("date_obtained", "id"), "DESC", ("date_obtained", "id")),
+    "rarity": (("rarity_rank(rarity)", "id"), "ASC", ("rarity", "id")),
+    "member_name": (("member_name", "id"), "ASC", ("member_name", "id")),
+    "group_name": (("group_name", "member_name", "id"), "ASC", ("group_name", "member_name", "id")),
+}
+
+COLLECTION_FILTERS = {
+    "all": "",
+    "rarity": "AND rarity = $2",
+    "name": "AND (group_key = $2 OR member_key = $2)",
+}
+
+# Every statement the bot runs against Postgres, by name. asyncpg prepares each one on a
+# connection the first time it runs there and keeps it in the statement cache (sized in
+# create_pool to hold them all), so later runs skip parse/plan.
+# migrations/006_access_paths.sql has an index for each; `python migrate.py check` verifies them.
+QUERIES = {
+    # users
+    "profiles": """
+        SELECT k.user_id,
+               u.user_id IS NOT NULL AS has_account,
+               u.coins,
+               u.emoji,
+               u.last_daily,
+               COALESCE(
+                   (SELECT json_object_agg(i.item, i.quantity) FROM user_items i WHERE i.user_id = k.user_id),
+                   '{}'
+               ) AS items
+        FROM UNNEST($1::bigint[]) AS k(user_id)
+        LEFT JOIN users u ON u.user_id = k.user_id
+    """,
+    "ensure_user": """
+        INSERT INTO users (user_id, coins, last_daily)
+        VALUES ($1, 0, NULL)
+        ON CONFLICT (user_id) DO NOTHING
+    """,
+    "coins": "SELECT coins FROM users WHERE user_id = $1",
+    "daily_state": "SELECT coins, last_daily FROM users WHERE user_id = $1",
+    "set_daily": "UPDATE users SET coins = $1, last_daily = $2 WHERE user_id = $3",
+    "spend_coins": "UPDATE users SET coins = coins - $1 WHERE user_id = $2",
+    "add_coins": """
+        INSERT INTO users (user_id, coins)
+        VALUES ($1, $2)
+        ON CONFLICT (user_id)
+        DO UPDATE SET coins = users.coins + EXCLUDED.coins
+    """,
+    "set_emoji": """
+        INSERT INTO users (user_id, emoji)
+        VALUES ($1, $2)
+        ON CONFLICT (user_id) DO UPDATE SET emoji = EXCLUDED.emoji
+    """,
+
+    # items
+    "lock_item": """
+        SELECT quantity FROM user_items
+        WHERE user_id = $1 AND item = $2 FOR UPDATE
+    """,
+    "use_item": """
+        UPDATE user_items
+        SET quantity = quantity - 1
+        WHERE user_id = $1 AND item = $2
+    """,
+    "add_item": """
+        INSERT INTO user_items (user_id, item, quantity)
+        VALUES ($1, $2, 1)
+        ON CONFLICT (user_id, item)
+        DO UPDATE SET quantity = user_items.quantity + 1
+    """,
+
+    # cards
+    "claim_cards": """
+        SELECT claimed_user_id, claimed_uid, claimed_short_id, claimed_edition
+        FROM claim_cards($1, $2, $3, $4, $5, $6, $7, $8)
+    """,
+    # UID arguments are uid_forms() of the input, compared with card_uid_norm (migrations/009) or with
+    # legacy_uid for the NAME + short_id + edition UIDs re-issued by migrations/010
+    "card": """
+        SELECT * FROM user_cards
+        WHERE (card_uid_norm = $2 OR legacy_uid = $2) AND user_id = $1
+    """,
+    "card_by_id": """
+        SELECT * FROM user_cards
+        WHERE id = $1 AND user_id = $2 AND card_uid_norm = $3
+    """,
+    # The NOT EXISTS covers databases where the unique index couldn't be built yet
+    "rename_card": """
+        UPDATE user_cards
+        SET card_uid = $1
+        WHERE id = $2 AND user_id = $3
+          AND NOT EXISTS (SELECT 1 FROM user_cards WHERE card_uid_norm = $1)
+        RETURNING id
+    """,
+    "cards": """
+        SELECT * FROM user_cards
+        WHERE (card_uid_norm = ANY($2::text[]) OR legacy_uid = ANY($2::text[])) AND user_id = $1
+        ORDER BY id
+    """,
+    "tag_cards": """
+        UPDATE user_cards
+        SET custom_tag = $1
+        WHERE (card_uid_norm = ANY($3::text[]) OR legacy_uid = ANY($3::text[])) AND user_id = $2
+    """,
+    "recycle_candidates": """
+        SELECT id, card_uid, member_name, concept, rarity FROM user_cards
+        WHERE user_id = $1
+          AND (rarity = ANY($2::text[]) OR custom_tag = ANY($3::text[]) OR card_uid_norm = ANY($4::text[])
+               OR legacy_uid = ANY($4::text[]))
+        ORDER BY id
+    """,
+    # Deletes only cards the user still owns and credits their recycle_value() (migrations/008)
+    "recycle_cards": """
+        WITH recycled AS (
+            DELETE FROM user_cards
+            WHERE user_id = $1 AND id = ANY($2::bigint[])
+            RETURNING id, card_uid, member_name, concept, rarity
+        ), credit AS (
+            INSERT INTO users (user_id, coins)
+            SELECT $1, SUM(recycle_value(rarity)) FROM recycled
+            HAVING COUNT(*) > 0
+            ON CONFLICT (user_id) DO UPDATE SET coins = COALESCE(users.coins, 0) + EXCLUDED.coins
+        )
+        SELECT card_uid, member_name, concept, rarity, recycle_value(rarity) AS aura
+        FROM recycled
+        ORDER BY id
+    """,
+
+    # scores (see migrations/002_user_scores.sql)
+    "score": "SELECT score FROM user_scores WHERE user_id = $1",
+    "rank_for_score": "SELECT COUNT(*) + 1 FROM user_scores WHERE score > $1",
+    "top_scores": """
+        SELECT user_id, score AS total_points
+        FROM user_scores
+        WHERE score > 0
+        ORDER BY score DESC
+        LIMIT $1
+    """,
+
+    # wishlists
+    "wishes": "SELECT kind, card_name FROM wishlists WHERE user_id = $1",
+    "member_wishes": """
+        SELECT user_id, card_name
+        FROM wishlists
+        WHERE kind = 'member' AND card_name_key = ANY($1::text[])
+    """,
+    "add_wish": """
+        INSERT INTO wishlists (user_id, kind, card_name) VALUES ($1, $2, $3)
+        ON CONFLICT DO NOTHING
+    """,
+    "remove_wish": """
+        DELETE FROM wishlists
+        WHERE user_id = $1 AND kind = $2 AND card_name_key = LOWER($3)
+        RETURNING 1
+    """,
+
+    # trades (see migrations/011_trades.sql)
+    "open_trade": """
+        WITH trade AS (
+            INSERT INTO trades (message_id, channel_id, sender_id, recipient_id, expires_at)
+            VALUES ($1, $2, $3, $4, $5)
+            RETURNING id
+        )
+        INSERT INTO trade_cards (trade_id, card_id, from_user_id, to_user_id)
+        SELECT trade.id, card_id, $3, $4 FROM trade, unnest($6::bigint[]) AS card_id
+        UNION ALL
+        SELECT trade.id, card_id, $4, $3 FROM trade, unnest($7::bigint[]) AS card_id
+        RETURNING trade_id
+    """,
+    "open_trades": """
+        SELECT message_id, channel_id, sender_id, recipient_id, expires_at
+        FROM trades
+        WHERE status = 'open' AND expires_at > CURRENT_TIMESTAMP
+    """,
+    "accept_trade": """
+        SELECT traded_card_id, traded_from, traded_to, traded_uid, traded_member, traded_rarity
+        FROM accept_trade($1, $2)
+    """,
+    "decline_trade": """
+        UPDATE trades
+        SET status = 'declined', resolved_at = CURRENT_TIMESTAMP
+        WHERE message_id = $1 AND status = 'open'
+        RETURNING id
+    """,
+    "expire_trades": """
+        UPDATE trades
+        SET status = 'expired', resolved_at = CURRENT_TIMESTAMP
+        WHERE status = 'open' AND expires_at <= $1
+        RETURNING message_id, channel_id
+    """,
+}
+
+COLLECTION_COLUMNS = "id, card_uid, member_name, group_name, concept, rarity, edition, custom_tag, date_obtained"
+
+
+def _collection_queries():
+    """Page and count statements for every (sort, filter) pair of !collection.
+
+    `collection:<sort>:<filter>` reads the first page and `...:after` the page following a keyset
+    cursor, so each page is one index range scan no matter how deep into the collection it is.
+    """
+    queries = {}
+    for filter_name, filter_clause in COLLECTION_FILTERS.items():
+        first_param = 2 if filter_name == "all" else 3
+        queries[f"collection_count:{filter_name}"] = f"""
+            SELECT COUNT(*) FROM user_cards
+            WHERE user_id = $1
+            {filter_clause}
+        """
+
+        for sort_name, (columns, direction, _) in COLLECTION_SORTS.items():
+            order_by = ", ".join(f"{column} {direction}" for column in columns)
+            cursor = ", ".join(
+                f"rarity_rank(${first_param + i})" if column.startswith("rarity_rank") else f"${first_param + i}"
+                for i, column in enumerate(columns)
+            )
+            comparison = "<" if direction == "DESC" else ">"
+
+            queries[f"collection:{sort_name}:{filter_name}"] = f"""
+                SELECT {COLLECTION_COLUMNS} FROM user_cards
+                WHERE user_id = $1
+                {filter_clause}
+                ORDER BY {order_by}
+                LIMIT ${first_param}
+            """
+            queries[f"collection:{sort_name}:{filter_name}:after"] = f"""
+                SELECT {COLLECTION_COLUMNS} FROM user_cards
+                WHERE user_id = $1
+                {filter_clause}
+                AND ({", ".join(columns)}) {comparison} ({cursor})
+                ORDER BY {order_by}
+                LIMIT ${first_param + len(columns)}
+            """
+    return queries
+
+
+QUERIES.update(_collection_queries())
+
+
+def collection_cursor(sort_key, row):
+    """Keyset cursor pointing just past this row for the given sort."""
+    return tuple(row[field] for field in COLLECTION_SORTS[sort_key][2])
+
+
+async def create_pool(**kwargs):
+    # Statements are prepared lazily, so one whose table or function is missing (say, before
+    # its migration is applied) only fails the command that runs it
+    return await asyncpg.create_pool(
+        statement_cache_size=max(STATEMENT_CACHE_SIZE, len(QUERIES) * 2),
+        **kwargs,
+    )
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; percentiles resolve to a bucket's upper bound."""
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        """Upper bound in seconds of the bucket holding the p-th percentile."""
+        if not self.count:
+            return 0.0
+        target = p * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.buckets_ms[i] / 1000 if i < len(self.buckets_ms) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+class Database:
+    """Every query the bot runs, as async methods over the pool.
+
+    Methods take an optional `conn` so callers can group several of them in one transaction;
+    without it they acquire a pooled connection for that one query.
+    """
+
+    def __init__(self, pool=None, uid_cache=None):
+        self.pool = pool
+        self.uid_cache = uid_cache or UidCache()
+        self.latencies = defaultdict(LatencyHistogram)
+
+    def acquire(self):
+        return self.pool.acquire()
+
+    async def _run(self, name, method, args, conn=None):
+        if conn is None:
+            async with self.pool.acquire() as conn:
+                return await self._run(name, method, args, conn)
+
+        started = time.perf_counter()
+        try:
+            return await getattr(conn, method)(QUERIES[name], *args)
+        finally:
+            self.latencies[name].observe(time.perf_counter() - started)
+
+    def stats(self):
+        """Latency summary per query name, slowest total time first."""
+        ordered = sorted(self.latencies.items(), key=lambda item: item[1].total, reverse=True)
+        return {name: histogram.summary() for name, histogram in ordered}
+
+    # users
+
+    async def profiles(self, user_ids, conn=None):
+        return await self._run("profiles", "fetch", (user_ids,), conn)
+
+    async def ensure_user(self, user_id, conn=None):
+        await self._run("ensure_user", "execute", (user_id,), conn)
+
+    async def coins(self, user_id, conn=None):
+        """Aura balance, or None when the user has no account yet."""
+        return await self._run("coins", "fetchval", (user_id,), conn)
+
+    async def daily_state(self, user_id, conn=None):
+        return await self._run("daily_state", "fetchrow", (user_id,), conn)
+
+    async def set_daily(self, user_id, coins, claimed_at, conn=None):
+        await self._run("set_daily", "execute", (coins, claimed_at, user_id), conn)
+
+    async def spend_coins(self, user_id, amount, conn=None):
+        await self._run("spend_coins", "execute", (amount, user_id), conn)
+
+    async def add_coins(self, user_id, amount, conn=None):
+        await self._run("add_coins", "execute", (user_id, amount), conn)
+
+    async def set_emoji(self, user_id, emoji, conn=None):
+        await self._run("set_emoji", "execute", (user_id, emoji), conn)
+
+    # items
+
+    async def lock_item(self, user_id, item, conn):
+        """Quantity of this item, locking the row until the caller's transaction ends."""
+        return await self._run("lock_item", "fetchval", (user_id, item), conn) or 0
+
+    async def use_item(self, user_id, item, conn=None):
+        await self._run("use_item", "execute", (user_id, item), conn)
+
+    async def add_item(self, user_id, item, conn=None):
+        await self._run("add_item", "execute", (user_id, item), conn)
+
+    # cards
+
+    async def claim_cards(self, user_ids, name_codes, member_names, group_names, concepts,
+                          rarities, image_paths, use_items, conn=None):
+        """Commit a batch of drop claims (migrations/004_claim_cards.sql)."""
+        return await self._run("claim_cards", "fetch", (
+            user_ids, name_codes, member_names, group_names, concepts, rarities, image_paths, use_items,
+        ), conn)
+
+    async def card(self, user_id, text, conn=None):
+        """The user's card named by this input (any case, see uid_forms), or None."""
+        for card_uid in uid_forms(text):
+            row = await self._card(user_id, card_uid, conn)
+            if row is not None:
+                return row
+        return None
+
+    async def _card(self, user_id, card_uid, conn):
+        """A UID seen recently is read by primary key; the probe re-checks owner and UID, so a
+        stale cache entry falls back to the card_uid_norm index."""
+        cached = self.uid_cache.get(card_uid)
+        if cached is not None and cached[0] == user_id:
+            row = await self._run("card_by_id", "fetchrow", (cached[1], user_id, card_uid), conn)
+            if row is not None:
+                return row
+            self.uid_cache.forget(card_uid)
+
+        row = await self._run("card", "fetchrow", (user_id, card_uid), conn)
+        # Only cache current UIDs; card_by_id wouldn't match a legacy one
+        if row is not None and row["card_uid_norm"] == card_uid:
+            self.uid_cache.put(card_uid, user_id, row["id"])
+        return row
+
+    async def rename_card(self, user_id, card_id, new_uid, conn=None):
+        """Give one of the user's cards a new UID. False if another card already has it."""
+        new_uid = normalize_uid(new_uid)
+        try:
+            renamed = await self._run("rename_card", "fetchval", (new_uid, card_id, user_id), conn)
+        except asyncpg.UniqueViolationError:
+            return False
+        if renamed is not None:
+            self.uid_cache.put(new_uid, user_id, card_id)
+        return renamed is not None
+
+    async def find_cards(self, user_id, texts, conn=None):
+        """The user's cards named by these inputs (current or legacy UIDs, see uid_forms), in
+        input order and each once, plus the normalized inputs that matched none."""
+        forms = [uid_forms(text) for text in texts]
+        candidates = [form for group in forms for form in group]
+        rows = await self._run("cards", "fetch", (user_id, candidates), conn) if candidates else []
+        by_uid = {}
+        for row in rows:
+            by_uid.setdefault(row["card_uid_norm"], row)
+            if row["legacy_uid"]:
+                by_uid.setdefault(row["legacy_uid"], row)
+
+        found, missing, seen = [], [], set()
+        for text, group in zip(texts, forms):
+            row = next((by_uid[card_uid] for card_uid in group if card_uid in by_uid), None)
+            if row is None:
+                missing.append(normalize_uid(text))
+            elif row["id"] not in seen:
+                seen.add(row["id"])
+                found.append(row)
+        return found, missing
+
+    async def tag_cards(self, user_id, card_uids, tag, conn=None):
+        card_uids = [normalize_uid(card_uid) for card_uid in card_uids]
+        await self._run("tag_cards", "execute", (tag, user_id, card_uids), conn)
+
+    async def recycle_candidates(self, user_id, rarities=(), tags=(), card_uids=(), conn=None):
+        """The user's cards matching any of these rarities, tags or stored UIDs, each card once."""
+        return await self._run("recycle_candidates", "fetch", (
+            user_id,
+            [rarity.title() for rarity in rarities],
+            list(tags),
+            [normalize_uid(card_uid) for card_uid in card_uids],
+        ), conn)
+
+    async def recycle_cards(self, user_id, card_ids, conn=None):
+        """Delete these cards and credit their aura in one statement.
+
+        Cards the user no longer owns (traded or already recycled) are skipped; the returned rows
+        are the cards actually recycled, each with the aura it earned.
+        """
+        rows = await self._run("recycle_cards", "fetch", (user_id, card_ids), conn)
+        self.uid_cache.forget(*(normalize_uid(row["card_uid"]) for row in rows))
+        return rows
+
+    @staticmethod
+    def _collection_args(user_id, filter_kind, filter_value):
+        if filter_kind == "rarity":
+            return (user_id, filter_value.title())
+        if filter_kind == "name":
+            return (user_id, filter_value.lower())
+        return (user_id,)
+
+    async def collection_page(self, user_id, sort_key="date_obtained", filter_kind="all", filter_value=None,
+                              after=None, limit=10, conn=None):
+        """One page of a user's cards. filter_kind is "all", "rarity" or "name" (group or member);
+        `after` is the collection_cursor() of the last row of the previous page."""
+        if sort_key not in COLLECTION_SORTS:
+            sort_key = "date_obtained"
+        args = self._collection_args(user_id, filter_kind, filter_value)
+        if after is None:
+            return await self._run(f"collection:{sort_key}:{filter_kind}", "fetch", (*args, limit), conn)
+        return await self._run(f"collection:{sort_key}:{filter_kind}:after", "fetch", (*args, *after, limit), conn)
+
+    async def collection_count(self, user_id, filter_kind="all", filter_value=None, conn=None):
+        args = self._collection_args(user_id, filter_kind, filter_value)
+        return await self._run(f"collection_count:{filter_kind}", "fetchval", args, conn)
+
+    # scores
+
+    async def score(self, user_id, conn=None):
+        return await self._run("score", "fetchval", (user_id,), conn) or 0
+
+    async def rank_for_score(self, score, conn=None):
+        # Same as ScoreIndex.rank: no points ranks #1
+        if not score:
+            return 1
+        return await self._run("rank_for_score", "fetchval", (score,), conn)
+
+    async def top_scores(self, limit, conn=None):
+        return await self._run("top_scores", "fetch", (limit,), conn)
+
+    # wishlists
+
+    async def wishes(self, user_id, conn=None):
+        return await self._run("wishes", "fetch", (user_id,), conn)
+
+    async def member_wishes(self, names, conn=None):
+        """(user_id, card_name) rows of member wishes matching these lowercase names."""
+        return await self._run("member_wishes", "fetch", (names,), conn)
+
+    async def add_wish(self, user_id, kind, name, conn=None):
+        await self._run("add_wish", "execute", (user_id, kind, name), conn)
+
+    async def remove_wish(self, user_id, kind, name, conn=None):
+        return await self._run("remove_wish", "fetchval", (user_id, kind, name), conn) is not None
+
+    # trades
+
+    async def open_trade(self, message_id, channel_id, sender_id, recipient_id, expires_at,
+                         give_ids, want_ids, conn=None):
+        """Log an offer: give_ids go from sender to recipient, want_ids the other way."""
+        await self._run("open_trade", "fetchval", (
+            message_id, channel_id, sender_id, recipient_id, expires_at, give_ids, want_ids,
+        ), conn)
+
+    async def open_trades(self, conn=None):
+        return await self._run("open_trades", "fetch", (), conn)
+
+    async def accept_trade(self, message_id, user_id, conn=None):
+        """Swap every card in the offer, or none. Returns the cards moved: empty when the offer
+        isn't open for this user any more or a card has left its owner since it was made."""
+        rows = await self._run("accept_trade", "fetch", (message_id, user_id), conn)
+        self.uid_cache.forget(*(normalize_uid(row["traded_uid"]) for row in rows))
+        return rows
+
+    async def decline_trade(self, message_id, conn=None):
+        return await self._run("decline_trade", "fetchval", (message_id,), conn) is not None
+
+    async def expire_trades(self, now, conn=None):
+        """Close every open offer past its deadline; (message_id, channel_id) of each."""
+        return await self._run("expire_trades", "fetch", (now,), conn)
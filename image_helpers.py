@@ -1,26 +1,244 @@
 import requests
+import hashlib
+import os
+import threading
+from collections import OrderedDict
 from PIL import Image
 from io import BytesIO
 
+# Framed card cache
+# Memory tier keeps decoded framed images (treat them as read-only), disk tier keeps encoded bytes.
+FRAME_CACHE_DIR = os.getenv("FRAME_CACHE_DIR", ".cache/frames")
+FRAME_CACHE_PROFILE = os.getenv("FRAME_CACHE_PROFILE", "png")  # stored framed cards are re-encoded later, so lossless only
+FRAME_CACHE_MAX_BYTES = int(os.getenv("FRAME_CACHE_MAX_BYTES", 256 * 1024 * 1024))
 
-def apply_frame(card_path, frame_path):
+# Output encoding profiles for images uploaded to Discord (see benchmarks/encoding.py)
+IMAGE_PROFILES = {
+    "png": {"format": "PNG", "extension": "png", "lossless": True, "params": {}},
+    "png-fast": {"format": "PNG", "extension": "png", "lossless": True, "params": {"compress_level": 1}},
+    "png-small": {"format": "PNG", "extension": "png", "lossless": True, "params": {"compress_level": 9, "optimize": True}},
+    "webp-lossless": {"format": "WEBP", "extension": "webp", "lossless": True, "params": {"lossless": True, "method": 0}},
+    "webp": {"format": "WEBP", "extension": "webp", "lossless": False, "params": {"quality": 85, "method": 4}},
+    "jpeg": {"format": "JPEG", "extension": "jpg", "lossless": False, "params": {"quality": 88, "optimize": True}},
+}
+# Pillow's default PNG settings, as uploads were before profiles existed; png-fast uploads are larger
+IMAGE_PROFILE = os.getenv("IMAGE_PROFILE", "png")
+# JPEG has no alpha, so transparent areas are flattened onto Discord's dark embed background
+JPEG_BACKGROUND = (43, 45, 49)
+
+if not IMAGE_PROFILES[FRAME_CACHE_PROFILE]["lossless"]:
+    raise ValueError(f"FRAME_CACHE_PROFILE must be a lossless profile, got {FRAME_CACHE_PROFILE}")
+
+# Full resolution framed card (used by !view) and the spacing between cards at that scale
+FULL_CARD_SIZE = (1500, 2100)
+CARD_SPACING = 100
+
+_framed_cache = OrderedDict()
+_framed_cache_bytes = 0
+_framed_cache_lock = threading.Lock()
+_resized_frames = {}
+_path_digests = {}
+_atlases = []
+
+
+# Card images come in as a path or as the encoded bytes (see assets.py). Cache keys use a digest of
+# the content either way, so a cache warmed from paths also serves renders from bytes.
+def _card_digest(card):
+    if isinstance(card, str):
+        path_key = (os.path.abspath(card), os.path.getmtime(card))
+        with _framed_cache_lock:
+            digest = _path_digests.get(path_key)
+        if digest is None:
+            with open(card, "rb") as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+            with _framed_cache_lock:
+                _path_digests[path_key] = digest
+        return digest
+    return hashlib.sha1(card).hexdigest()
+
+def _open_card(card):
+    return Image.open(card if isinstance(card, str) else BytesIO(card))
+
+def _frame_cache_key(card, frame_path, size=None):
+    return (
+        _card_digest(card),
+        os.path.abspath(frame_path),
+        os.path.getmtime(frame_path),
+        tuple(size or FULL_CARD_SIZE),
+    )
+
+def _frame_cache_file(key):
+    digest = hashlib.sha1(repr((key, FRAME_CACHE_PROFILE)).encode("utf-8")).hexdigest()
+    extension = IMAGE_PROFILES[FRAME_CACHE_PROFILE]["extension"]
+    return os.path.join(FRAME_CACHE_DIR, f"{digest}.{extension}")
+
+def _image_nbytes(image):
+    return image.width * image.height * len(image.getbands())
+
+def _memory_get(key):
+    with _framed_cache_lock:
+        image = _framed_cache.get(key)
+        if image is not None:
+            _framed_cache.move_to_end(key)
+        return image
+
+def _memory_put(key, image):
+    global _framed_cache_bytes
+    size = _image_nbytes(image)
+    if size > FRAME_CACHE_MAX_BYTES:
+        return
+
+    with _framed_cache_lock:
+        if key in _framed_cache:
+            return
+        _framed_cache[key] = image
+        _framed_cache_bytes += size
+        while _framed_cache_bytes > FRAME_CACHE_MAX_BYTES:
+            _, evicted = _framed_cache.popitem(last=False)
+            _framed_cache_bytes -= _image_nbytes(evicted)
+
+def encode_image(image, profile=None):
+    """Encode an image with one of IMAGE_PROFILES (default IMAGE_PROFILE) and return the bytes."""
+    settings = IMAGE_PROFILES[profile or IMAGE_PROFILE]
+    if settings["format"] == "JPEG" and image.mode != "RGB":
+        background = Image.new("RGB", image.size, JPEG_BACKGROUND)
+        if "A" in image.getbands():
+            background.paste(image, (0, 0), image)
+        else:
+            background.paste(image, (0, 0))
+        image = background
+
+    buffer = BytesIO()
+    image.save(buffer, format=settings["format"], **settings["params"])
+    return buffer.getvalue()
+
+def image_filename(stem, profile=None):
+    return f"{stem}.{IMAGE_PROFILES[profile or IMAGE_PROFILE]['extension']}"
+
+def _encode_framed(image):
+    return encode_image(image, FRAME_CACHE_PROFILE)
+
+def _disk_put(key, data):
+    os.makedirs(FRAME_CACHE_DIR, exist_ok=True)
+    path = _frame_cache_file(key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _load_frame(frame_path, size):
+    key = (os.path.abspath(frame_path), os.path.getmtime(frame_path), size)
+    with _framed_cache_lock:
+        frame = _resized_frames.get(key)
+    if frame is None:
+        frame = Image.open(frame_path).convert("RGBA")
+        if frame.size != size:
+            frame = frame.resize(size, Image.Resampling.LANCZOS)
+        with _framed_cache_lock:
+            _resized_frames[key] = frame
+    return frame
+
+def _render_frame(card, frame_path, size=None):
     # # Download card image from URL
     # response = requests.get(card_url)
     # card = Image.open(BytesIO(response.content)).convert("RGBA")
+    width, height = size or FULL_CARD_SIZE
 
-    # Load Local Frame
-    frame = Image.open(frame_path).convert("RGBA")
-
-    # Load card image
-    card_img = Image.open(card_path).convert("RGBA")
+    # Load card image, letting the JPEG decoder downscale when the target is small
+    card_img = _open_card(card)
+    card_img.draft("RGB", (width, height))
+    card_img = card_img.convert("RGBA")
 
-    #Resize card to match frame size
-    resized_card = resize_and_pad_to_target(card_img, 1500, 2100)
-    frame = frame.resize(resized_card.size)
+    #Resize card straight to the target size, then lay the frame over it
+    resized_card = resize_and_pad_to_target(card_img, width, height)
+    frame = _load_frame(frame_path, resized_card.size)
 
     #Merge card and frame
     return Image.alpha_composite(resized_card, frame)
 
+def apply_frame(card, frame_path, size=None):
+    """Return the framed card image at `size` (default full resolution), served from the cache when possible.
+
+    `card` is the card image's path or its encoded bytes. The returned image is shared with the
+    cache, so callers must not draw on it in place.
+    """
+    for atlas in _atlases if isinstance(card, str) else ():
+        if atlas.matches(frame_path, size or FULL_CARD_SIZE):
+            framed = atlas.get(card)
+            if framed is not None:
+                return framed
+
+    key = _frame_cache_key(card, frame_path, size)
+
+    framed = _memory_get(key)
+    if framed is not None:
+        return framed
+
+    cache_file = _frame_cache_file(key)
+    if os.path.exists(cache_file):
+        framed = Image.open(cache_file)
+        framed.load()
+    else:
+        framed = _render_frame(card, frame_path, size)
+        _disk_put(key, _encode_framed(framed))
+
+    _memory_put(key, framed)
+    return framed
+
+def framed_card_bytes(card, frame_path, size=None, profile=None):
+    """Return the framed card (a path or encoded bytes) encoded with `profile`.
+
+    When the profile is the disk tier's own profile the stored bytes are returned as they are.
+    """
+    profile = profile or IMAGE_PROFILE
+    key = _frame_cache_key(card, frame_path, size)
+    cache_file = _frame_cache_file(key)
+
+    if profile != FRAME_CACHE_PROFILE:
+        return encode_image(apply_frame(card, frame_path, size), profile)
+
+    if not os.path.exists(cache_file):
+        framed = _render_frame(card, frame_path, size)
+        _disk_put(key, _encode_framed(framed))
+        _memory_put(key, framed)
+
+    with open(cache_file, "rb") as f:
+        return f.read()
+
+def warm_frame_cache(card_paths, frame_paths, sizes=(None,)):
+    """Pre-render every card/frame/size combination into the disk tier. Returns how many were rendered."""
+    rendered = 0
+    for size in sizes:
+        for frame_path in frame_paths:
+            for card_path in card_paths:
+                try:
+                    key = _frame_cache_key(card_path, frame_path, size)
+                except OSError:
+                    print(f"Skipping missing card image: {card_path}")
+                    continue
+                if os.path.exists(_frame_cache_file(key)):
+                    continue
+                _disk_put(key, _encode_framed(_render_frame(card_path, frame_path, size)))
+                rendered += 1
+    return rendered
+
+def use_atlases(atlases):
+    """Serve framed cards from these card atlases (see card_atlas.py) before the frame cache.
+    The atlases they replace are closed."""
+    previous = list(_atlases)
+    _atlases[:] = atlases
+    for atlas in previous:
+        if atlas not in atlases:
+            atlas.close()
+
+def clear_frame_cache():
+    global _framed_cache_bytes
+    with _framed_cache_lock:
+        _framed_cache.clear()
+        _resized_frames.clear()
+        _path_digests.clear()
+        _framed_cache_bytes = 0
+
 def merge_cards_horizontally(card_images, spacing=100, max_width=2000):
     widths, heights = zip(*(img.size for img in card_images))
 
@@ -45,7 +263,7 @@ def merge_cards_horizontally(card_images, spacing=100, max_width=2000):
 def resize_image(image, max_width):
     if image.width <= max_width:
         return image
-    
+
     w_percent = max_width / float(image.width)
     new_height = int(float(image.height) * w_percent)
 
@@ -67,4 +285,30 @@ def resize_and_pad_to_target(image, target_width=1500, target_height=2100):
     top = (new_height - target_height) // 2
     right = left + target_width
     bottom = top + target_height
-    return image.crop((left, top, right, bottom))
\ No newline at end of file
+    return image.crop((left, top, right, bottom))
+
+def drop_card_size(card_count, output_width=800):
+    """Card size and spacing that the full resolution layout would shrink to at `output_width`."""
+    full_width, full_height = FULL_CARD_SIZE
+    total_width = full_width * card_count + CARD_SPACING * (card_count - 1)
+    scale = output_width / total_width
+    spacing = round(CARD_SPACING * scale)
+    width = (output_width - spacing * (card_count - 1)) // card_count
+    return (width, round(full_height * scale)), spacing
+
+def render_drop(card_paths, frame_path, output_width=800, quality="fast", profile=None):
+    """Compose a drop image from card image paths and return it encoded with `profile`.
+
+    quality="fast" frames each card directly at its final size; quality="high" keeps
+    the original full resolution compose-then-shrink path.
+    """
+    if quality == "high":
+        framed_cards = [apply_frame(card_path, frame_path) for card_path in card_paths]
+        final_image = merge_cards_horizontally(framed_cards)
+        final_image = resize_image(final_image, max_width=output_width)
+    else:
+        size, spacing = drop_card_size(len(card_paths), output_width)
+        framed_cards = [apply_frame(card_path, frame_path, size) for card_path in card_paths]
+        final_image = merge_cards_horizontally(framed_cards, spacing=spacing, max_width=output_width)
+
+    return encode_image(final_image, profile)
@@ -0,0 +1,50 @@
+from bisect import bisect_left, insort
+
+
+class ScoreIndex:
+    """In-memory mirror of user_scores ordered by score, for O(log n) rank lookups.
+
+    Entries are (-score, user_id) so the list is sorted best first.
+    """
+
+    def __init__(self):
+        self.scores = {}
+        self.entries = []
+        self.loaded = False
+
+    async def load(self, conn):
+        rows = await conn.fetch("SELECT user_id, score FROM user_scores WHERE score > 0")
+        self.scores = {row["user_id"]: row["score"] for row in rows}
+        self.entries = sorted((-score, user_id) for user_id, score in self.scores.items())
+        self.loaded = True
+
+    def score(self, user_id):
+        return self.scores.get(user_id, 0)
+
+    def add(self, user_id, delta):
+        if not delta:
+            return
+        old = self.scores.get(user_id)
+        if old is not None:
+            del self.entries[bisect_left(self.entries, (-old, user_id))]
+
+        new = (old or 0) + delta
+        if new > 0:
+            self.scores[user_id] = new
+            insort(self.entries, (-new, user_id))
+        else:
+            self.scores.pop(user_id, None)
+
+    def rank(self, user_id):
+        """1 + number of collectors with strictly more points.
+
+        Collectors without points are #1, as they were when !rank compared against the NULL
+        sum of their (absent) cards.
+        """
+        score = self.score(user_id)
+        if not score:
+            return 1
+        return bisect_left(self.entries, (-score,)) + 1
+
+    def top(self, n):
+        return [(user_id, -neg_score) for neg_score, user_id in self.entries[:n]]
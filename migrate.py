@@ -0,0 +1,233 @@
+"""Apply migrations/NNN_*.sql in order and check that the registered queries use indexes.
+
+Run from the repository root with the same DB_* variables as the bot:
+    python migrate.py            # apply pending migrations
+    python migrate.py status     # list applied and pending migrations
+    python migrate.py check      # fail if any query in database.QUERIES plans a sequential scan
+                                 # or a column in UNIQUE_KEYS lacks a unique index
+
+Set DB_SSL=disable for a local Postgres without TLS. Every migration is written to be safe to
+run more than once, so databases that were migrated by hand with psql can adopt the runner as is.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import sys
+from datetime import datetime, timezone
+
+import asyncpg
+from dotenv import load_dotenv
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d{3})_[\w-]+\.sql$")
+
+
+class Migration:
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.version = self.name[:3]
+        with open(path, encoding="utf-8") as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    migrations = [
+        Migration(os.path.join(directory, name))
+        for name in sorted(os.listdir(directory))
+        if MIGRATION_FILE.match(name)
+    ]
+    versions = [migration.version for migration in migrations]
+    duplicates = sorted({version for version in versions if versions.count(version) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate migration versions: {', '.join(duplicates)}")
+    return migrations
+
+
+async def ensure_history(conn):
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+async def applied_migrations(conn):
+    await ensure_history(conn)
+    rows = await conn.fetch("SELECT version, name, checksum, applied_at FROM schema_migrations")
+    return {row["version"]: row for row in rows}
+
+
+async def pending_migrations(conn, migrations=None):
+    """Migrations not recorded in schema_migrations yet, in order."""
+    migrations = migrations if migrations is not None else load_migrations()
+    applied = await applied_migrations(conn)
+    return [migration for migration in migrations if migration.version not in applied]
+
+
+async def apply_migrations(conn, migrations=None):
+    """Apply every pending migration, each in its own transaction. Returns the ones applied."""
+    applied = []
+    for migration in await pending_migrations(conn, migrations):
+        async with conn.transaction():
+            # Only one runner at a time (e.g. two bot processes starting together)
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))")
+            if await conn.fetchval("SELECT 1 FROM schema_migrations WHERE version = $1", migration.version):
+                continue
+            await conn.execute(migration.sql)
+            await conn.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES ($1, $2, $3)",
+                migration.version, migration.name, migration.checksum,
+            )
+        print(f"Applied migration {migration.name}")
+        applied.append(migration)
+    return applied
+
+
+async def print_status(conn):
+    applied = await applied_migrations(conn)
+    for migration in load_migrations():
+        row = applied.get(migration.version)
+        if row is None:
+            state = "pending"
+        elif row["checksum"] != migration.checksum:
+            state = f"applied {row['applied_at']:%Y-%m-%d %H:%M} (file changed since)"
+        else:
+            state = f"applied {row['applied_at']:%Y-%m-%d %H:%M}"
+        print(f"{migration.name:<32} {state}")
+
+
+# Placeholder arguments for EXPLAIN, by Postgres type name (arrays get one element)
+SAMPLE_VALUES = {
+    "int2": 1,
+    "int4": 1,
+    "int8": 1,
+    "text": "x",
+    "varchar": "x",
+    "bool": False,
+    "timestamptz": datetime.now(timezone.utc),
+    "timestamp": datetime.now(timezone.utc).replace(tzinfo=None),
+}
+
+
+def sample_argument(param):
+    name = param.name
+    if param.kind == "array":
+        name = name.lstrip("_").removesuffix("[]")
+    if name not in SAMPLE_VALUES:
+        raise ValueError(f"No sample value for parameter type {param.name}")
+    return [SAMPLE_VALUES[name]] if param.kind == "array" else SAMPLE_VALUES[name]
+
+
+def seq_scans(plan):
+    """Relations read by a Seq Scan anywhere in this EXPLAIN (FORMAT JSON) plan node."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name", "?"))
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def check_queries(conn, queries=None):
+    """EXPLAIN every registered query with sequential scans disabled.
+
+    Postgres still picks a Seq Scan under enable_seqscan=off when no index can serve the query,
+    so any Seq Scan left in a plan is a missing index. Nothing is executed. Returns
+    {query name: [relations scanned]} for the queries that failed.
+    """
+    if queries is None:
+        from database import QUERIES as queries
+
+    failures = {}
+    async with conn.transaction():
+        await conn.execute("SET LOCAL enable_seqscan = off")
+        for name, sql in queries.items():
+            statement = await conn.prepare(sql)
+            args = [sample_argument(param) for param in statement.get_parameters()]
+            plan = await statement.explain(*args)
+            scanned = seq_scans(plan[0]["Plan"])
+            if scanned:
+                failures[name] = scanned
+    return failures
+
+
+# Columns looked up as a single row's key. Databases that predate 000_base_schema got them from
+# ALTER TABLE ... ADD COLUMN, so "check" makes sure a migration also made them unique.
+UNIQUE_KEYS = [("user_cards", "id")]
+
+
+async def missing_unique_keys(conn, keys=UNIQUE_KEYS):
+    """The (table, column) pairs in `keys` not covered by a single-column unique index or primary key."""
+    missing = []
+    for table, column in keys:
+        found = await conn.fetchval("""
+            SELECT EXISTS (
+                SELECT 1
+                FROM pg_index i
+                JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+                WHERE i.indrelid = $1::regclass AND i.indisunique
+                  AND i.indnkeyatts = 1 AND i.indpred IS NULL AND a.attname = $2
+            )
+        """, table, column)
+        if not found:
+            missing.append((table, column))
+    return missing
+
+
+def db_config():
+    """Connection settings shared by the bot's pool and this script."""
+    load_dotenv()
+    return {
+        "host": os.getenv("DB_HOST"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "database": os.getenv("DB_NAME"),
+        "ssl": os.getenv("DB_SSL", "require"),
+    }
+
+
+async def connect():
+    return await asyncpg.connect(**db_config())
+
+
+async def main(command):
+    conn = await connect()
+    try:
+        if command == "status":
+            await print_status(conn)
+            return 0
+
+        if command == "check":
+            pending = await pending_migrations(conn)
+            if pending:
+                print(f"Apply pending migrations first: {', '.join(m.name for m in pending)}")
+                return 1
+            failures = await check_queries(conn)
+            for name, relations in failures.items():
+                print(f"SEQ SCAN  {name}: {', '.join(relations)}")
+            print(f"{len(failures)} quer{'y' if len(failures) == 1 else 'ies'} without an index")
+            missing = await missing_unique_keys(conn)
+            for table, column in missing:
+                print(f"NOT UNIQUE  {table}.{column}: no primary key or unique index")
+            return 1 if failures or missing else 0
+
+        applied = await apply_migrations(conn)
+        print(f"{len(applied)} migration(s) applied" if applied else "Schema is up to date")
+        return 0
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply and check the bot's schema migrations.")
+    parser.add_argument("command", nargs="?", default="apply", choices=["apply", "status", "check"])
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.command)))
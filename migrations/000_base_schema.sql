@@ -0,0 +1,37 @@
+-- Base tables the bot has always used, so a fresh database can be built from migrations alone.
+-- Existing databases already have these; every statement is a no-op there.
+-- Safe to run more than once.
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id BIGINT PRIMARY KEY,
+    coins INTEGER DEFAULT 0,
+    emoji TEXT,
+    last_daily TIMESTAMPTZ
+);
+
+CREATE TABLE IF NOT EXISTS user_items (
+    user_id BIGINT NOT NULL,
+    item TEXT NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, item)
+);
+
+CREATE TABLE IF NOT EXISTS user_cards (
+    id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    card_uid TEXT NOT NULL,
+    short_id INTEGER,
+    edition INTEGER,
+    member_name TEXT NOT NULL,
+    group_name TEXT NOT NULL,
+    concept TEXT NOT NULL DEFAULT 'Base',
+    rarity TEXT NOT NULL,
+    image_path TEXT,
+    date_obtained TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    custom_tag TEXT
+);
+
+CREATE TABLE IF NOT EXISTS wishlists (
+    user_id BIGINT NOT NULL,
+    card_name TEXT NOT NULL
+);
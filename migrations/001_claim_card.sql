@@ -0,0 +1,72 @@
+-- Single round-trip card claims.
+-- Per-user short_id and per-(user, member, rarity, concept) edition counters, plus claim_card(),
+-- which allocates both and inserts the card in one statement. Row locks on the counter rows
+-- serialize concurrent claims by the same user, so UIDs can't be handed out twice.
+-- Safe to run more than once.
+
+CREATE TABLE IF NOT EXISTS user_card_counters (
+    user_id BIGINT PRIMARY KEY,
+    last_short_id INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS card_edition_counters (
+    user_id BIGINT NOT NULL,
+    member_name TEXT NOT NULL,
+    rarity TEXT NOT NULL,
+    concept TEXT NOT NULL,
+    last_edition INTEGER NOT NULL,
+    PRIMARY KEY (user_id, member_name, rarity, concept)
+);
+
+-- Seed from existing cards so new claims continue after what users already own
+INSERT INTO user_card_counters (user_id, last_short_id)
+SELECT user_id, MAX(short_id::int)
+FROM user_cards
+GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE
+SET last_short_id = GREATEST(user_card_counters.last_short_id, EXCLUDED.last_short_id);
+
+INSERT INTO card_edition_counters (user_id, member_name, rarity, concept, last_edition)
+SELECT user_id, member_name, rarity, concept, GREATEST(MAX(edition), COUNT(*))
+FROM user_cards
+GROUP BY user_id, member_name, rarity, concept
+ON CONFLICT (user_id, member_name, rarity, concept) DO UPDATE
+SET last_edition = GREATEST(card_edition_counters.last_edition, EXCLUDED.last_edition);
+
+CREATE OR REPLACE FUNCTION claim_card(
+    p_user_id BIGINT,
+    p_name_code TEXT,
+    p_member_name TEXT,
+    p_group_name TEXT,
+    p_concept TEXT,
+    p_rarity TEXT,
+    p_image_path TEXT
+) RETURNS TABLE (claimed_uid TEXT, claimed_short_id INTEGER, claimed_edition INTEGER)
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_short_id INTEGER;
+    v_edition INTEGER;
+BEGIN
+    INSERT INTO user_card_counters AS c (user_id, last_short_id)
+    VALUES (p_user_id, 1)
+    ON CONFLICT (user_id) DO UPDATE SET last_short_id = c.last_short_id + 1
+    RETURNING c.last_short_id INTO v_short_id;
+
+    INSERT INTO card_edition_counters AS e (user_id, member_name, rarity, concept, last_edition)
+    VALUES (p_user_id, p_member_name, p_rarity, p_concept, 1)
+    ON CONFLICT (user_id, member_name, rarity, concept) DO UPDATE SET last_edition = e.last_edition + 1
+    RETURNING e.last_edition INTO v_edition;
+
+    -- Same shape as generate_card_uid(): NAME + 2-digit short_id + 2-digit edition
+    claimed_uid := p_name_code
+        || lpad(v_short_id::text, GREATEST(2, length(v_short_id::text)), '0')
+        || lpad(v_edition::text, GREATEST(2, length(v_edition::text)), '0');
+    claimed_short_id := v_short_id;
+    claimed_edition := v_edition;
+
+    INSERT INTO user_cards (user_id, card_uid, short_id, date_obtained, rarity, edition, member_name, group_name, concept, image_path)
+    VALUES (p_user_id, claimed_uid, v_short_id, CURRENT_TIMESTAMP, p_rarity, v_edition, p_member_name, p_group_name, p_concept, p_image_path);
+
+    RETURN NEXT;
+END;
+$$;
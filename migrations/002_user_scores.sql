@@ -0,0 +1,50 @@
+-- Incrementally maintained leaderboard scores.
+-- user_scores holds each collector's point total; a trigger on user_cards keeps it current for
+-- claims, trades, recycles and anything else that inserts, moves or deletes cards.
+-- Safe to run more than once.
+
+CREATE OR REPLACE FUNCTION rarity_points(p_rarity TEXT) RETURNS INTEGER
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE p_rarity
+        WHEN 'Common' THEN 1
+        WHEN 'Rare' THEN 5
+        WHEN 'Epic' THEN 20
+        WHEN 'Legendary' THEN 100
+        WHEN 'Mythic' THEN 150
+        ELSE 0
+    END
+$$;
+
+CREATE TABLE IF NOT EXISTS user_scores (
+    user_id BIGINT PRIMARY KEY,
+    score BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS user_scores_score_idx ON user_scores (score DESC);
+
+-- Rebuild from scratch so re-running the migration also repairs drift
+INSERT INTO user_scores (user_id, score)
+SELECT user_id, SUM(rarity_points(rarity))
+FROM user_cards
+GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE SET score = EXCLUDED.score;
+
+CREATE OR REPLACE FUNCTION user_scores_apply() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE user_scores SET score = score - rarity_points(OLD.rarity) WHERE user_id = OLD.user_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO user_scores AS s (user_id, score)
+        VALUES (NEW.user_id, rarity_points(NEW.rarity))
+        ON CONFLICT (user_id) DO UPDATE SET score = s.score + EXCLUDED.score;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS user_cards_scores ON user_cards;
+CREATE TRIGGER user_cards_scores
+AFTER INSERT OR DELETE OR UPDATE OF user_id, rarity ON user_cards
+FOR EACH ROW EXECUTE FUNCTION user_scores_apply();
@@ -0,0 +1,14 @@
+-- Wishlist entries can target a member (default), a whole group or a concept.
+-- Safe to run more than once.
+
+ALTER TABLE wishlists ADD COLUMN IF NOT EXISTS kind TEXT NOT NULL DEFAULT 'member';
+
+-- Drop case-insensitive duplicates before enforcing uniqueness
+DELETE FROM wishlists a
+USING wishlists b
+WHERE a.ctid > b.ctid
+  AND a.user_id = b.user_id
+  AND a.kind = b.kind
+  AND LOWER(a.card_name) = LOWER(b.card_name);
+
+CREATE UNIQUE INDEX IF NOT EXISTS wishlists_user_kind_name_key ON wishlists (user_id, kind, LOWER(card_name));
@@ -0,0 +1,37 @@
+-- Batched drop claims.
+-- claim_cards() settles every winner of an arbitration batch in one statement: it consumes an
+-- Extra Claim for winners who need one and claims their card through claim_card(). A winner whose
+-- Extra Claim is gone by the time the batch commits is skipped and not returned.
+-- Requires 001_claim_card.sql. Safe to run more than once.
+
+CREATE OR REPLACE FUNCTION claim_cards(
+    p_user_ids BIGINT[],
+    p_name_codes TEXT[],
+    p_member_names TEXT[],
+    p_group_names TEXT[],
+    p_concepts TEXT[],
+    p_rarities TEXT[],
+    p_image_paths TEXT[],
+    p_use_items BOOLEAN[]
+) RETURNS TABLE (claimed_user_id BIGINT, claimed_uid TEXT, claimed_short_id INTEGER, claimed_edition INTEGER)
+LANGUAGE plpgsql AS $$
+DECLARE
+    i INTEGER;
+BEGIN
+    FOR i IN 1 .. COALESCE(array_length(p_user_ids, 1), 0) LOOP
+        IF p_use_items[i] THEN
+            UPDATE user_items
+            SET quantity = quantity - 1
+            WHERE user_id = p_user_ids[i] AND item = 'extra_claim' AND quantity > 0;
+            CONTINUE WHEN NOT FOUND;
+        END IF;
+
+        claimed_user_id := p_user_ids[i];
+        SELECT c.claimed_uid, c.claimed_short_id, c.claimed_edition
+        INTO claimed_uid, claimed_short_id, claimed_edition
+        FROM claim_card(p_user_ids[i], p_name_codes[i], p_member_names[i], p_group_names[i],
+                        p_concepts[i], p_rarities[i], p_image_paths[i]) AS c;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,12 @@
+-- Persistent drop/claim cooldowns shared by every bot process (see cooldowns.py).
+-- One row per (kind, user); expired rows are purged when a bot process starts.
+-- Safe to run more than once.
+
+CREATE TABLE IF NOT EXISTS cooldowns (
+    kind TEXT NOT NULL,
+    user_id BIGINT NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (kind, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS cooldowns_expires_at_idx ON cooldowns (expires_at);
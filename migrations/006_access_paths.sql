@@ -0,0 +1,41 @@
+-- Normalized-case columns and indexes for every statement in database.py.
+-- Each index names the queries it serves; `python migrate.py check` fails if any of them plans a
+-- sequential scan. Adding the generated columns rewrites user_cards and wishlists once.
+-- Safe to run more than once.
+
+-- Case-folded copies maintained by Postgres, so name filters compare plain indexed columns
+ALTER TABLE user_cards ADD COLUMN IF NOT EXISTS member_key TEXT GENERATED ALWAYS AS (LOWER(member_name)) STORED;
+ALTER TABLE user_cards ADD COLUMN IF NOT EXISTS group_key TEXT GENERATED ALWAYS AS (LOWER(group_name)) STORED;
+ALTER TABLE wishlists ADD COLUMN IF NOT EXISTS card_name_key TEXT GENERATED ALWAYS AS (LOWER(card_name)) STORED;
+
+-- collection:date_obtained:*, and every other per-user scan
+CREATE INDEX IF NOT EXISTS user_cards_user_date_idx ON user_cards (user_id, date_obtained DESC);
+
+-- card, rename_card, transfer_card
+CREATE INDEX IF NOT EXISTS user_cards_user_uid_lower_idx ON user_cards (user_id, LOWER(card_uid));
+
+-- uid_taken (checked across every collection)
+CREATE INDEX IF NOT EXISTS user_cards_uid_lower_idx ON user_cards (LOWER(card_uid));
+
+-- owned_uids, tag_cards, delete_card
+CREATE INDEX IF NOT EXISTS user_cards_user_uid_idx ON user_cards (user_id, card_uid);
+
+-- cards_by_rarity, collection:*:rarity
+CREATE INDEX IF NOT EXISTS user_cards_user_rarity_idx ON user_cards (user_id, rarity);
+
+-- cards_by_tag
+CREATE INDEX IF NOT EXISTS user_cards_user_tag_idx ON user_cards (user_id, custom_tag) WHERE custom_tag IS NOT NULL;
+
+-- collection:*:name (group or member filter)
+CREATE INDEX IF NOT EXISTS user_cards_user_member_key_idx ON user_cards (user_id, member_key);
+CREATE INDEX IF NOT EXISTS user_cards_user_group_key_idx ON user_cards (user_id, group_key);
+
+-- LimitedMythicRegistry.load() and its is_minted() fallback
+CREATE INDEX IF NOT EXISTS user_cards_mythic_idx ON user_cards (member_name, concept) WHERE rarity = 'Mythic';
+
+-- wishes, add_wish, remove_wish; same rule as wishlists_user_kind_name_key, on the stored column
+CREATE UNIQUE INDEX IF NOT EXISTS wishlists_user_kind_name_key_idx ON wishlists (user_id, kind, card_name_key);
+DROP INDEX IF EXISTS wishlists_user_kind_name_key;
+
+-- member_wishes (wishlist alerts while the in-memory index is still loading)
+CREATE INDEX IF NOT EXISTS wishlists_kind_name_key_idx ON wishlists (kind, card_name_key);
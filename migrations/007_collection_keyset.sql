@@ -0,0 +1,39 @@
+-- Keyset pagination for !collection (see database.py _collection_queries).
+-- Each sort order gets a per-user index ending in id, so "the 10 cards after this cursor" is a
+-- single index range scan however deep the page is.
+-- Safe to run more than once.
+
+-- Tie-breaker for the cursors, and what recycle, rename and trades look cards up by. Databases
+-- built from 000_base_schema already have it as the primary key; older ones get the column here
+-- and need a unique index on it too: the primary key if the table has none, otherwise a separate unique index.
+ALTER TABLE user_cards ADD COLUMN IF NOT EXISTS id BIGSERIAL;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = 'user_cards'::regclass AND i.indisunique
+          AND i.indnkeyatts = 1 AND i.indpred IS NULL AND a.attname = 'id'
+    ) THEN
+        IF EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'user_cards'::regclass AND contype = 'p') THEN
+            CREATE UNIQUE INDEX IF NOT EXISTS user_cards_id_key ON user_cards (id);
+        ELSE
+            ALTER TABLE user_cards ADD PRIMARY KEY (id);
+        END IF;
+    END IF;
+END $$;
+
+-- collection:date_obtained:* (replaces the (user_id, date_obtained) index from 006)
+CREATE INDEX IF NOT EXISTS user_cards_user_date_id_idx ON user_cards (user_id, date_obtained DESC, id DESC);
+DROP INDEX IF EXISTS user_cards_user_date_idx;
+
+-- collection:rarity:*
+CREATE INDEX IF NOT EXISTS user_cards_user_rarity_rank_idx ON user_cards (user_id, rarity_points(rarity), id);
+
+-- collection:member_name:*
+CREATE INDEX IF NOT EXISTS user_cards_user_member_id_idx ON user_cards (user_id, member_name, id);
+
+-- collection:group_name:*
+CREATE INDEX IF NOT EXISTS user_cards_user_group_member_id_idx ON user_cards (user_id, group_name, member_name, id);
@@ -0,0 +1,14 @@
+-- Aura paid for recycling a card, so !recycle can delete and credit in one statement.
+-- Safe to run more than once.
+
+CREATE OR REPLACE FUNCTION recycle_value(p_rarity TEXT) RETURNS INTEGER
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE p_rarity
+        WHEN 'Common' THEN 5
+        WHEN 'Rare' THEN 10
+        WHEN 'Epic' THEN 20
+        WHEN 'Legendary' THEN 50
+        WHEN 'Mythic' THEN 150
+        ELSE 1
+    END
+$$;
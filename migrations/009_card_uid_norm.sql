@@ -0,0 +1,32 @@
+-- Canonical card UIDs: card_uid_norm is UPPER(card_uid), maintained by Postgres on every write,
+-- and every UID lookup in database.py compares it with a value normalized by card_uids.normalize_uid().
+-- Safe to run more than once.
+
+-- Older rows may carry lower-case custom UIDs; store them the way they are displayed
+UPDATE user_cards SET card_uid = UPPER(card_uid) WHERE card_uid <> UPPER(card_uid);
+
+ALTER TABLE user_cards ADD COLUMN IF NOT EXISTS card_uid_norm TEXT GENERATED ALWAYS AS (UPPER(card_uid)) STORED;
+
+-- UIDs are meant to be unique across all collections, but legacy NAME+short_id+edition UIDs only
+-- ever were per user. Enforce it when the data allows; otherwise index without the constraint
+-- until the duplicates are re-issued (see 010_compact_uids.sql).
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'user_cards_card_uid_norm_key') THEN
+        RETURN;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM user_cards GROUP BY card_uid_norm HAVING COUNT(*) > 1) THEN
+        RAISE NOTICE 'user_cards has duplicate UIDs; card_uid_norm is indexed but not unique yet';
+        CREATE INDEX IF NOT EXISTS user_cards_card_uid_norm_idx ON user_cards (card_uid_norm);
+    ELSE
+        CREATE UNIQUE INDEX user_cards_card_uid_norm_key ON user_cards (card_uid_norm);
+        DROP INDEX IF EXISTS user_cards_card_uid_norm_idx;
+    END IF;
+END;
+$$;
+
+-- Replaced by the card_uid_norm index
+DROP INDEX IF EXISTS user_cards_user_uid_lower_idx;
+DROP INDEX IF EXISTS user_cards_uid_lower_idx;
+DROP INDEX IF EXISTS user_cards_user_uid_idx;
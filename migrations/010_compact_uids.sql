@@ -0,0 +1,132 @@
+-- Compact, globally unique card UIDs: 5 Crockford base32 digits of card_uid_seq plus a Luhn mod 32
+-- check digit, the same encoding as card_uids.encode_uid(). claim_card() takes the next sequence
+-- value instead of building NAME + short_id + edition, so allocation needs no lookup.
+-- Safe to run more than once.
+
+CREATE SEQUENCE IF NOT EXISTS card_uid_seq;
+
+CREATE OR REPLACE FUNCTION encode_card_uid(p_value BIGINT) RETURNS TEXT
+LANGUAGE plpgsql IMMUTABLE STRICT AS $$
+DECLARE
+    alphabet CONSTANT TEXT := '0123456789ABCDEFGHJKMNPQRSTVWXYZ';
+    v_value BIGINT := p_value;
+    v_payload TEXT := '';
+    v_factor INTEGER := 2;
+    v_total INTEGER := 0;
+    v_addend INTEGER;
+BEGIN
+    LOOP
+        v_payload := substr(alphabet, (v_value % 32)::int + 1, 1) || v_payload;
+        v_value := v_value / 32;
+        EXIT WHEN v_value = 0;
+    END LOOP;
+    v_payload := lpad(v_payload, GREATEST(5, length(v_payload)), '0');
+
+    FOR i IN REVERSE length(v_payload)..1 LOOP
+        v_addend := v_factor * (strpos(alphabet, substr(v_payload, i, 1)) - 1);
+        v_total := v_total + v_addend / 32 + v_addend % 32;
+        v_factor := 3 - v_factor;
+    END LOOP;
+
+    RETURN v_payload || substr(alphabet, (32 - v_total % 32) % 32 + 1, 1);
+END;
+$$;
+
+-- Sequence value of an issued UID, or NULL for anything else (custom and legacy UIDs)
+CREATE OR REPLACE FUNCTION decode_card_uid(p_uid TEXT) RETURNS BIGINT
+LANGUAGE plpgsql IMMUTABLE STRICT AS $$
+DECLARE
+    alphabet CONSTANT TEXT := '0123456789ABCDEFGHJKMNPQRSTVWXYZ';
+    v_value BIGINT := 0;
+BEGIN
+    IF p_uid !~ '^[0-9A-HJKMNP-TV-Z]{6}$' THEN
+        RETURN NULL;
+    END IF;
+    FOR i IN 1..5 LOOP
+        v_value := v_value * 32 + strpos(alphabet, substr(p_uid, i, 1)) - 1;
+    END LOOP;
+    IF encode_card_uid(v_value) <> p_uid THEN
+        RETURN NULL;
+    END IF;
+    RETURN v_value;
+END;
+$$;
+
+-- A custom UID could already have the shape of an issued one; start the sequence after the
+-- highest such value so nothing it hands out can collide
+DO $$
+DECLARE
+    v_taken BIGINT;
+BEGIN
+    SELECT MAX(decode_card_uid(card_uid_norm)) INTO v_taken FROM user_cards;
+    IF v_taken IS NOT NULL AND v_taken >= (SELECT last_value FROM card_uid_seq) THEN
+        PERFORM setval('card_uid_seq', v_taken);
+    END IF;
+END;
+$$;
+
+-- Re-issue generated NAME + short_id + edition UIDs (only unique per user). The old value stays
+-- in legacy_uid so people can keep typing it; customized UIDs were paid for and are kept.
+ALTER TABLE user_cards ADD COLUMN IF NOT EXISTS legacy_uid TEXT;
+
+UPDATE user_cards
+SET legacy_uid = card_uid,
+    card_uid = encode_card_uid(nextval('card_uid_seq'))
+WHERE legacy_uid IS NULL
+  AND card_uid = left(regexp_replace(UPPER(member_name), '[^[:alpha:]]', '', 'g'), 4)
+      || lpad(short_id::text, GREATEST(2, length(short_id::text)), '0')
+      || lpad(edition::text, GREATEST(2, length(edition::text)), '0');
+
+CREATE INDEX IF NOT EXISTS user_cards_user_legacy_uid_idx ON user_cards (user_id, legacy_uid) WHERE legacy_uid IS NOT NULL;
+
+-- With the generated UIDs re-issued, card_uid_norm can usually be made unique now (see 009)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'user_cards_card_uid_norm_key') THEN
+        RETURN;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM user_cards GROUP BY card_uid_norm HAVING COUNT(*) > 1) THEN
+        RAISE NOTICE 'user_cards still has duplicate custom UIDs; card_uid_norm stays non-unique';
+    ELSE
+        CREATE UNIQUE INDEX user_cards_card_uid_norm_key ON user_cards (card_uid_norm);
+        DROP INDEX IF EXISTS user_cards_card_uid_norm_idx;
+    END IF;
+END;
+$$;
+
+-- p_name_code is no longer used; the signature stays so claim_cards() and its callers don't change
+CREATE OR REPLACE FUNCTION claim_card(
+    p_user_id BIGINT,
+    p_name_code TEXT,
+    p_member_name TEXT,
+    p_group_name TEXT,
+    p_concept TEXT,
+    p_rarity TEXT,
+    p_image_path TEXT
+) RETURNS TABLE (claimed_uid TEXT, claimed_short_id INTEGER, claimed_edition INTEGER)
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_short_id INTEGER;
+    v_edition INTEGER;
+BEGIN
+    INSERT INTO user_card_counters AS c (user_id, last_short_id)
+    VALUES (p_user_id, 1)
+    ON CONFLICT (user_id) DO UPDATE SET last_short_id = c.last_short_id + 1
+    RETURNING c.last_short_id INTO v_short_id;
+
+    INSERT INTO card_edition_counters AS e (user_id, member_name, rarity, concept, last_edition)
+    VALUES (p_user_id, p_member_name, p_rarity, p_concept, 1)
+    ON CONFLICT (user_id, member_name, rarity, concept) DO UPDATE SET last_edition = e.last_edition + 1
+    RETURNING e.last_edition INTO v_edition;
+
+    claimed_uid := encode_card_uid(nextval('card_uid_seq'));
+    claimed_short_id := v_short_id;
+    claimed_edition := v_edition;
+
+    INSERT INTO user_cards (user_id, card_uid, short_id, date_obtained, rarity, edition, member_name, group_name, concept, image_path)
+    VALUES (p_user_id, claimed_uid, v_short_id, CURRENT_TIMESTAMP, p_rarity, v_edition, p_member_name, p_group_name, p_concept, p_image_path);
+
+    RETURN NEXT;
+END;
+$$;
@@ -0,0 +1,84 @@
+-- Trade log (see trades.py). One row per offer, keyed by the Discord message people react to, and
+-- one trade_cards row per card changing hands, so offers can be multi-card or card-for-card.
+-- accept_trade() moves every card or none of them. Safe to run more than once.
+
+CREATE TABLE IF NOT EXISTS trades (
+    id BIGSERIAL PRIMARY KEY,
+    message_id BIGINT NOT NULL UNIQUE,
+    channel_id BIGINT NOT NULL,
+    sender_id BIGINT NOT NULL,
+    recipient_id BIGINT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'open' CHECK (status IN ('open', 'accepted', 'declined', 'expired', 'failed')),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMPTZ NOT NULL,
+    resolved_at TIMESTAMPTZ
+);
+
+CREATE TABLE IF NOT EXISTS trade_cards (
+    trade_id BIGINT NOT NULL REFERENCES trades (id) ON DELETE CASCADE,
+    card_id BIGINT NOT NULL,
+    from_user_id BIGINT NOT NULL,
+    to_user_id BIGINT NOT NULL,
+    PRIMARY KEY (trade_id, card_id)
+);
+
+-- Expiry sweeps and loading open offers on startup only ever look at open trades
+CREATE INDEX IF NOT EXISTS trades_open_expires_idx ON trades (expires_at) WHERE status = 'open';
+
+CREATE OR REPLACE FUNCTION accept_trade(p_message_id BIGINT, p_user_id BIGINT)
+RETURNS TABLE (
+    traded_card_id BIGINT,
+    traded_from BIGINT,
+    traded_to BIGINT,
+    traded_uid TEXT,
+    traded_member TEXT,
+    traded_rarity TEXT
+)
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_trade_id BIGINT;
+    v_wanted INTEGER;
+    v_owned INTEGER;
+BEGIN
+    -- Locking the offer makes a second 🤝 or a racing expiry wait, then find it resolved
+    SELECT t.id INTO v_trade_id
+    FROM trades t
+    WHERE t.message_id = p_message_id
+      AND t.recipient_id = p_user_id
+      AND t.status = 'open'
+      AND t.expires_at > CURRENT_TIMESTAMP
+    FOR UPDATE;
+
+    IF v_trade_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    SELECT COUNT(*) INTO v_wanted FROM trade_cards tc WHERE tc.trade_id = v_trade_id;
+
+    -- Lock the cards that are still where the offer left them; recycles and other trades wait
+    PERFORM 1
+    FROM user_cards uc
+    JOIN trade_cards tc ON tc.card_id = uc.id AND tc.from_user_id = uc.user_id
+    WHERE tc.trade_id = v_trade_id
+    FOR UPDATE OF uc;
+    GET DIAGNOSTICS v_owned = ROW_COUNT;
+
+    IF v_owned < v_wanted THEN
+        UPDATE trades SET status = 'failed', resolved_at = CURRENT_TIMESTAMP WHERE id = v_trade_id;
+        RETURN;
+    END IF;
+
+    UPDATE trades SET status = 'accepted', resolved_at = CURRENT_TIMESTAMP WHERE id = v_trade_id;
+
+    RETURN QUERY
+    UPDATE user_cards uc
+    SET user_id = tc.to_user_id,
+        date_obtained = CURRENT_TIMESTAMP,
+        custom_tag = NULL
+    FROM trade_cards tc
+    WHERE tc.trade_id = v_trade_id
+      AND uc.id = tc.card_id
+      AND uc.user_id = tc.from_user_id
+    RETURNING uc.id, tc.from_user_id, tc.to_user_id, uc.card_uid, uc.member_name, uc.rarity;
+END;
+$$;
@@ -0,0 +1,19 @@
+-- !collection sorted by rarity puts unknown rarities last, as it did before keyset pagination
+-- (utils/paginator.py ranked them 99). rarity_points() gives them 0, which sorted them first.
+-- Safe to run more than once.
+
+CREATE OR REPLACE FUNCTION rarity_rank(p_rarity TEXT) RETURNS INTEGER
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE p_rarity
+        WHEN 'Common' THEN 1
+        WHEN 'Rare' THEN 2
+        WHEN 'Epic' THEN 3
+        WHEN 'Legendary' THEN 4
+        WHEN 'Mythic' THEN 5
+        ELSE 99
+    END
+$$;
+
+-- collection:rarity:* (replaces the rarity_points() index from 007)
+CREATE INDEX IF NOT EXISTS user_cards_user_rarity_order_idx ON user_cards (user_id, rarity_rank(rarity), id);
+DROP INDEX IF EXISTS user_cards_user_rarity_rank_idx;
@@ -0,0 +1,20 @@
+-- user_cards.id must be unique (see 007_collection_keyset). 007 only gained the primary key /
+-- unique index step later, so this repeats it for databases that had already applied 007.
+-- Safe to run more than once.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = 'user_cards'::regclass AND i.indisunique
+          AND i.indnkeyatts = 1 AND i.indpred IS NULL AND a.attname = 'id'
+    ) THEN
+        IF EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'user_cards'::regclass AND contype = 'p') THEN
+            CREATE UNIQUE INDEX IF NOT EXISTS user_cards_id_key ON user_cards (id);
+        ELSE
+            ALTER TABLE user_cards ADD PRIMARY KEY (id);
+        END IF;
+    END IF;
+END $$;
@@ -0,0 +1,65 @@
+from collections import Counter
+
+
+class LimitedMythicRegistry:
+    """Tracks which limited mythics are already minted so drops can assign rarity without the DB.
+
+    Counts cover cards in user_cards plus Mythic copies currently on display in an open drop.
+    Until load() has run, is_minted() falls back to counting in the database.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.minted = Counter()
+        self.reserved = Counter()
+        self.loaded = False
+
+    async def load(self, conn):
+        rows = await conn.fetch("""
+            SELECT member_name, concept, COUNT(*) AS count
+            FROM user_cards
+            WHERE rarity = 'Mythic'
+            GROUP BY member_name, concept
+        """)
+        self.minted = Counter({
+            (row["member_name"], row["concept"]): row["count"]
+            for row in rows
+            if self.catalog.is_limited_mythic(row["member_name"], row["concept"])
+        })
+        self.loaded = True
+
+    async def is_minted(self, name, concept, conn=None):
+        key = (name, concept)
+        if self.loaded:
+            return self.minted[key] + self.reserved[key] > 0
+
+        existing = await conn.fetchval("""
+            SELECT COUNT(*)
+            FROM user_cards
+            WHERE member_name = $1
+              AND concept = $2
+              AND rarity = 'Mythic'
+        """, name, concept)
+        return existing + self.reserved[key] > 0
+
+    def _tracked(self, name, concept, rarity):
+        return rarity == "Mythic" and self.catalog.is_limited_mythic(name, concept)
+
+    def reserve(self, name, concept, rarity):
+        """A drop is showing this card; hold it until claimed or the drop ends."""
+        if self._tracked(name, concept, rarity):
+            self.reserved[(name, concept)] += 1
+
+    def release(self, name, concept, rarity):
+        if self._tracked(name, concept, rarity) and self.reserved[(name, concept)] > 0:
+            self.reserved[(name, concept)] -= 1
+
+    def claimed(self, name, concept, rarity):
+        if self._tracked(name, concept, rarity):
+            self.release(name, concept, rarity)
+            self.minted[(name, concept)] += 1
+
+    def removed(self, name, concept, rarity):
+        """A card left user_cards (recycled), so a limited mythic may be minted again."""
+        if self._tracked(name, concept, rarity) and self.minted[(name, concept)] > 0:
+            self.minted[(name, concept)] -= 1
@@ -0,0 +1,106 @@
+import json
+import os
+import time
+from collections import Counter, OrderedDict
+
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", 300))  # seconds
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", 5000))
+
+
+class UserProfile:
+    """Small per-user facts: aura, collection tag, last daily and item quantities."""
+    __slots__ = ("user_id", "has_account", "coins", "emoji", "last_daily", "items", "loaded_at")
+
+    def __init__(self, user_id, has_account, coins, emoji, last_daily, items, loaded_at):
+        self.user_id = user_id
+        self.has_account = has_account
+        self.coins = coins or 0
+        self.emoji = emoji
+        self.last_daily = last_daily
+        self.items = items
+        self.loaded_at = loaded_at
+
+    def item(self, name):
+        return self.items.get(name, 0)
+
+
+class ProfileCache:
+    """LRU of UserProfile with a TTL. Every command that changes users/user_items must invalidate()."""
+
+    def __init__(self, db=None, ttl=PROFILE_CACHE_TTL, max_size=PROFILE_CACHE_SIZE):
+        self.db = db
+        self.ttl = ttl
+        self.max_size = max_size
+        self.profiles = OrderedDict()
+        # invalidate() calls per user, kept only while a load for that user is in flight, so a
+        # row read before an invalidation isn't cached after it
+        self.generations = {}
+        self.loading = Counter()
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, user_id, now):
+        profile = self.profiles.get(user_id)
+        if profile is None or now - profile.loaded_at > self.ttl:
+            return None
+        self.profiles.move_to_end(user_id)
+        return profile
+
+    async def get(self, user_id):
+        return (await self.get_many([user_id]))[user_id]
+
+    async def get_many(self, user_ids):
+        """Profiles for these users, loading every miss in a single query."""
+        now = time.monotonic()
+        found = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            profile = self._fresh(user_id, now)
+            if profile is None:
+                missing.append(user_id)
+            else:
+                found[user_id] = profile
+        self.hits += len(found)
+        self.misses += len(missing)
+
+        if missing:
+            started = {user_id: self.generations.get(user_id, 0) for user_id in missing}
+            self.loading.update(missing)
+            try:
+                rows = await self.db.profiles(missing)
+                for row in rows:
+                    items = row["items"]
+                    if isinstance(items, str):
+                        items = json.loads(items)
+                    profile = UserProfile(row["user_id"], row["has_account"], row["coins"], row["emoji"],
+                                          row["last_daily"], items, now)
+                    if self.generations.get(profile.user_id, 0) == started[profile.user_id]:
+                        self._store(profile)
+                    found[row["user_id"]] = profile
+            finally:
+                self.loading.subtract(missing)
+                for user_id in missing:
+                    if self.loading[user_id] <= 0:
+                        del self.loading[user_id]
+                        self.generations.pop(user_id, None)
+        return found
+
+    def _store(self, profile):
+        self.profiles[profile.user_id] = profile
+        self.profiles.move_to_end(profile.user_id)
+        while len(self.profiles) > self.max_size:
+            self.profiles.popitem(last=False)
+
+    def invalidate(self, *user_ids):
+        for user_id in user_ids:
+            self.profiles.pop(user_id, None)
+            if user_id in self.loading:
+                self.generations[user_id] = self.generations.get(user_id, 0) + 1
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {"size": len(self.profiles), "hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
@@ -0,0 +1,23 @@
+class ReactionRouter:
+    """Routes raw reaction events to the drop or trade that owns the message, in O(1)."""
+
+    def __init__(self):
+        self.routes = {}
+
+    def register(self, message_id, handler):
+        """handler is an async callable taking the RawReactionActionEvent."""
+        self.routes[message_id] = handler
+
+    def unregister(self, message_id):
+        self.routes.pop(message_id, None)
+
+    def __len__(self):
+        return len(self.routes)
+
+    async def dispatch(self, payload):
+        """Hand the event to its message's handler. Returns False if nothing is listening."""
+        handler = self.routes.get(payload.message_id)
+        if handler is None:
+            return False
+        await handler(payload)
+        return True
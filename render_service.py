@@ -0,0 +1,83 @@
+import asyncio
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Pillow releases the GIL while decoding, resizing and encoding, so threads are the default.
+# Threads also share the in-memory framed card cache; worker processes each keep their own.
+RENDER_EXECUTOR = os.getenv("RENDER_EXECUTOR", "thread")  # thread or process
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", 2))
+RENDER_MAX_PENDING = int(os.getenv("RENDER_MAX_PENDING", 8))
+RENDER_SLOW_SECONDS = 2.0
+LATENCY_SAMPLES = 200
+
+
+class RenderBusy(Exception):
+    """Raised when the render queue is full and the caller should try again later."""
+
+
+class RenderService:
+    def __init__(self, workers=RENDER_WORKERS, max_pending=RENDER_MAX_PENDING, executor=RENDER_EXECUTOR):
+        self.workers = workers
+        self.uses_processes = executor == "process"
+        if self.uses_processes:
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.latencies = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+
+    def init_workers(self, initializer, *initargs):
+        """Run initializer(*initargs) in every worker process, e.g. to load the card atlases.
+
+        Thread workers already share this process's state, so this only restarts a process pool.
+        Jobs already queued on the old pool still finish there.
+        """
+        if not self.uses_processes:
+            return
+        previous = self.executor
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=initializer, initargs=initargs)
+        previous.shutdown(wait=False)
+
+    @property
+    def saturated(self):
+        return self.pending >= self.max_pending
+
+    async def render(self, kind, func, *args):
+        """Run a render job in the pool. Raises RenderBusy instead of queueing past max_pending."""
+        if self.saturated:
+            self.rejected += 1
+            raise RenderBusy(f"{self.pending} renders already queued")
+
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+            elapsed = time.perf_counter() - started
+            self.latencies[kind].append(elapsed)
+            if elapsed > RENDER_SLOW_SECONDS:
+                print(f"Slow {kind} render: {elapsed:.2f}s ({self.pending} still queued)")
+
+    def stats(self):
+        """Per-kind latency summary in seconds over the most recent renders."""
+        summary = {}
+        for kind, samples in self.latencies.items():
+            ordered = sorted(samples)
+            if not ordered:
+                continue
+            summary[kind] = {
+                "count": len(ordered),
+                "p50": ordered[len(ordered) // 2],
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "max": ordered[-1],
+            }
+        return {"pending": self.pending, "rejected": self.rejected, "renders": summary}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,117 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import Counter
+
+
+class TimerHandle:
+    """A pending deadline; cancel() it when the work it guards finishes first."""
+
+    __slots__ = ("when", "subsystem", "callback", "scheduler", "done")
+
+    def __init__(self, when, subsystem, callback, scheduler):
+        self.when = when
+        self.subsystem = subsystem
+        self.callback = callback
+        self.scheduler = scheduler
+        self.done = False
+
+    def cancel(self):
+        self.scheduler._cancel(self)
+
+
+class Scheduler:
+    """Every timeout the bot waits on (views, trade offers, drop windows) in one min-heap.
+
+    A single task sleeps until the earliest deadline and runs whatever is due, so idle cost is
+    one sleeping task however many deadlines are pending. Cancelled handles are dropped lazily
+    and the heap is compacted once they make up most of it.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.sequence = itertools.count()  # tie-breaker so handles are never compared
+        self.pending = Counter()
+        self.fired = Counter()
+        self.cancelled = 0
+        self.wakeup = None
+        self.task = None
+
+    def call_later(self, delay, subsystem, callback):
+        return self.call_at(time.monotonic() + delay, subsystem, callback)
+
+    def call_at(self, when, subsystem, callback):
+        """Run callback() (a function or coroutine function) at time.monotonic() `when`."""
+        handle = TimerHandle(when, subsystem, callback, self)
+        heapq.heappush(self.heap, (when, next(self.sequence), handle))
+        self.pending[subsystem] += 1
+
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self._run())
+        elif self.heap[0][2] is handle:
+            self.wakeup.set()
+        return handle
+
+    def _cancel(self, handle):
+        if handle.done:
+            return
+        handle.done = True
+        handle.callback = None
+        self.pending[handle.subsystem] -= 1
+        self.cancelled += 1
+        if self.cancelled > 64 and self.cancelled * 2 > len(self.heap):
+            self.heap = [entry for entry in self.heap if not entry[2].done]
+            heapq.heapify(self.heap)
+            self.cancelled = 0
+
+    def _fire(self, handle):
+        handle.done = True
+        callback, handle.callback = handle.callback, None
+        self.pending[handle.subsystem] -= 1
+        self.fired[handle.subsystem] += 1
+        try:
+            result = callback()
+            if asyncio.iscoroutine(result):
+                asyncio.create_task(self._guard(handle.subsystem, result))
+        except Exception as e:
+            print(f"{handle.subsystem} timer failed: {e}")
+
+    async def _guard(self, subsystem, coro):
+        try:
+            await coro
+        except Exception as e:
+            print(f"{subsystem} timer failed: {e}")
+
+    async def _run(self):
+        while True:
+            self.wakeup.clear()
+            now = time.monotonic()
+            while self.heap and (self.heap[0][2].done or self.heap[0][0] <= now):
+                _, _, handle = heapq.heappop(self.heap)
+                if handle.done:
+                    self.cancelled = max(0, self.cancelled - 1)
+                    continue
+                self._fire(handle)
+
+            delay = self.heap[0][0] - now if self.heap else None
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self):
+        """Pending deadlines per subsystem, plus how many have fired since startup."""
+        subsystems = set(self.pending) | set(self.fired)
+        return {
+            subsystem: {"pending": self.pending[subsystem], "fired": self.fired[subsystem]}
+            for subsystem in sorted(subsystems)
+        }
+
+    def __len__(self):
+        return sum(self.pending.values())
+
+
+# Shared by the bot and its views
+scheduler = Scheduler()
@@ -0,0 +1,106 @@
+"""Offline checks for claim_arbiter.arbitrate. Run from the repository root:
+    python -m unittest discover tests
+"""
+import unittest
+
+from claim_arbiter import ClaimAttempt, arbitrate
+
+DROPPER = 1
+RIVAL = 2
+OTHER = 3
+DROP_TIME = 100.0
+PRIORITY_WINDOW = 10.0
+
+
+def attempt(user_id, emoji, after, seq):
+    """A reaction arriving `after` seconds into the drop."""
+    return ClaimAttempt(user_id, emoji, DROP_TIME + after, seq)
+
+def settle(attempts, claimed=None, **kwargs):
+    outcomes = arbitrate(attempts, claimed or {}, DROPPER, DROP_TIME, PRIORITY_WINDOW, **kwargs)
+    return [(outcome.kind, outcome.attempt.user_id, outcome.uses_item) for outcome in outcomes]
+
+
+class PriorityWindowTest(unittest.TestCase):
+    def test_rival_inside_window_is_held_back(self):
+        self.assertEqual(settle([attempt(RIVAL, "🫰", 2, 0)]), [("priority", RIVAL, False)])
+
+    def test_dropper_claims_inside_window(self):
+        self.assertEqual(settle([attempt(DROPPER, "🫰", 2, 0)]), [("won", DROPPER, False)])
+
+    def test_rival_claims_once_window_ends(self):
+        self.assertEqual(settle([attempt(RIVAL, "🫰", PRIORITY_WINDOW, 0)]), [("won", RIVAL, False)])
+
+    def test_held_back_rival_does_not_take_the_slot(self):
+        outcomes = settle([attempt(RIVAL, "🫰", 1, 0), attempt(DROPPER, "🫰", 5, 1)])
+        self.assertEqual(outcomes, [("priority", RIVAL, False), ("won", DROPPER, False)])
+
+
+class OrderingTest(unittest.TestCase):
+    def test_earlier_reaction_wins_whatever_the_batch_order(self):
+        attempts = [attempt(OTHER, "🫰", 12, 0), attempt(RIVAL, "🫰", 11, 1)]
+        self.assertEqual(settle(attempts), [("won", RIVAL, False), ("out_of_stock", OTHER, False)])
+
+    def test_same_timestamp_is_settled_by_seq(self):
+        attempts = [attempt(OTHER, "🫰", 11, 5), attempt(RIVAL, "🫰", 11, 4)]
+        self.assertEqual(settle(attempts), [("won", RIVAL, False), ("out_of_stock", OTHER, False)])
+        attempts = [attempt(OTHER, "🫰", 11, 4), attempt(RIVAL, "🫰", 11, 5)]
+        self.assertEqual(settle(attempts), [("won", OTHER, False), ("out_of_stock", RIVAL, False)])
+
+
+class RejectionTest(unittest.TestCase):
+    def test_slot_claimed_in_an_earlier_batch_is_out_of_stock(self):
+        outcomes = settle([attempt(RIVAL, "🫰", 11, 0)], claimed={"🫰": OTHER})
+        self.assertEqual(outcomes, [("out_of_stock", RIVAL, False)])
+
+    def test_one_card_per_user_per_drop(self):
+        outcomes = settle([attempt(RIVAL, "🫰", 11, 0), attempt(RIVAL, "🫶", 11, 1)])
+        self.assertEqual(outcomes, [("won", RIVAL, False), ("already_claimed", RIVAL, False)])
+
+    def test_winner_of_an_earlier_batch_is_already_claimed(self):
+        outcomes = settle([attempt(RIVAL, "🫶", 11, 0)], claimed={"🫰": RIVAL}, claimed_users={RIVAL})
+        self.assertEqual(outcomes, [("already_claimed", RIVAL, False)])
+
+    def test_already_claimed_is_reported_before_out_of_stock(self):
+        outcomes = settle([attempt(RIVAL, "🫰", 11, 0)], claimed={"🫰": RIVAL}, claimed_users={RIVAL})
+        self.assertEqual(outcomes, [("already_claimed", RIVAL, False)])
+
+    def test_rejections_leave_other_slots_open(self):
+        attempts = [attempt(RIVAL, "🫰", 11, 0), attempt(OTHER, "🫰", 11, 1), attempt(OTHER, "🫶", 11, 2)]
+        self.assertEqual(settle(attempts), [
+            ("won", RIVAL, False), ("out_of_stock", OTHER, False), ("won", OTHER, False),
+        ])
+
+
+class CooldownTest(unittest.TestCase):
+    def test_cooldown_without_extra_claims_is_rejected(self):
+        outcomes = settle([attempt(RIVAL, "🫰", 11, 0)], on_cooldown={RIVAL})
+        self.assertEqual(outcomes, [("cooldown", RIVAL, False)])
+
+    def test_cooldown_spends_an_extra_claim(self):
+        outcomes = settle([attempt(RIVAL, "🫰", 11, 0)], on_cooldown={RIVAL}, extra_claims={RIVAL: 1})
+        self.assertEqual(outcomes, [("won", RIVAL, True)])
+
+    def test_users_off_cooldown_keep_their_extra_claims(self):
+        outcomes = settle([attempt(RIVAL, "🫰", 11, 0)], extra_claims={RIVAL: 1})
+        self.assertEqual(outcomes, [("won", RIVAL, False)])
+
+    def test_no_extra_claim_is_spent_on_a_lost_slot(self):
+        # Stock is checked before the item is consumed, so losing the race costs nothing
+        attempts = [attempt(OTHER, "🫰", 11, 0), attempt(RIVAL, "🫰", 11, 1), attempt(RIVAL, "🫶", 11, 2)]
+        outcomes = settle(attempts, on_cooldown={RIVAL}, extra_claims={RIVAL: 1})
+        self.assertEqual(outcomes, [("won", OTHER, False), ("out_of_stock", RIVAL, False), ("won", RIVAL, True)])
+
+    def test_no_extra_claim_is_spent_on_a_second_card(self):
+        attempts = [attempt(RIVAL, "🫰", 11, 0), attempt(RIVAL, "🫶", 11, 1)]
+        outcomes = settle(attempts, on_cooldown={RIVAL}, extra_claims={RIVAL: 2})
+        self.assertEqual(outcomes, [("won", RIVAL, True), ("already_claimed", RIVAL, False)])
+
+    def test_caller_counts_are_not_modified(self):
+        extra_claims = {RIVAL: 1}
+        settle([attempt(RIVAL, "🫰", 11, 0)], on_cooldown={RIVAL}, extra_claims=extra_claims)
+        self.assertEqual(extra_claims, {RIVAL: 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
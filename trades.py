@@ -0,0 +1,136 @@
+import functools
+import os
+from datetime import datetime, timedelta, timezone
+
+from scheduler import scheduler as shared_scheduler
+
+TRADE_TIMEOUT = int(os.getenv("TRADE_TIMEOUT", 300))  # seconds an offer stays open
+
+
+class TradeOffer:
+    def __init__(self, message_id, channel_id, sender_id, recipient_id, expires_at):
+        self.message_id = message_id
+        self.channel_id = channel_id
+        self.sender_id = sender_id
+        self.recipient_id = recipient_id
+        self.expires_at = expires_at
+        self.settling = None  # "accepted" or "declined" once a reaction has started closing it
+
+
+class TradeEngine:
+    """Open trade offers, logged in the trades table (migrations/011_trades.sql).
+
+    Offers are keyed by their message like every other reaction route, so a user can have any
+    number open at once and survive a restart. Each offer's deadline sits in the shared
+    scheduler; the first one due closes everything due in one UPDATE.
+    """
+
+    def __init__(self, db, router, timeout=TRADE_TIMEOUT, scheduler=None):
+        self.db = db
+        self.router = router
+        self.timeout = timeout
+        self.scheduler = scheduler or shared_scheduler
+        self.offers = {}
+        self.timers = {}
+        self.held = {}
+        self.handler = None
+        self.on_expired = None
+
+    async def start(self, handler, on_expired):
+        """Route reactions on open offers to handler(payload) and start expiring them.
+
+        Offers that ran out while the bot was down are expired (and reported) right away.
+        """
+        self.handler = handler
+        self.on_expired = on_expired
+        for row in await self.db.open_trades():
+            self._track(TradeOffer(row["message_id"], row["channel_id"], row["sender_id"], row["recipient_id"], row["expires_at"]))
+        await self.expire_due()
+
+    def get(self, message_id):
+        return self.offers.get(message_id)
+
+    def __len__(self):
+        return len(self.offers)
+
+    def hold(self, message_id):
+        """Buffer reactions on a just-sent offer message until open() has logged it."""
+        held = self.held[message_id] = []
+
+        async def buffer(payload):
+            held.append(payload)
+
+        self.router.register(message_id, buffer)
+
+    async def open(self, message_id, channel_id, sender_id, recipient_id, give_ids, want_ids):
+        """Log the offer and start routing its reactions, replaying any hold() buffered.
+        If logging fails the message is left with no route and the error is raised."""
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.timeout)
+        try:
+            await self.db.open_trade(message_id, channel_id, sender_id, recipient_id, expires_at, give_ids, want_ids)
+        except Exception:
+            self.held.pop(message_id, None)
+            self.router.unregister(message_id)
+            raise
+        offer = TradeOffer(message_id, channel_id, sender_id, recipient_id, expires_at)
+        self._track(offer)
+        for payload in self.held.pop(message_id, ()):
+            await self.handler(payload)
+        return offer
+
+    async def accept(self, offer):
+        """Cards moved by accepting, empty if the trade could not go through, or None if another
+        reaction is already settling the offer (see offer.settling).
+
+        The offer is marked before the database is awaited, so of two 🤝 arriving together only
+        the first reaches accept_trade."""
+        if offer.settling:
+            return None
+        offer.settling = "accepted"
+        try:
+            moved = await self.db.accept_trade(offer.message_id, offer.recipient_id)
+        except Exception:
+            offer.settling = None
+            raise
+        self._forget(offer.message_id)
+        return moved
+
+    async def decline(self, offer):
+        """Whether the offer was declined, or None if another reaction is already settling it."""
+        if offer.settling:
+            return None
+        offer.settling = "declined"
+        self._forget(offer.message_id)
+        return await self.db.decline_trade(offer.message_id)
+
+    async def expire_due(self):
+        for row in await self.db.expire_trades(datetime.now(timezone.utc)):
+            self._forget(row["message_id"])
+            await self.on_expired(row["channel_id"])
+
+    def _track(self, offer):
+        self.offers[offer.message_id] = offer
+        self.router.register(offer.message_id, self.handler)
+        self._arm(offer.message_id, (offer.expires_at - datetime.now(timezone.utc)).total_seconds())
+
+    def _arm(self, message_id, delay):
+        self.timers[message_id] = self.scheduler.call_later(delay, "trades", functools.partial(self._expire, message_id))
+
+    def _forget(self, message_id):
+        self.offers.pop(message_id, None)
+        self.router.unregister(message_id)
+        timer = self.timers.pop(message_id, None)
+        if timer is not None:
+            timer.cancel()
+
+    async def _expire(self, message_id):
+        self.timers.pop(message_id, None)
+        if message_id not in self.offers:
+            return
+        try:
+            await self.expire_due()
+        except Exception as e:
+            print(f"Trade expiry failed: {e}")
+        # Retry if the database failed or its clock is a little behind ours
+        if message_id in self.offers:
+            self._arm(message_id, 5)
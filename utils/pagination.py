@@ -1,7 +1,11 @@
 import discord
-from discord.ui import View, button
+from discord.ui import button
+
+from utils.scheduled_view import ScheduledTimeoutView
+
+class HelpPaginator(ScheduledTimeoutView):
+    subsystem = "help"
 
-class HelpPaginator(View):
     def __init__(self, pages, ctx):
         super().__init__(timeout=60)
         self.pages = pages
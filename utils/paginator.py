@@ -1,30 +1,42 @@
 import discord
-from discord.ui import View, Button
+from discord.ui import Button
 from discord import Interaction, Embed
+import asyncio
 import re
+from database import collection_cursor
+from utils.scheduled_view import ScheduledTimeoutView
 
-RARITY_ORDER = {
-    "Common": 1,
-    "Rare": 2,
-    "Epic": 3,
-    "Legendary": 4,
-    "Mythic": 5
-}
 def escape_md(text: str) -> str:
         """Escape Discord markdown special characters in a string."""
         return re.sub(r'([_*`~])', r'\\\1', text)
 
-class CollectionView(View):
-    def __init__(self, ctx, pages, emoji, target, sort_key="date_obtained"):
+class CollectionView(ScheduledTimeoutView):
+    """Collection pages read from the database one at a time with a keyset cursor.
+
+    Only the page on screen and a prefetched next page are held in memory, plus one cursor per
+    page visited so far so 👈 can go back.
+    """
+
+    subsystem = "collection"
+
+    def __init__(self, ctx, db, target, emoji, sort_key="date_obtained", filter_kind="all", filter_value=None,
+                 page_size=10):
         super().__init__(timeout=120)
         self.ctx = ctx
-        self.pages = pages
-        self.emoji = emoji
+        self.db = db
         self.target = target
+        self.emoji = emoji
+        self.sort_key = sort_key
+        self.filter_kind = filter_kind
+        self.filter_value = filter_value
+        self.page_size = page_size
+        self.total = 0
         self.current_page = 0
+        self.cards = []
+        self.cursors = [None]  # cursors[i] is the keyset position page i starts after
+        self.prefetch = None  # task loading the page after current_page
         self.message = None
         self.author = ctx.author
-        self.sort_key = sort_key
 
         self.prev_button = Button(label="👈", style=discord.ButtonStyle.secondary)
         self.next_button = Button(label="👉", style=discord.ButtonStyle.secondary)
@@ -35,22 +47,66 @@ class CollectionView(View):
         self.add_item(self.prev_button)
         self.add_item(self.next_button)
 
+    @property
+    def page_count(self):
+        return max(1, -(-self.total // self.page_size))
+
+    def _fetch(self, page):
+        return self.db.collection_page(
+            self.target.id, self.sort_key, self.filter_kind, self.filter_value,
+            after=self.cursors[page], limit=self.page_size,
+        )
+
+    async def start(self):
+        """Count the matching cards and load the first page. Returns False if there are none."""
+        self.total, self.cards = await asyncio.gather(
+            self.db.collection_count(self.target.id, self.filter_kind, self.filter_value),
+            self._fetch(0),
+        )
+        if not self.cards:
+            return False
+        self._after_load()
+        return True
+
+    async def show_page(self, page):
+        if self.prefetch and page == self.current_page + 1:
+            cards = await self.prefetch
+        else:
+            if self.prefetch:
+                self.prefetch.cancel()
+            cards = await self._fetch(page)
+        self.prefetch = None
+
+        # Cards were recycled or traded away since the count; stay where we are
+        if not cards:
+            self.total = self.current_page * self.page_size + len(self.cards)
+            self._update_buttons()
+            return
+
+        self.current_page = page
+        self.cards = cards
+        self._after_load()
+
+    def _after_load(self):
+        if len(self.cursors) == self.current_page + 1:
+            self.cursors.append(collection_cursor(self.sort_key, self.cards[-1]))
+        if self.current_page + 1 < self.page_count and len(self.cards) == self.page_size:
+            self.prefetch = asyncio.create_task(self._fetch(self.current_page + 1))
+        self._update_buttons()
+
+    def _update_buttons(self):
+        self.prev_button.disabled = self.current_page == 0
+        self.next_button.disabled = self.current_page + 1 >= self.page_count or len(self.cards) < self.page_size
+
     def generate_embed(self):
         embed = Embed(
             title=f"📸 {self.target.display_name}'s Photocard Collection 📚",
-            description=f"Page {self.current_page + 1}/{len(self.pages)} • Sorted by **{self.sort_key}**",
+            description=f"Page {self.current_page + 1}/{self.page_count} • Sorted by **{self.sort_key}**",
             color=discord.Color.blue()
         )
 
-        cards = self.pages[self.current_page]
-
-        # Apply sorting
-        if self.sort_key == "rarity":
-            cards = sorted(cards, key=lambda card: RARITY_ORDER.get(card['rarity'], 99))
-        elif self.sort_key == "member_name":
-            cards = sorted(cards, key=lambda card: card['member_name'])
-        elif self.sort_key == "group_name":
-            cards = sorted(cards, key=lambda card: (card['group_name'], card['member_name']))
+        # Pages already arrive in the requested order
+        cards = self.cards
 
         if self.sort_key == "group_name":
             # Grouped view by group_name
@@ -86,20 +142,24 @@ class CollectionView(View):
         if interaction.user != self.ctx.author:
             return await interaction.response.send_message("This paginator isn't for you!", ephemeral=True)
 
-        self.current_page = (self.current_page - 1) % len(self.pages)
+        if self.current_page > 0:
+            await self.show_page(self.current_page - 1)
         await self.update_message(interaction)
 
     async def next_page(self, interaction: Interaction):
         if interaction.user != self.ctx.author:
             return await interaction.response.send_message("This paginator isn't for you!", ephemeral=True)
 
-        self.current_page = (self.current_page + 1) % len(self.pages)
+        if self.current_page + 1 < self.page_count:
+            await self.show_page(self.current_page + 1)
         await self.update_message(interaction)
 
     async def update_message(self, interaction: Interaction):
         await interaction.response.edit_message(embed=self.generate_embed(), view=self)
 
     async def on_timeout(self):
+        if self.prefetch:
+            self.prefetch.cancel()
         for child in self.children:
             child.disabled = True
         if self.message:
@@ -1,7 +1,11 @@
 import discord
-from discord.ui import View, Button
+from discord.ui import Button
+
+from utils.scheduled_view import ScheduledTimeoutView
+
+class ConfirmRecycleView(ScheduledTimeoutView):
+    subsystem = "recycle"
 
-class ConfirmRecycleView(View):
     def __init__(self, ctx):
         super().__init__(timeout=30)
         self.ctx = ctx
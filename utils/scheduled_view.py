@@ -0,0 +1,45 @@
+from discord.ui import View
+
+from scheduler import scheduler
+
+
+class ScheduledTimeoutView(View):
+    """A View whose idle timeout is a deadline in the shared scheduler (see scheduler.py)
+    instead of a timer task per view. on_timeout() and stop() behave as they do on View.
+    """
+
+    subsystem = "views"
+
+    def __init__(self, *, timeout=180.0):
+        super().__init__(timeout=None)
+        self.idle_timeout = timeout
+        self.timer = None
+        self._arm()
+
+    def _arm(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        if self.idle_timeout:
+            self.timer = scheduler.call_later(self.idle_timeout, self.subsystem, self._expire)
+
+    # Overrides a private View method, checked against discord.py 2.5.2 (pinned in requirements.txt).
+    # It runs once per component interaction with (item, interaction); if an upgrade renames or
+    # reshapes it, views stop re-arming and time out while in use, so re-check this when bumping.
+    async def _scheduled_task(self, item, interaction):
+        # discord.py restarts a view's timeout on every interaction; do the same with ours
+        if not self.is_finished():
+            self._arm()
+        await super()._scheduled_task(item, interaction)
+
+    async def _expire(self):
+        self.timer = None
+        if self.is_finished():
+            return
+        self.stop()
+        await self.on_timeout()
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        super().stop()
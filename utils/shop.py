@@ -1,12 +1,18 @@
 import discord
-from discord.ui import View, Button
+from discord.ui import Button
 import asyncio
 
-class ShopView(View):
-    def __init__(self, user_id, db_pool):
+from card_uids import is_reserved_uid, typo_hint
+from utils.scheduled_view import ScheduledTimeoutView
+
+class ShopView(ScheduledTimeoutView):
+    subsystem = "shop"
+
+    def __init__(self, user_id, db, profiles=None):
         super().__init__(timeout=60)
         self.user_id = user_id
-        self.db_pool = db_pool
+        self.db = db
+        self.profiles = profiles
         self.message = None
 
     @discord.ui.button(label="🎴 Extra Drop — 100🌟", style=discord.ButtonStyle.green)
@@ -42,30 +48,23 @@ class ShopView(View):
             await interaction.channel.send("⌛ Timed out! Please try again later.")
 
     async def handle_purchase(self, interaction, column, cost, item_name):
-        async with self.db_pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT coins FROM users WHERE user_id = $1", self.user_id)
-            if not row:
+        async with self.db.acquire() as conn:
+            coins = await self.db.coins(self.user_id, conn)
+            if coins is None:
                 await interaction.response.send_message("❌ You don't have a profile yet.", ephemeral=True)
                 return
 
-            if row["coins"] < cost:
+            if coins < cost:
                 await interaction.response.send_message("❌ Not enough coins!", ephemeral=True)
                 return
 
             # Deduct coins
-            await conn.execute("""
-                UPDATE users
-                SET coins = coins - $1
-                WHERE user_id = $2
-            """, cost, self.user_id)
+            await self.db.spend_coins(self.user_id, cost, conn)
 
             # Add item to user_items table
-            await conn.execute("""
-                INSERT INTO user_items (user_id, item, quantity)
-                VALUES ($1, $2, 1)
-                ON CONFLICT (user_id, item)
-                DO UPDATE SET quantity = user_items.quantity + 1
-            """, self.user_id, column)
+            await self.db.add_item(self.user_id, column, conn)
+            if self.profiles:
+                self.profiles.invalidate(self.user_id)
 
             await interaction.response.send_message(f"✅ You bought **1x {item_name}**!", ephemeral=True)
 
@@ -77,46 +76,39 @@ class ShopView(View):
             await channel.send("❌ UID must be alphanumeric and ≤10 characters.")
             return
 
-        async with self.db_pool.acquire() as conn:
+        if is_reserved_uid(new_uid):
+            await channel.send("❌ That UID reads as an issued card code: 6 letters/digits whose last character is the check digit of the rest are reserved for new cards. Changing any character frees it up.")
+            return
+
+        async with self.db.acquire() as conn:
             # Check ownership
-            card = await conn.fetchrow("""
-                SELECT * FROM user_cards
-                WHERE user_id = $1 AND LOWER(card_uid) = LOWER($2)
-            """, user_id, old_uid)
+            card = await self.db.card(user_id, old_uid, conn)
 
             if not card:
-                await channel.send("❌ You don't own a card with that UID.")
-                return
-
-            # Check new UID availability
-            exists = await conn.fetchval("""
-                SELECT 1 FROM user_cards WHERE LOWER(card_uid) = LOWER($1)
-            """, new_uid)
-            if exists:
-                await channel.send("❌ That UID is already taken. Try a different one.")
+                await channel.send(f"❌ You don't own a card with that UID.{typo_hint([old_uid])}")
                 return
 
             # Check balance
-            balance = await conn.fetchval("""
-                SELECT COALESCE(coins, 0) FROM users WHERE user_id = $1
-            """, user_id)
+            balance = await self.db.coins(user_id, conn) or 0
             if balance < cost:
                 await channel.send(f"❌ You need {cost} aura, but you only have {balance}.")
                 return
 
-            # Deduct aura and update
+            # Update (taken UIDs are rejected by the unique index) and deduct aura
             async with conn.transaction():
-                await conn.execute("""
-                    UPDATE users SET coins = coins - $1 WHERE user_id = $2
-                """, cost, user_id)
-                await conn.execute("""
-                    UPDATE user_cards SET card_uid = $1
-                    WHERE user_id = $2 AND LOWER(card_uid) = LOWER($3)
-                """, new_uid, user_id, old_uid)
+                renamed = await self.db.rename_card(user_id, card['id'], new_uid, conn)
+                if renamed:
+                    await self.db.spend_coins(user_id, cost, conn)
+
+            if not renamed:
+                await channel.send("❌ That UID is already taken. Try a different one.")
+                return
+            if self.profiles:
+                self.profiles.invalidate(user_id)
 
         embed = discord.Embed(
             title="✨ Card UID Customized!",
-            description=f"Your **{card['member_name']}** card UID has been updated:\n`{old_uid}` → `{new_uid}`",
+            description=f"Your **{card['member_name']}** card UID has been updated:\n`{card['card_uid']}` → `{new_uid}`",
             color=discord.Color.gold()
         )
         embed.set_footer(text=f"-{cost} aura spent • Remaining: {balance - cost}")
@@ -0,0 +1,62 @@
+import sys
+from collections import defaultdict
+
+WISH_KINDS = ("member", "group", "concept")
+
+
+class WishlistIndex:
+    """Inverted index of the wishlists table: kind -> lowercase name -> user_ids."""
+
+    def __init__(self):
+        self.index = {kind: defaultdict(set) for kind in WISH_KINDS}
+        self.loaded = False
+
+    async def load(self, conn):
+        rows = await conn.fetch("SELECT user_id, kind, card_name FROM wishlists")
+        self.index = {kind: defaultdict(set) for kind in WISH_KINDS}
+        for row in rows:
+            self.add(row["user_id"], row["kind"], row["card_name"])
+        self.loaded = True
+
+    def add(self, user_id, kind, name):
+        self.index[kind][name.lower()].add(user_id)
+
+    def remove(self, user_id, kind, name):
+        users = self.index[kind].get(name.lower())
+        if users is None:
+            return
+        users.discard(user_id)
+        if not users:
+            del self.index[kind][name.lower()]
+
+    def alerts(self, cards):
+        """Map user_id -> wished labels matched by these dropped card dicts, in drop order."""
+        alerts = {}
+        for card in cards:
+            targets = (
+                ("member", card["name"], card["name"].title()),
+                ("group", card["group"], f"{card['group']} (group)"),
+                ("concept", card.get("concept", "Base"), f"{card.get('concept', 'Base')} (concept)"),
+            )
+            for kind, name, label in targets:
+                for user_id in self.index[kind].get(name.lower(), ()):
+                    labels = alerts.setdefault(user_id, [])
+                    if label not in labels:
+                        labels.append(label)
+        return alerts
+
+    def stats(self):
+        """Entry counts and an estimate of the bytes held by the index structures."""
+        entries = users = names = 0
+        memory = sys.getsizeof(self.index)
+        seen_users = set()
+        for names_index in self.index.values():
+            memory += sys.getsizeof(names_index)
+            names += len(names_index)
+            for name, user_ids in names_index.items():
+                memory += sys.getsizeof(name) + sys.getsizeof(user_ids)
+                entries += len(user_ids)
+                seen_users.update(user_ids)
+        users = len(seen_users)
+        memory += sum(sys.getsizeof(user_id) for user_id in seen_users)
+        return {"entries": entries, "users": users, "names": names, "memory_bytes": memory}